@@ -1,30 +1,24 @@
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import RedirectResponse, JSONResponse
-import google_auth_oauthlib.flow
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from google.auth.exceptions import GoogleAuthError
+import httpx
 import os
 from psycopg2.extras import RealDictCursor
 from datetime import timedelta
-from utils import get_db_connection, create_token, get_token, get_user_id
+from utils import create_token, get_token, get_user_id
+from db import get_db
+from tokens import token_manager
+from store import fetch_user_and_schedule, invalidate
+from oauth import create_flow, verify_id_token
 router = APIRouter()
 
-SCOPES = [
-    "openid",
-    "https://www.googleapis.com/auth/userinfo.email",
-    "https://www.googleapis.com/auth/calendar.events"
-]
-
 @router.get("/auth/login")
 def login(request: Request):
     user_id = get_user_id(request)
     if not user_id:
         raise HTTPException(status_code=401, detail="User not found. Please log in again.")
     else:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
+        user, _ = fetch_user_and_schedule(user_id)
         if not user:
             raise HTTPException(status_code=401, detail="User not found. Please log in again.")
         else:
@@ -32,11 +26,7 @@ def login(request: Request):
 
 @router.get("/auth/google/login")
 def google_login(request: Request):
-    flow = google_auth_oauthlib.flow.Flow.from_client_secrets_file(
-        'secrets/client_secret.json',
-        scopes=SCOPES
-    )
-    flow.redirect_uri = os.getenv("REDIRECT_URI")
+    flow = create_flow()
 
     authorization_url, state = flow.authorization_url(
         access_type="offline",
@@ -64,12 +54,7 @@ def google_callback(request: Request):
             url=f"{os.getenv('FRONTEND_URL')}/login?error=calendar_access_required",
         )
 
-    flow = google_auth_oauthlib.flow.Flow.from_client_secrets_file(
-        'secrets/client_secret.json',
-        scopes=SCOPES,
-        state=state
-    )
-    flow.redirect_uri = os.getenv("REDIRECT_URI")
+    flow = create_flow(state=state)
 
     # Reconstruct the full URL the user was redirected to
     authorization_response = str(request.url)
@@ -88,12 +73,17 @@ def google_callback(request: Request):
             url=f"{os.getenv('FRONTEND_URL')}/login?error=server_error",
         )
 
-    id_info = id_token.verify_oauth2_token(
-        id_token_value,
-        requests.Request(),
-        credentials.client_id,
-        clock_skew_in_seconds=10  # Allow 10 seconds of clock skew
-    )
+    try:
+        id_info = verify_id_token(
+            id_token_value,
+            credentials.client_id,
+            clock_skew_in_seconds=10  # Allow 10 seconds of clock skew
+        )
+    except (GoogleAuthError, ValueError, httpx.HTTPError):
+        # an invalid token, or Google's certs could not be fetched
+        return RedirectResponse(
+            url=f"{os.getenv('FRONTEND_URL')}/login?error=server_error",
+        )
 
     user_email = id_info["email"]
     granted_scopes = credentials.scopes  # Store as list for Postgres text[]
@@ -101,36 +91,18 @@ def google_callback(request: Request):
 
     # Store/update in DB
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-        # Check if user already exists
-        cursor.execute("SELECT id FROM users WHERE email = %s", (user_email,))
-        existing_user = cursor.fetchone()
-
-        if existing_user:
-            # Update token info
-            cursor.execute("""
-                UPDATE users SET 
-                    access_token = %s,
-                    refresh_token = %s,
-                    token_expiry = %s,
-                    granted_scopes = %s
-                WHERE id = %s
-            """, (
-                credentials.token,
-                credentials.refresh_token,
-                token_expiry,
-                granted_scopes,
-                existing_user['id']
-            ))
-            user_id = existing_user['id']
-        else:
-            # Create new user
+        with get_db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            # Create the user or update the token info of an existing one in
+            # a single statement, safe against concurrent first logins
             cursor.execute("""
                 INSERT INTO users (
                     email, access_token, refresh_token, token_expiry, granted_scopes
                 ) VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (email) DO UPDATE SET
+                    access_token = EXCLUDED.access_token,
+                    refresh_token = EXCLUDED.refresh_token,
+                    token_expiry = EXCLUDED.token_expiry,
+                    granted_scopes = EXCLUDED.granted_scopes
                 RETURNING id
             """, (
                 user_email,
@@ -139,18 +111,10 @@ def google_callback(request: Request):
                 token_expiry,
                 granted_scopes
             ))
-            insert_result = cursor.fetchone()
-            if insert_result is None:
-                conn.rollback()
-                cursor.close()
-                conn.close()
-                return RedirectResponse(
-                    url=f"{os.getenv('FRONTEND_URL')}/login?error=server_error",)
-            user_id = insert_result["id"]
-
-        conn.commit()
-        cursor.close()
-        conn.close()
+            user_id = cursor.fetchone()["id"]
+            conn.commit()
+        token_manager.forget(user_id)
+        invalidate(user_id)
 
         # Delete session data after successful login
         request.session.clear()
@@ -200,13 +164,13 @@ def delete_account(request: Request):
     if not user_id:
         raise HTTPException(status_code=401, detail="Looks like you are not logged in. Please log in before deleting your account.")
     
-    # Delete user from database
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM schedules WHERE user_id = %s", (user_id,))
-    cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
-    conn.commit()
-    conn.close()
+    # Delete user from database; their schedule and every other per-user row
+    # go with it through ON DELETE CASCADE
+    with get_db() as conn, conn.cursor() as cursor:
+        cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        conn.commit()
+    token_manager.forget(user_id)
+    invalidate(user_id)
     
     response = JSONResponse(content={"message": "Account deleted successfully"})
     
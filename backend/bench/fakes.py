@@ -0,0 +1,273 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import asyncio
+import itertools
+import json
+import os
+import random
+import time
+
+# Local stand-ins for the Google OAuth/Calendar APIs and an OpenAI-compatible
+# chat completions API, with injectable latency and error rates, so the
+# benchmark measures this app rather than the network or upstream quotas.
+# FakeRedis stands in for the redis client behind the shared generation
+# cache.
+# bench.run serves them as their own uvicorn processes, configured through
+# the environment:
+#     uvicorn bench.fakes:google_app_from_env --factory
+#     uvicorn bench.fakes:openai_app_from_env --factory
+
+class Faults:
+    """Latency (mean and jitter, in ms) and error rate applied to every fake request"""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    async def apply(self):
+        delay = max(self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms), 0)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            return JSONResponse(status_code=503, content={"error": {"message": "injected failure"}})
+        return None
+
+def week_start_utc():
+    today = datetime.now(timezone.utc).date()
+    return datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time(), timezone.utc)
+
+def calendar_event(event_id, start, minutes, summary):
+    return {
+        "id": event_id,
+        "status": "confirmed",
+        "summary": summary,
+        "start": {"dateTime": start.isoformat(), "timeZone": "UTC"},
+        "end": {"dateTime": (start + timedelta(minutes=minutes)).isoformat(), "timeZone": "UTC"},
+    }
+
+def signing_key(key_id):
+    """(RSA signer for key_id, its self-signed certificate as PEM), to serve as a Google cert"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+    from google.auth import crypt
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, key_id)])
+    now = datetime.now(timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number()).not_valid_before(now - timedelta(days=1))
+            .not_valid_after(now + timedelta(days=1)).sign(key, hashes.SHA256()))
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    return crypt.RSASigner.from_string(pem, key_id), cert.public_bytes(serialization.Encoding.PEM).decode()
+
+def google_id_token(signer, audience="client-id", email="user@example.com"):
+    """An ID token like the one Google returns at the end of the OAuth flow"""
+    from google.auth import jwt
+
+    now = int(time.time())
+    return jwt.encode(signer, {"iss": "https://accounts.google.com", "aud": audience, "email": email, "iat": now, "exp": now + 600}).decode()
+
+def create_google_app(faults: Faults, events_per_week: int = 20, page_size: int = 250, certs: dict = None) -> FastAPI:
+    """Token refresh, certs (key id -> PEM, see signing_key) and the primary calendar's events collection"""
+    app = FastAPI()
+    week_start = week_start_utc()
+    # a meeting-heavy week: events_per_week one-hour events spread over the
+    # working hours of the current and next three weeks
+    events = [
+        calendar_event(f"seed{i}", week_start + timedelta(days=(i % 5) + 7 * (i // events_per_week), hours=9 + (i // 5) % 8), 60, f"Meeting {i}")
+        for i in range(events_per_week * 4)
+    ]
+    created = {}
+    ids = itertools.count()
+    # requests being answered right now and the most there ever were at once
+    app.state.in_flight = app.state.peak_in_flight = 0
+
+    @app.middleware("http")
+    async def count_in_flight(request: Request, call_next):
+        app.state.in_flight += 1
+        app.state.peak_in_flight = max(app.state.peak_in_flight, app.state.in_flight)
+        try:
+            return await call_next(request)
+        finally:
+            app.state.in_flight -= 1
+
+    @app.post("/token")
+    async def token():
+        return await faults.apply() or {"access_token": f"fake-access-{next(ids)}", "expires_in": 3600, "token_type": "Bearer"}
+
+    @app.get("/oauth2/v1/certs")
+    async def signing_certs():
+        return await faults.apply() or JSONResponse(certs or {}, headers={"cache-control": "public, max-age=3600"})
+
+    @app.get("/calendar/v3/calendars/primary/events")
+    async def list_events(request: Request):
+        failure = await faults.apply()
+        if failure:
+            return failure
+        params = request.query_params
+        if params.get("syncToken"):
+            # nothing changes upstream between benchmark requests
+            return {"items": [], "nextSyncToken": "sync-token"}
+        offset = int(params.get("pageToken") or 0)
+        page = {"items": events[offset:offset + page_size]}
+        if offset + page_size < len(events):
+            page["nextPageToken"] = str(offset + page_size)
+        else:
+            page["nextSyncToken"] = "sync-token"
+        return page
+
+    @app.post("/calendar/v3/calendars/primary/events")
+    async def insert_event(request: Request):
+        failure = await faults.apply()
+        if failure:
+            return failure
+        event = await request.json()
+        event["id"] = f"created{next(ids)}"
+        created[event["id"]] = event
+        return event
+
+    @app.patch("/calendar/v3/calendars/primary/events/{event_id}")
+    async def patch_event(event_id: str, request: Request):
+        failure = await faults.apply()
+        if failure:
+            return failure
+        event = {**created.get(event_id, {}), **(await request.json()), "id": event_id}
+        created[event_id] = event
+        return event
+
+    @app.delete("/calendar/v3/calendars/primary/events/{event_id}")
+    async def delete_event(event_id: str):
+        failure = await faults.apply()
+        if failure:
+            return failure
+        created.pop(event_id, None)
+        return Response(status_code=204)
+
+    return app
+
+def create_openai_app(faults: Faults, events_per_week: int = 10, stream_chunk_size: int = 7) -> FastAPI:
+    """POST /v1/chat/completions answering with a week of non-overlapping events.
+
+    With "stream": true the answer is sent as server-sent events, the content
+    cut every stream_chunk_size characters regardless of JSON structure.
+    """
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        failure = await faults.apply()
+        if failure:
+            return failure
+        body = await request.json()
+        week_start = week_start_utc()
+        generated = [
+            {
+                "summary": f"Task {i}",
+                "start": {"dateTime": (week_start + timedelta(days=i % 7, hours=18 + i // 7)).isoformat(), "timeZone": "UTC"},
+                "end": {"dateTime": (week_start + timedelta(days=i % 7, hours=18 + i // 7, minutes=45)).isoformat(), "timeZone": "UTC"},
+            }
+            for i in range(events_per_week)
+        ]
+        completion_id = f"chatcmpl-{random.getrandbits(32):x}"
+        if body.get("stream"):
+            return StreamingResponse(stream_completion(completion_id, body.get("model"), json.dumps(generated)), media_type="text/event-stream")
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(datetime.now(timezone.utc).timestamp()),
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(generated)},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    async def stream_completion(completion_id, model, content):
+        created = int(datetime.now(timezone.utc).timestamp())
+        for i in range(0, len(content), stream_chunk_size):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[i:i + stream_chunk_size]}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        done = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        yield f"data: {json.dumps(done)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return app
+
+class FakeRedis:
+    """In-process stand-in for the redis client calls cache.RedisBackend makes.
+
+    Values are kept as bytes and expire like SET ... EX; with max_keys set,
+    the least recently used key is evicted like maxmemory-policy
+    allkeys-lru. Setting `down` makes every call raise ConnectionError.
+    """
+
+    def __init__(self, max_keys: int = None, clock=time.time):
+        self.max_keys = max_keys
+        self.clock = clock
+        self.down = False
+        self._data = OrderedDict()
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("Error connecting to fake Redis")
+
+    def get(self, key):
+        self._check()
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] is not None and entry[0] <= self.clock():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value, ex=None):
+        self._check()
+        if isinstance(value, str):
+            value = value.encode()
+        self._data[key] = (self.clock() + ex if ex else None, value)
+        self._data.move_to_end(key)
+        while self.max_keys is not None and len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+        return True
+
+    def delete(self, *keys):
+        self._check()
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+def faults_from_env(prefix: str) -> Faults:
+    return Faults(
+        float(os.getenv(f"{prefix}_LATENCY_MS", "0")),
+        float(os.getenv(f"{prefix}_JITTER_MS", "0")),
+        float(os.getenv(f"{prefix}_ERROR_RATE", "0")),
+    )
+
+def google_app_from_env() -> FastAPI:
+    certs = None
+    if os.getenv("FAKE_GOOGLE_CERTS_FILE"):
+        with open(os.environ["FAKE_GOOGLE_CERTS_FILE"]) as f:
+            certs = json.load(f)
+    return create_google_app(
+        faults_from_env("FAKE_GOOGLE"),
+        int(os.getenv("FAKE_GOOGLE_EVENTS_PER_WEEK", "20")),
+        int(os.getenv("FAKE_GOOGLE_PAGE_SIZE", "250")),
+        certs,
+    )
+
+def openai_app_from_env() -> FastAPI:
+    return create_openai_app(faults_from_env("FAKE_OPENAI"), int(os.getenv("FAKE_OPENAI_EVENTS_PER_WEEK", "10")))
@@ -0,0 +1,71 @@
+"""Micro-benchmark of JWT checks: decode on every call versus the token cache.
+
+Compares jose's jwt.decode (signature check and claim validation, what
+every dependency used to do) with utils.decode_token on a warm cache, and
+with get_user_id + get_email on one request, which share a single decode
+through request.state. No database or upstreams needed. Run from backend/:
+
+    python -m bench.jwt_cache
+    python -m bench.jwt_cache --seconds 2 --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+def rate(fn, seconds):
+    """Calls per second of fn, run for about `seconds`"""
+    calls, started = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - started) < seconds:
+        fn()
+        calls += 1
+    return calls / elapsed
+
+def run(seconds):
+    from jose import jwt
+    from starlette.requests import Request
+    import utils
+
+    token = utils.create_token({"user_id": "00000000-0000-0000-0000-000000000000", "email": "bench@example.com"})
+    secret, algorithm = utils.get_jwt_secret(), utils.get_jwt_algorithm()
+    utils.decode_token(token)
+
+    def request_dependencies():
+        request = Request({"type": "http", "headers": [(b"cookie", f"token={token}".encode())]})
+        utils.get_user_id(request)
+        utils.get_email(request)
+
+    def uncached_dependencies():
+        # what the two dependencies cost when each decoded the cookie itself
+        jwt.decode(token, secret, algorithms=[algorithm])
+        jwt.decode(token, secret, algorithms=[algorithm])
+
+    results = {
+        "decode_per_s": rate(lambda: jwt.decode(token, secret, algorithms=[algorithm]), seconds),
+        "cached_per_s": rate(lambda: utils.decode_token(token), seconds),
+        "request_uncached_per_s": rate(uncached_dependencies, seconds),
+        "request_cached_per_s": rate(request_dependencies, seconds),
+    }
+    results["decode_us"] = 1e6 / results["decode_per_s"]
+    results["cached_us"] = 1e6 / results["cached_per_s"]
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark JWT decoding with and without the token cache")
+    parser.add_argument("--seconds", type=float, default=1.0, help="time spent on each measurement")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+
+    os.environ.setdefault("JWT_SECRET", "bench-secret")
+    result = run(args.seconds)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"jwt.decode every call:        {result['decode_per_s']:>10.0f}/s  ({result['decode_us']:.1f} us)")
+    print(f"decode_token, warm cache:     {result['cached_per_s']:>10.0f}/s  ({result['cached_us']:.1f} us)")
+    print(f"user id + email, two decodes: {result['request_uncached_per_s']:>10.0f}/s")
+    print(f"user id + email, one request: {result['request_cached_per_s']:>10.0f}/s")
+
+if __name__ == "__main__":
+    main()
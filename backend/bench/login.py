@@ -0,0 +1,92 @@
+"""Login throughput with cached Google certificates versus a fetch per login.
+
+Starts the fake Google server (see bench.fakes) as its own uvicorn process,
+serving the certificate of a locally generated signing key with the given
+latency, then verifies one freshly signed ID token per login from a pool
+of threads, two ways:
+
+  cached     oauth.verify_id_token with a CertCache, as the callback does
+  per_login  the certs fetched from the fake before every verification,
+             as id_token.verify_oauth2_token did
+
+ID token verification is the part of /auth/google/callback the cert cache
+changes; the OAuth code exchange and the user upsert are left out. No
+database needed. Run from backend/:
+
+    python -m bench.login
+    python -m bench.login --logins 1000 --concurrency 50 --upstream-latency-ms 100 --json
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from bench.fakes import google_id_token, signing_key
+from bench.run import free_port, serve, stop, wait_until_serving
+
+def run_logins(verify, tokens, concurrency):
+    def login(token):
+        started = time.perf_counter()
+        verify(token)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(login, tokens))
+    elapsed = time.perf_counter() - started
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {"logins_per_s": len(latencies) / elapsed, "p50_ms": cuts[49] * 1000, "p99_ms": cuts[98] * 1000}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark login verification with cached and per-login Google certs")
+    parser.add_argument("--logins", type=int, default=300, help="logins per mode")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--upstream-latency-ms", type=float, default=50, help="latency of the fake certs endpoint")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+
+    signer, cert = signing_key("bench-key")
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as certs_file:
+        json.dump({"bench-key": cert}, certs_file)
+    port = free_port()
+    certs_url = f"http://127.0.0.1:{port}/oauth2/v1/certs"
+    env = {**os.environ, "FAKE_GOOGLE_CERTS_FILE": certs_file.name, "FAKE_GOOGLE_LATENCY_MS": str(args.upstream_latency_ms)}
+
+    from google.auth import jwt
+    from clients import get_google_client
+    from oauth import CertCache
+    import oauth
+
+    def verify_fetching(token):
+        response = get_google_client().get(certs_url)
+        response.raise_for_status()
+        return jwt.decode(token, certs=response.json(), audience="client-id")
+
+    process = serve("bench.fakes:google_app_from_env", port, env)
+    try:
+        wait_until_serving(process, certs_url)
+        tokens = [google_id_token(signer, email=f"bench-{i}@example.com") for i in range(args.logins)]
+        oauth.cert_cache = CertCache(url=certs_url)
+        results = {
+            "cached": run_logins(lambda token: oauth.verify_id_token(token, "client-id"), tokens, args.concurrency),
+            "per_login": run_logins(verify_fetching, tokens, args.concurrency),
+        }
+        results["cached"]["cert_fetches"] = oauth.cert_cache.stats()["fetches"]
+        results["per_login"]["cert_fetches"] = args.logins
+    finally:
+        stop([process])
+        os.unlink(certs_file.name)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<11}{'logins/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'fetches':>9}")
+    for mode, r in results.items():
+        print(f"{mode:<11}{r['logins_per_s']:>10.0f}{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['cert_fetches']:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Micro-benchmark of the request metrics overhead.
+
+Times an empty `with span(...)` block (two perf_counter calls and one
+Histogram.observe), observe alone, and rendering /metrics with a realistic
+number of series, against an empty loop. No database or upstreams needed.
+Run from backend/:
+
+    python -m bench.metrics
+    python -m bench.metrics --iterations 1000000 --json
+"""
+import argparse
+import json
+import sys
+import time
+
+def per_call_us(fn, iterations):
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, time.perf_counter() - started)
+    return best / iterations * 1e6
+
+def run(iterations, routes):
+    from metrics import Histogram, span
+
+    histogram = Histogram("bench_seconds", "Benchmark histogram", ("method", "route", "status"))
+    for i in range(routes):
+        for status in (200, 400, 500):
+            histogram.observe(0.01 * (i % 50), "GET", f"/route/{i}", status)
+
+    def empty_span():
+        with span("bench.stage"):
+            pass
+
+    baseline = per_call_us(lambda: None, iterations)
+    return {
+        "iterations": iterations,
+        "baseline_us": baseline,
+        "span_us": per_call_us(empty_span, iterations) - baseline,
+        "observe_us": per_call_us(lambda: histogram.observe(0.042, "GET", "/route/1", 200), iterations) - baseline,
+        "series": len(histogram._series),
+        "render_ms": per_call_us(histogram.render, max(iterations // 1000, 10)) / 1000,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the overhead of metrics spans and histograms")
+    parser.add_argument("--iterations", type=int, default=200000, help="calls per measurement")
+    parser.add_argument("--routes", type=int, default=30, help="routes in the rendered histogram (three statuses each)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+
+    result = run(args.iterations, args.routes)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"span overhead:    {result['span_us']:.2f} us per block")
+    print(f"observe:          {result['observe_us']:.2f} us per call")
+    print(f"render {result['series']} series: {result['render_ms']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
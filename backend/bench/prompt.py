@@ -0,0 +1,114 @@
+"""Prompt size and latency for light and dense calendars.
+
+Builds the generation prompt for the same schedule over calendars of
+growing density and reports the tokens at full calendar detail, the tokens
+actually sent under the budget with the number of busy ranges left in it,
+how many tasks had to be dropped and how long build_prompt took. With
+--complete each prompt is also sent through the configured LLM provider
+(LLM_MODELS etc., e.g. pointed at bench.fakes) and the completion latency
+is reported. Run from backend/:
+
+    python -m bench.prompt
+    python -m bench.prompt --calendars 10,200,2000 --budget 500 --tasks 5 --json
+"""
+from datetime import datetime, timedelta
+import argparse
+import json
+import random
+import sys
+import time
+
+import pytz
+
+WEEK_START = pytz.utc.localize(datetime(2025, 6, 2))
+DAYS = ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY"]
+
+def bench_schedule(tasks, rng):
+    return {
+        "time_zone": "UTC",
+        "start_time": "07:00",
+        "end_time": "22:00",
+        "active_days": DAYS,
+        "tasks": [
+            {"id": f"t{i}", "summary": f"Task {i}", "duration": {"hours": rng.choice((0, 1)), "minutes": rng.choice((15, 30, 45))},
+             "frequency": rng.randint(1, 4), "on_weekends": rng.random() < 0.5,
+             "preferred_time": rng.choice(("morning", "afternoon", "evening", None)),
+             "priority": rng.choice(("low", "medium", "high"))}
+            for i in range(tasks)
+        ],
+        "mandatory_tasks": [
+            {"summary": "Lecture", "start_time": "10:00", "end_time": "11:30", "start_day": "MONDAY", "end_day": "THURSDAY"},
+        ],
+    }
+
+# meetings within the schedule's hours, so every one of them can show up
+# as a busy block
+def bench_calendar(events, rng):
+    pairs = []
+    for _ in range(events):
+        start = WEEK_START + timedelta(days=rng.randrange(7), minutes=rng.randrange(7 * 60, 21 * 60, 5))
+        pairs.append((start.timestamp(), start.timestamp() + rng.choice((15, 30, 60)) * 60))
+    return pairs
+
+def busy_ranges(prompt):
+    busy = prompt.split("BUSY BLOCKS:\n")[1].split("\n\n")[0]
+    return 0 if busy == "none" else sum(line.count(",") + 1 for line in busy.splitlines())
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - started, result
+
+def run(events, tasks, budget, complete, seed):
+    from fastapi import HTTPException
+    from intervals import CalendarIntervals
+    from prompt import build_prompt
+
+    rng = random.Random(seed)
+    schedule = bench_schedule(tasks, rng)
+    busy = CalendarIntervals(bench_calendar(events, rng))
+    _, full_tokens, _ = build_prompt(schedule, busy, WEEK_START, budget=10 ** 9)
+    result = {"calendar_events": events, "tasks": tasks, "full_detail_tokens": full_tokens}
+    try:
+        seconds, (prompt, tokens, dropped) = timed(lambda: build_prompt(schedule, busy, WEEK_START, budget=budget))
+    except HTTPException as e:
+        return {**result, "error": e.detail}
+    result.update({"tokens": tokens, "busy_ranges": busy_ranges(prompt), "dropped_tasks": len(dropped), "build_ms": seconds * 1000})
+
+    if complete:
+        from llm import llm_provider
+
+        seconds, (text, model) = timed(lambda: llm_provider.complete(prompt))
+        result.update({"model": model, "completion_ms": seconds * 1000, "completion_chars": len(text or "")})
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark prompt size and latency for light and dense calendars")
+    parser.add_argument("--calendars", default="10,100,500,2000", help="comma separated calendar event counts")
+    parser.add_argument("--tasks", type=int, default=20, help="tasks in the schedule")
+    parser.add_argument("--budget", type=int, default=None, help="token budget (default PROMPT_TOKEN_BUDGET)")
+    parser.add_argument("--complete", action="store_true", help="also time a completion through the LLM provider")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+
+    from prompt import PROMPT_TOKEN_BUDGET
+
+    budget = args.budget or PROMPT_TOKEN_BUDGET
+    results = [run(int(events), args.tasks, budget, args.complete, args.seed) for events in args.calendars.split(",")]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"budget {budget} tokens")
+    print(f"{'events':>8}{'full tokens':>13}{'tokens':>8}{'ranges':>8}{'dropped':>9}{'build ms':>10}" + (f"{'llm ms':>9}" if args.complete else ""))
+    for r in results:
+        if "error" in r:
+            print(f"{r['calendar_events']:>8}{r['full_detail_tokens']:>13}  {r['error']}")
+            continue
+        line = f"{r['calendar_events']:>8}{r['full_detail_tokens']:>13}{r['tokens']:>8}{r['busy_ranges']:>8}{r['dropped_tasks']:>9}{r['build_ms']:>10.1f}"
+        if args.complete:
+            line += f"{r['completion_ms']:>9.0f}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
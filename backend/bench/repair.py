@@ -0,0 +1,99 @@
+"""Micro-benchmark of event repair against a calendar of thousands of events.
+
+Times repair_events (BusyIndex, O(log n) per lookup) against the same greedy
+pass done with linear scans over every busy interval, for growing calendar
+sizes. No database or upstreams needed. Run from backend/:
+
+    python -m bench.repair
+    python -m bench.repair --sizes 1000,5000,20000 --generated 200 --json
+"""
+from datetime import datetime, timedelta
+import argparse
+import json
+import random
+import sys
+import time
+
+import pytz
+
+WEEK_START = pytz.utc.localize(datetime(2025, 6, 2))
+SCHEDULE = {"time_zone": "UTC", "start_time": "06:00", "end_time": "23:00", "active_days": [], "mandatory_tasks": [], "tasks": []}
+
+def random_events(count, rng, prefix):
+    events = []
+    for i in range(count):
+        start = WEEK_START + timedelta(minutes=rng.randrange(0, 7 * 24 * 60 - 180, 5))
+        end = start + timedelta(minutes=rng.randrange(15, 180, 5))
+        events.append({
+            "summary": f"{prefix} {i}",
+            "start": {"dateTime": start.isoformat(), "timeZone": "UTC"},
+            "end": {"dateTime": end.isoformat(), "timeZone": "UTC"},
+        })
+    return events
+
+def linear_repair(candidates, busy, buffer, end_hour=23):
+    """The repairer's greedy pass with a plain list instead of a BusyIndex"""
+    taken = list(busy)
+    kept = []
+    for start, end in sorted(candidates):
+        duration = end - start
+        day_end = datetime.fromtimestamp(start, pytz.utc).replace(hour=end_hour, minute=0).timestamp()
+        candidate = start
+        moved = True
+        while moved:
+            moved = False
+            for s, e in taken:
+                if s < candidate + duration + buffer and e > candidate - buffer:
+                    candidate, moved = e + buffer, True
+        if candidate + duration > day_end:
+            continue
+        taken.append((candidate, candidate + duration))
+        kept.append((candidate, candidate + duration))
+    return kept
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def run(size, generated, repeat, seed):
+    from generate import repair_events
+    from intervals import normalize_events
+    from solver import BUFFER_MINUTES
+
+    rng = random.Random(seed)
+    calendar = random_events(size, rng, "Busy")
+    tasks = random_events(generated, rng, "Task")
+    busy = normalize_events(calendar)
+    candidates = [bounds for bounds in normalize_events(tasks)]
+
+    return {
+        "calendar_events": size,
+        "generated_events": generated,
+        "normalize_ms": timed(lambda: normalize_events(calendar), repeat) * 1000,
+        "repair_ms": timed(lambda: repair_events(tasks, SCHEDULE, busy, WEEK_START), repeat) * 1000,
+        "linear_repair_ms": timed(lambda: linear_repair(candidates, list(busy), BUFFER_MINUTES * 60), repeat) * 1000,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark event repair against large calendars")
+    parser.add_argument("--sizes", default="100,1000,5000", help="comma separated calendar sizes")
+    parser.add_argument("--generated", type=int, default=100, help="generated events to repair")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the best is reported")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+
+    results = [run(int(size), args.generated, args.repeat, args.seed) for size in args.sizes.split(",")]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'events':>8}{'generated':>11}{'normalize ms':>14}{'repair ms':>11}{'linear ms':>11}")
+    for r in results:
+        print(f"{r['calendar_events']:>8}{r['generated_events']:>11}{r['normalize_ms']:>14.1f}{r['repair_ms']:>11.1f}{r['linear_repair_ms']:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""Load test for the backend against local fakes of every upstream.
+
+Starts fake Google (OAuth, certs, Calendar) and OpenAI-compatible servers
+and the app itself as separate uvicorn processes, configured through
+environment variables like a deployment, with the app pointed at the fakes
+and at a local Postgres. Then seeds benchmark users, drives each scenario at
+a fixed concurrency and reports p50/p95/p99 latency and throughput. Run from
+backend/ with the usual database env vars set:
+
+    python -m bench.run --requests 500 --concurrency 20
+    python -m bench.run --scenarios generate --upstream-latency-ms 200 --upstream-error-rate 0.05
+    python -m bench.run --json > results.json
+
+To see how many concurrent users one process can take with generation in
+the request versus in background jobs, compare at high concurrency:
+
+    python -m bench.run --scenarios generate,jobs --concurrency 200 --llm-latency-ms 5000
+
+The jobs scenario enqueues with POST /generate/jobs and polls until the job
+finishes; its latency is enqueue to result, accept_* is the POST alone.
+get_during_sync measures /schedule/get while the same number of clients keep
+/sync/schedule busy, to show whether slow syncs starve fast reads.
+
+The database must be disposable: benchmark users (bench-N@example.com) and
+their schedules are created or overwritten.
+"""
+from datetime import datetime, timedelta, timezone
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCENARIOS = ("schedule_get", "schedule_save", "generate", "jobs", "sync", "get_during_sync")
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+# seconds between polls of a background generation job
+JOB_POLL_INTERVAL = 0.05
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def serve(target, port, env, workers=1):
+    """Run an ASGI app (module:attribute, or a factory) in its own uvicorn process"""
+    command = [sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning", "--workers", str(workers)]
+    if target.endswith("_from_env"):
+        command.append("--factory")
+    # what a deployment sets for --workers; the app keys per-process caches off it
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env={**env, "WEB_CONCURRENCY": str(workers)})
+
+def wait_until_serving(process, url, timeout=60):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server for {url} exited with status {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server for {url} did not start within {timeout} seconds")
+
+def stop(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def configure_environment(google_url, openai_url, args):
+    """Environment for the fakes and the app; the bench process uses it too"""
+    env = dict(os.environ)
+    env.update({
+        "GOOGLE_CALENDAR_API_URL": f"{google_url}/calendar/v3",
+        "GOOGLE_TOKEN_URL": f"{google_url}/token",
+        "GOOGLE_CERTS_URL": f"{google_url}/oauth2/v1/certs",
+        "OPENROUTER_BASE_URL": f"{openai_url}/v1",
+        "FAKE_GOOGLE_LATENCY_MS": str(args.upstream_latency_ms),
+        "FAKE_GOOGLE_JITTER_MS": str(args.upstream_jitter_ms),
+        "FAKE_GOOGLE_ERROR_RATE": str(args.upstream_error_rate),
+        "FAKE_GOOGLE_EVENTS_PER_WEEK": str(args.calendar_events),
+        "FAKE_OPENAI_LATENCY_MS": str(args.llm_latency_ms),
+        "FAKE_OPENAI_JITTER_MS": str(args.upstream_jitter_ms),
+        "FAKE_OPENAI_ERROR_RATE": str(args.upstream_error_rate),
+    })
+    env.setdefault("OPENROUTER_API_KEY", "bench")
+    env.setdefault("JWT_SECRET", "bench-secret")
+    os.environ.update(env)
+    return env
+
+def bench_schedule(index):
+    return {
+        "name": f"Bench schedule {index}",
+        "time_zone": "UTC",
+        "start_time": "08:00",
+        "end_time": "22:00",
+        "active_days": ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY"],
+        "tasks": [
+            {"id": f"t{i}", "summary": f"Task {i}", "duration": {"hours": 0, "minutes": 45}, "frequency": 3,
+             "priority": ("high", "medium", "low")[i % 3], "preferred_time": ("morning", "afternoon", "evening")[i % 3],
+             "on_weekends": i % 2 == 0}
+            for i in range(6)
+        ],
+        "mandatory_tasks": [
+            {"id": "m0", "summary": "Lunch", "start_time": "12:00", "end_time": "13:00", "start_day": "MONDAY", "end_day": "FRIDAY"}
+        ],
+    }
+
+def seed_users(count, prefix="bench"):
+    """Create (or reset) count users <prefix>-N@example.com with fresh Google tokens and a schedule; returns their JWTs"""
+    from db import get_db
+    from utils import create_token
+
+    expiry = datetime.now(timezone.utc) + timedelta(hours=1)
+    scopes = ["openid", "https://www.googleapis.com/auth/userinfo.email", "https://www.googleapis.com/auth/calendar.events"]
+    tokens = []
+    with get_db() as conn, conn.cursor() as cursor:
+        for index in range(count):
+            email = f"{prefix}-{index}@example.com"
+            cursor.execute("""
+                INSERT INTO users (email, access_token, refresh_token, token_expiry, granted_scopes)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (email) DO UPDATE SET
+                    access_token = EXCLUDED.access_token,
+                    refresh_token = EXCLUDED.refresh_token,
+                    token_expiry = EXCLUDED.token_expiry,
+                    granted_scopes = EXCLUDED.granted_scopes
+                RETURNING id
+            """, (email, "fake-access", "fake-refresh", expiry, scopes))
+            user_id = str(cursor.fetchone()[0])
+            schedule = bench_schedule(index)
+            cursor.execute("""
+                INSERT INTO schedules (user_id, name, start_time, end_time, active_days, tasks, mandatory_tasks, time_zone, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, now(), now())
+                ON CONFLICT (user_id) DO UPDATE SET
+                    name = EXCLUDED.name, start_time = EXCLUDED.start_time, end_time = EXCLUDED.end_time,
+                    active_days = EXCLUDED.active_days, tasks = EXCLUDED.tasks,
+                    mandatory_tasks = EXCLUDED.mandatory_tasks, time_zone = EXCLUDED.time_zone, updated_at = now()
+            """, (user_id, schedule["name"], schedule["start_time"], schedule["end_time"], json.dumps(schedule["active_days"]),
+                  json.dumps(schedule["tasks"]), json.dumps(schedule["mandatory_tasks"]), schedule["time_zone"]))
+            tokens.append(create_token({"user_id": user_id, "email": email}))
+        conn.commit()
+    return tokens
+
+def sync_events(sequence):
+    # unique summaries so every request pushes new events instead of being
+    # skipped as already synced
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return [
+        {
+            "summary": f"Bench sync {sequence}-{i}",
+            "start": {"dateTime": (start + timedelta(hours=i)).isoformat(), "timeZone": "UTC"},
+            "end": {"dateTime": (start + timedelta(hours=i, minutes=30)).isoformat(), "timeZone": "UTC"},
+        }
+        for i in range(3)
+    ]
+
+def build_request(scenario, token_index, sequence, args):
+    if scenario == "schedule_get":
+        return "GET", "/schedule/get", None
+    if scenario == "schedule_save":
+        return "POST", "/schedule/save", bench_schedule(token_index)
+    if scenario == "generate":
+        refresh = "" if args.use_cache else "&refresh=true"
+        return "GET", f"/generate/schedule?mode={args.mode}{refresh}", None
+    if scenario == "jobs":
+        return "POST", f"/generate/jobs?mode={args.mode}", None
+    if scenario == "sync":
+        return "POST", "/sync/schedule", sync_events(sequence)
+    raise ValueError(scenario)
+
+async def keep_busy(base_url, scenario, tokens, args, done):
+    """Send scenario requests from args.concurrency clients until done is set"""
+    import httpx
+
+    sequence = itertools.count()
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        async def worker():
+            while not done.is_set():
+                n = next(sequence)
+                method, path, body = build_request(scenario, n % len(tokens), n, args)
+                try:
+                    await client.request(method, path, json=body, headers={"Cookie": f"token={tokens[n % len(tokens)]}"})
+                except httpx.HTTPError:
+                    pass
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+async def measure(base_url, scenario, tokens, args):
+    if scenario == "get_during_sync":
+        return await run_get_during_sync(base_url, tokens, args)
+    return await run_scenario(base_url, scenario, tokens, args)
+
+async def run_get_during_sync(base_url, tokens, args):
+    done = asyncio.Event()
+    background = asyncio.create_task(keep_busy(base_url, "sync", tokens, args, done))
+    try:
+        # give the syncs a moment to fill the server before measuring
+        await asyncio.sleep(0.5)
+        result = await run_scenario(base_url, "schedule_get", tokens, args)
+    finally:
+        done.set()
+        await background
+    result["scenario"] = "get_during_sync"
+    return result
+
+async def wait_for_job(client, job_id, headers):
+    """Poll a generation job until it finishes; returns "succeeded" or "failed" """
+    while True:
+        response = await client.get(f"/generate/jobs/{job_id}", headers=headers)
+        if response.status_code != 200:
+            return response.status_code
+        status = response.json()["status"]
+        if status in ("succeeded", "failed"):
+            return status
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+
+async def run_scenario(base_url, scenario, tokens, args):
+    import httpx
+
+    sequence = itertools.count()
+    latencies, accepted, statuses = [], [], {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        async def worker():
+            while (n := next(sequence)) < args.requests:
+                token_index = n % len(tokens)
+                method, path, body = build_request(scenario, token_index, n, args)
+                started = time.perf_counter()
+                headers = {"Cookie": f"token={tokens[token_index]}"}
+                try:
+                    response = await client.request(method, path, json=body, headers=headers)
+                    status = response.status_code
+                    if scenario == "jobs" and status == 202:
+                        accepted.append(time.perf_counter() - started)
+                        status = await wait_for_job(client, response.json()["job_id"], headers)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = summarize(scenario, latencies, statuses, elapsed)
+    if accepted:
+        cuts = percentiles(accepted)
+        result.update({"accept_p50_ms": cuts[49] * 1000, "accept_p99_ms": cuts[98] * 1000})
+    return result
+
+def percentiles(latencies):
+    return statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+
+def summarize(scenario, latencies, statuses, elapsed):
+    cuts = percentiles(latencies)
+    return {
+        "scenario": scenario,
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if not (status == "succeeded" or isinstance(status, int) and status < 400)),
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+def print_table(results):
+    print(f"{'scenario':<16}{'requests':>9}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for r in results:
+        print(f"{r['scenario']:<16}{r['requests']:>9}{r['errors']:>8}{r['throughput_rps']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}")
+    for r in results:
+        if "accept_p50_ms" in r:
+            print(f"{r['scenario']}: enqueue accepted in p50 {r['accept_p50_ms']:.1f} ms, p99 {r['accept_p99_ms']:.1f} ms")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the backend against local upstream fakes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--users", type=int, default=20, help="benchmark users the requests rotate through")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per scenario")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--mode", default="llm", choices=("llm", "solver", "hybrid"), help="generation mode")
+    parser.add_argument("--use-cache", action="store_true", help="let generation hit the cache instead of ?refresh=true")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=10)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--calendar-events", type=int, default=20, help="calendar events per week in the fake calendar")
+    parser.add_argument("--app-workers", type=int, default=1, help="uvicorn worker processes for the app")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv if argv is not None else sys.argv[1:])
+    scenarios = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    google_port, openai_port, app_port = free_port(), free_port(), free_port()
+    google_url, openai_url = f"http://127.0.0.1:{google_port}", f"http://127.0.0.1:{openai_port}"
+    base_url = f"http://127.0.0.1:{app_port}"
+    env = configure_environment(google_url, openai_url, args)
+
+    from db import close_pool
+
+    processes = []
+    try:
+        processes.append(serve("bench.fakes:google_app_from_env", google_port, env))
+        processes.append(serve("bench.fakes:openai_app_from_env", openai_port, env))
+        processes.append(serve("main:app", app_port, env, args.app_workers))
+        wait_until_serving(processes[0], f"{google_url}/oauth2/v1/certs")
+        wait_until_serving(processes[1], f"{openai_url}/docs")
+        # the app runs its migrations on startup, so seed only once it serves
+        wait_until_serving(processes[2], f"{base_url}/metrics")
+
+        tokens = seed_users(args.users)
+        results = []
+        for scenario in scenarios:
+            if args.warmup:
+                warmup = argparse.Namespace(**{**vars(args), "requests": args.warmup})
+                asyncio.run(measure(base_url, scenario, tokens, warmup))
+            results.append(asyncio.run(measure(base_url, scenario, tokens, args)))
+    finally:
+        stop(processes)
+        close_pool()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Save latency against task count: full POST versus PATCH.
+
+For each task count, stores a schedule with that many tasks for one
+benchmark user, then times editing a single task three ways through the
+app in-process (TestClient, no uvicorn):
+
+  post            POST /schedule/save with the whole schedule
+  patch_update    PATCH /schedule/save with one task update op
+  patch_name      PATCH /schedule/save changing only the name
+
+Each PATCH sends the updated_at returned by the previous one, as a client
+would. Postgres comes from the usual database env vars and must be
+disposable (bench-save-0@example.com is created or overwritten); migrations
+are run first. Run from backend/:
+
+    python -m bench.save
+    python -m bench.save --tasks 10,100,1000 --requests 200 --json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from bench.serialize import schedule_body
+
+def timed_requests(send, requests):
+    latencies = []
+    for sequence in range(requests):
+        started = time.perf_counter()
+        response = send(sequence)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.request.method} {response.request.url.path} returned {response.status_code}: {response.text}")
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {"p50_ms": cuts[49] * 1000, "p95_ms": cuts[94] * 1000}
+
+def run(client, tasks, requests):
+    body = schedule_body(tasks)
+    response = client.post("/schedule/save", json=body)
+    response.raise_for_status()
+
+    def post(sequence):
+        body["tasks"][0]["summary"] = f"Task 0 ({sequence})"
+        return client.post("/schedule/save", json=body)
+
+    def patch(changes):
+        def send(sequence):
+            nonlocal updated_at
+            response = client.patch("/schedule/save", json={"updated_at": updated_at, **changes(sequence)})
+            if response.status_code == 200:
+                updated_at = response.json()["updated_at"]
+            return response
+        return send
+
+    # the POSTs move updated_at along, so PATCH starts from a fresh read
+    results = {"tasks": tasks, "body_kb": len(json.dumps(body)) / 1024, "post": timed_requests(post, requests)}
+    updated_at = client.get("/schedule/get").json()["updated_at"]
+    results["patch_update"] = timed_requests(patch(lambda sequence: {
+        "task_ops": [{"op": "update", "id": "t0", "value": {"summary": f"Task 0 ({sequence})"}}]
+    }), requests)
+    results["patch_name"] = timed_requests(patch(lambda sequence: {"name": f"Bench schedule ({sequence})"}), requests)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark schedule save latency, full POST versus PATCH")
+    parser.add_argument("--tasks", default="10,100,500", help="comma separated task counts")
+    parser.add_argument("--requests", type=int, default=100, help="timed requests per method and task count")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+
+    from fastapi.testclient import TestClient
+    from bench.run import seed_users
+    from db import close_pool
+    from main import app
+    from migrate import migrate
+
+    try:
+        migrate()
+        [token] = seed_users(1, prefix="bench-save")
+        client = TestClient(app, cookies={"token": token})
+        results = [run(client, int(tasks), args.requests) for tasks in args.tasks.split(",")]
+    finally:
+        close_pool()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'tasks':>6}{'body KB':>9}{'post p50':>10}{'post p95':>10}{'update p50':>12}{'update p95':>12}{'name p50':>10}{'name p95':>10}")
+    for r in results:
+        print(f"{r['tasks']:>6}{r['body_kb']:>9.1f}{r['post']['p50_ms']:>10.1f}{r['post']['p95_ms']:>10.1f}"
+              f"{r['patch_update']['p50_ms']:>12.1f}{r['patch_update']['p95_ms']:>12.1f}"
+              f"{r['patch_name']['p50_ms']:>10.1f}{r['patch_name']['p95_ms']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Serialize/deserialize throughput for schedules with hundreds of tasks.
+
+Measures the request side of /schedule/save (JSON body to a validated
+Schedule, then the JSONB strings written to Postgres) and the response side
+of /schedule/get (a stored row to JSON bytes through the StoredSchedule
+response model), next to the plain json module for reference. No database
+or app server needed. Run from backend/:
+
+    python -m bench.serialize
+    python -m bench.serialize --tasks 100,500,2000 --json
+"""
+from datetime import datetime, timezone
+import argparse
+import json
+import sys
+import time
+import uuid
+
+def schedule_body(tasks):
+    return {
+        "name": "Bench schedule",
+        "time_zone": "Europe/Berlin",
+        "start_time": "08:00",
+        "end_time": "22:00",
+        "active_days": ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY"],
+        "tasks": [
+            {"id": f"t{i}", "summary": f"Task {i}", "duration": {"hours": i % 3, "minutes": 15 * (i % 4)},
+             "on_weekends": i % 2 == 0, "preferred_time": ("morning", "afternoon", "evening", "")[i % 4],
+             "frequency": 1 + i % 5, "color": "#3366ff", "priority": ("low", "medium", "high")[i % 3]}
+            for i in range(tasks)
+        ],
+        "mandatory_tasks": [
+            {"id": f"m{i}", "summary": f"Class {i}", "start_time": f"{8 + i % 10:02d}:00", "end_time": f"{9 + i % 10:02d}:30",
+             "start_day": "MONDAY", "end_day": "FRIDAY", "location": "Room 1"}
+            for i in range(tasks // 10)
+        ],
+    }
+
+def stored_row(body):
+    now = datetime.now(timezone.utc)
+    return {**body, "id": str(uuid.uuid4()), "user_id": str(uuid.uuid4()), "created_at": now, "updated_at": now}
+
+def rate(fn, seconds):
+    """Calls per second of fn, run for about `seconds`"""
+    calls, started = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - started) < seconds:
+        fn()
+        calls += 1
+    return calls / elapsed
+
+def run(tasks, seconds):
+    from models import Schedule, StoredSchedule, TASKS
+    from schedule import format_tasks_for_db, format_mandatory_tasks_for_db
+    from pydantic import TypeAdapter
+
+    body = schedule_body(tasks)
+    raw = json.dumps(body).encode()
+    row = stored_row(Schedule.model_validate(body).model_dump(mode="json", exclude_none=True))
+    response = TypeAdapter(StoredSchedule)
+
+    def save():
+        data = Schedule.model_validate_json(raw).model_dump(mode="json", exclude_none=True)
+        format_tasks_for_db(data["tasks"])
+        format_mandatory_tasks_for_db(data["mandatory_tasks"])
+
+    return {
+        "tasks": tasks,
+        "body_kb": len(raw) / 1024,
+        "save_per_s": rate(save, seconds),
+        "validate_per_s": rate(lambda: Schedule.model_validate_json(raw), seconds),
+        "tasks_dump_per_s": rate(lambda: TASKS.dump_json(TASKS.validate_python(body["tasks"]), exclude_none=True), seconds),
+        "get_response_per_s": rate(lambda: response.dump_json(response.validate_python(row)), seconds),
+        "json_loads_dumps_per_s": rate(lambda: json.dumps(json.loads(raw)), seconds),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark schedule (de)serialization")
+    parser.add_argument("--tasks", default="10,100,500", help="comma separated task counts")
+    parser.add_argument("--seconds", type=float, default=1.0, help="time spent on each measurement")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+
+    results = [run(int(tasks), args.seconds) for tasks in args.tasks.split(",")]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'tasks':>6}{'body KB':>9}{'save/s':>10}{'validate/s':>12}{'tasks dump/s':>14}{'get/s':>10}{'json/s':>10}")
+    for r in results:
+        print(f"{r['tasks']:>6}{r['body_kb']:>9.1f}{r['save_per_s']:>10.0f}{r['validate_per_s']:>12.0f}"
+              f"{r['tasks_dump_per_s']:>14.0f}{r['get_response_per_s']:>10.0f}{r['json_loads_dumps_per_s']:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Micro-benchmark of the local solver on synthetic schedules.
+
+Times solve_week for growing task counts against a week of randomly placed
+calendar events, and reports how many task occurrences were placed out of
+those requested, since the free time runs out long before the largest task
+counts. No database or upstreams needed. Run from backend/:
+
+    python -m bench.solver
+    python -m bench.solver --tasks 10,100,1000,5000 --calendar 500 --json
+"""
+from datetime import datetime, timedelta
+import argparse
+import json
+import random
+import sys
+import time
+
+import pytz
+
+TIME_ZONE = "Europe/Berlin"
+WEEK_START = pytz.timezone(TIME_ZONE).localize(datetime(2025, 6, 2))
+DAYS = ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY"]
+
+def synthetic_schedule(tasks, rng):
+    return {
+        "time_zone": TIME_ZONE,
+        "start_time": "07:00",
+        "end_time": "22:00",
+        "active_days": DAYS,
+        "tasks": [
+            {"id": f"t{i}", "summary": f"Task {i}",
+             "duration": {"hours": rng.choice((0, 0, 1, 2)), "minutes": rng.choice((15, 30, 45))},
+             "frequency": rng.randint(1, 5), "on_weekends": rng.random() < 0.5,
+             "preferred_time": rng.choice(("morning", "afternoon", "evening", None)),
+             "priority": rng.choice(("low", "medium", "high"))}
+            for i in range(tasks)
+        ],
+        "mandatory_tasks": [
+            {"summary": "Lecture", "start_time": "10:00", "end_time": "11:30", "start_day": "MONDAY", "end_day": "THURSDAY"},
+            {"summary": "Team sync", "start_time": "15:00", "end_time": "15:30", "start_day": "TUESDAY", "end_day": "TUESDAY"},
+        ],
+    }
+
+def synthetic_calendar(events, rng):
+    pairs = []
+    for _ in range(events):
+        start = WEEK_START + timedelta(minutes=rng.randrange(0, 7 * 24 * 60 - 120, 15))
+        pairs.append((start.timestamp(), start.timestamp() + rng.choice((30, 60, 90)) * 60))
+    return pairs
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def run(tasks, calendar, repeat, seed):
+    from intervals import CalendarIntervals
+    from solver import solve_week
+
+    rng = random.Random(seed)
+    schedule = synthetic_schedule(tasks, rng)
+    busy = CalendarIntervals(synthetic_calendar(calendar, rng))
+    seconds, events = timed(lambda: solve_week(schedule, busy, WEEK_START), repeat)
+    requested = sum(task["frequency"] for task in schedule["tasks"])
+    mandatory = sum(1 for event in events if event["summary"] in ("Lecture", "Team sync"))
+    return {
+        "tasks": tasks,
+        "calendar_events": calendar,
+        "solve_ms": seconds * 1000,
+        "requested": requested,
+        "placed": len(events) - mandatory,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the local solver on synthetic schedules")
+    parser.add_argument("--tasks", default="10,50,200,1000", help="comma separated task counts")
+    parser.add_argument("--calendar", type=int, default=100, help="busy calendar events in the week")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the best is reported")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv if argv is not None else sys.argv[1:])
+
+    results = [run(int(tasks), args.calendar, args.repeat, args.seed) for tasks in args.tasks.split(",")]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'tasks':>7}{'calendar':>10}{'solve ms':>10}{'requested':>11}{'placed':>8}")
+    for r in results:
+        print(f"{r['tasks']:>7}{r['calendar_events']:>10}{r['solve_ms']:>10.1f}{r['requested']:>11}{r['placed']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+load_dotenv()
+
+class InMemoryBackend:
+    """Process-local LRU with a per-entry TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+class RedisBackend:
+    """Shared backend for running several API processes; size is bounded by Redis' maxmemory policy"""
+
+    def __init__(self, url: str, ttl: float, prefix: str = "planweekly:generate:", client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("GENERATION_CACHE_URL is set but the redis package is not installed (pip install -r requirements-redis.txt)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value, default=str), ex=int(self.ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+class GenerationCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            # a broken cache must never fail a generation
+            value = None
+            with self._lock:
+                self.errors += 1
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, value)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "backend": type(self.backend).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+            }
+        if isinstance(self.backend, InMemoryBackend):
+            stats["size"] = len(self.backend)
+        return stats
+
+# A generated week only depends on the schedule row and the calendar events
+# of that week, so key on the schedule's updated_at and a hash of the events
+def generation_key(user_id, week_start, updated_at, events, mode) -> str:
+    events_hash = hashlib.sha256(json.dumps(events, sort_keys=True, default=str).encode()).hexdigest()
+    return f"{user_id}:{week_start.date().isoformat()}:{updated_at}:{mode}:{events_hash}"
+
+def create_generation_cache() -> GenerationCache:
+    ttl = float(os.getenv("GENERATION_CACHE_TTL", "3600"))
+    url = os.getenv("GENERATION_CACHE_URL")
+    if url:
+        return GenerationCache(RedisBackend(url, ttl))
+    return GenerationCache(InMemoryBackend(int(os.getenv("GENERATION_CACHE_SIZE", "256")), ttl))
+
+generation_cache = create_generation_cache()
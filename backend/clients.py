@@ -0,0 +1,132 @@
+from dotenv import load_dotenv
+from openai import OpenAI
+import httpx
+import os
+import threading
+import time
+
+try:
+    import h2  # noqa: F401 - httpx only negotiates HTTP/2 when h2 is installed
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+load_dotenv()
+
+GOOGLE_CALENDAR_API_URL = os.getenv("GOOGLE_CALENDAR_API_URL", "https://www.googleapis.com/calendar/v3")
+GOOGLE_TOKEN_URL = os.getenv("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+HTTP_TIMEOUT = httpx.Timeout(
+    float(os.getenv("HTTP_TIMEOUT", "30")),
+    connect=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+)
+LLM_TIMEOUT = httpx.Timeout(
+    float(os.getenv("LLM_TIMEOUT", "120")),
+    connect=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+)
+HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+)
+
+class UpstreamStats:
+    """Request counts and time-to-response-headers per upstream"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, upstream: str, seconds: float, failed: bool):
+        with self._lock:
+            stats = self._stats.setdefault(upstream, {"requests": 0, "errors": 0, "seconds_total": 0.0, "seconds_max": 0.0})
+            stats["requests"] += 1
+            stats["errors"] += int(failed)
+            stats["seconds_total"] += seconds
+            stats["seconds_max"] = max(stats["seconds_max"], seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {upstream: dict(stats) for upstream, stats in self._stats.items()}
+
+upstream_stats = UpstreamStats()
+
+def _hooks(upstream: str, is_async: bool = False):
+    def on_request(request):
+        request.extensions["started"] = time.perf_counter()
+
+    def on_response(response):
+        started = response.request.extensions.get("started", time.perf_counter())
+        upstream_stats.record(upstream, time.perf_counter() - started, response.status_code >= 500)
+
+    if is_async:
+        async def on_request_async(request):
+            on_request(request)
+
+        async def on_response_async(response):
+            on_response(response)
+
+        return {"request": [on_request_async], "response": [on_response_async]}
+    return {"request": [on_request], "response": [on_response]}
+
+# Application-lifetime clients, created in the app lifespan (or lazily on
+# first use) so outbound calls reuse keep-alive connections instead of paying
+# DNS + TCP + TLS setup on every request
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _get(name, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+def get_google_client() -> httpx.Client:
+    return _get("google", lambda: httpx.Client(
+        http2=HTTP2, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS, event_hooks=_hooks("google")
+    ))
+
+def get_google_async_client() -> httpx.AsyncClient:
+    return _get("google_async", lambda: httpx.AsyncClient(
+        http2=HTTP2, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS, event_hooks=_hooks("google", is_async=True)
+    ))
+
+def get_openai_client() -> OpenAI:
+    return _get("openrouter", lambda: OpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        timeout=LLM_TIMEOUT,
+        # retries and fallbacks are handled by llm.LLMProvider
+        max_retries=0,
+        http_client=httpx.Client(http2=HTTP2, timeout=LLM_TIMEOUT, limits=HTTP_LIMITS, event_hooks=_hooks("openrouter"))
+    ))
+
+# OpenAI-compatible endpoints other than OpenRouter, one client per base URL
+def get_llm_client(base_url=None) -> OpenAI:
+    if base_url is None or base_url == OPENROUTER_BASE_URL:
+        return get_openai_client()
+    return _get(f"llm:{base_url}", lambda: OpenAI(
+        base_url=base_url,
+        api_key=os.getenv("LLM_API_KEY") or os.getenv("OPENROUTER_API_KEY"),
+        timeout=LLM_TIMEOUT,
+        max_retries=0,
+        http_client=httpx.Client(http2=HTTP2, timeout=LLM_TIMEOUT, limits=HTTP_LIMITS, event_hooks=_hooks(base_url))
+    ))
+
+def init_clients():
+    get_google_client()
+    get_google_async_client()
+    get_openai_client()
+
+async def close_clients():
+    with _clients_lock:
+        clients = dict(_clients)
+        _clients.clear()
+    for name, client in clients.items():
+        if isinstance(client, httpx.AsyncClient):
+            await client.aclose()
+        else:
+            client.close()
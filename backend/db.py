@@ -0,0 +1,156 @@
+from contextlib import contextmanager
+from fastapi import HTTPException
+from dotenv import load_dotenv
+from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+import os
+import threading
+import time
+
+load_dotenv()
+
+
+class _CountingPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool that counts how many backends it has opened"""
+
+    def __init__(self, *args, **kwargs):
+        self.created = 0
+        super().__init__(*args, **kwargs)
+
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        self.created += 1
+        return conn
+
+
+class ConnectionPool:
+    """Bounded Postgres pool that waits for a free connection instead of failing"""
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float, **connect_kwargs):
+        self._pool = _CountingPool(minconn, maxconn, **connect_kwargs)
+        # psycopg2 raises PoolError when exhausted, so gate checkouts with a semaphore
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def getconn(self):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise HTTPException(status_code=503, detail="The server is busy. Please try again shortly.")
+        waited = time.perf_counter() - started
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return conn
+
+    def putconn(self, conn):
+        discard = bool(conn.closed)
+        if not discard and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            # never hand out a connection with a half-finished transaction
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        try:
+            self._pool.putconn(conn, close=discard)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+                if discard:
+                    self.discarded += 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        except BaseException:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            raise
+        finally:
+            self.putconn(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_size": self.maxconn,
+                "in_use": self.in_use,
+                "idle": len(self._pool._pool),
+                "created": self._pool.created,
+                "discarded": self.discarded,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+    def close(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool() -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                minconn=int(os.getenv("DB_POOL_MIN", "1")),
+                maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                user=os.getenv("user"),
+                password=os.getenv("password"),
+                host=os.getenv("host"),
+                port=os.getenv("port"),
+                dbname=os.getenv("dbname")
+            )
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_pool() -> ConnectionPool:
+    return _pool or init_pool()
+
+
+# usage: with get_db() as conn: ...
+# the connection is always returned to the pool, rolled back if the block raised
+@contextmanager
+def get_db():
+    with get_pool().connection() as conn:
+        yield conn
+
+
+def pool_stats() -> dict:
+    if _pool is None:
+        return {}
+    return _pool.stats()
@@ -1,11 +1,20 @@
-from fastapi import APIRouter, Request, HTTPException   
+from fastapi import APIRouter, Request, Response, HTTPException   
+from fastapi.responses import StreamingResponse
 from os import getenv
 from dotenv import load_dotenv
-from psycopg2.extras import RealDictCursor
-from utils import get_db_connection, get_user_id, refresh_access_token
-from openai import OpenAI
-import requests
-from datetime import datetime, timedelta, timezone
+from utils import get_user_id, get_time_zone, get_week_start
+from tokens import token_manager
+from solver import solve_week, mandatory_events, to_minutes, BUFFER_MINUTES
+from intervals import CalendarIntervals, normalize_events, event_bounds
+from cache import generation_cache, generation_key
+from jsonstream import JSONArrayStream
+from prompt import build_prompt
+from store import fetch_user_and_schedule
+from mirror import calendar_events, mirror_horizon
+from llm import llm_provider
+from metrics import span
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 import pytz
 import json
 
@@ -13,195 +22,306 @@ load_dotenv()
 
 router = APIRouter()
 
+GENERATE_MODES = ("solver", "llm", "hybrid")
+
+# /generate/range limits: how many weeks one request may cover and how many
+# of them are generated at the same time
+MAX_GENERATE_WEEKS = int(getenv("MAX_GENERATE_WEEKS", "8"))
+GENERATE_WEEK_CONCURRENCY = int(getenv("GENERATE_WEEK_CONCURRENCY", "4"))
+
+def get_mode(request: Request):
+    mode = request.query_params.get("mode", getenv("GENERATE_MODE", "llm"))
+    if mode not in GENERATE_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode: {mode}. Expected one of {', '.join(GENERATE_MODES)}")
+    return mode
+
+# mode=llm asks the model for the week, mode=solver uses the local scheduling
+# engine, and mode=hybrid tries the model and falls back to the solver if the
+# model fails or returns something unusable.
+# Results are cached until the schedule or the week's calendar changes;
+# ?refresh=true skips the cache and generates a new week.
+# X-Generated-By names the model that wrote the week, or "solver" / "cache".
+# X-Dropped-Tasks is a JSON list of the tasks left out of the prompt to fit
+# the token budget, when there were any.
 @router.get("/generate/schedule")
-def generate_schedule(request: Request):
+def generate_schedule(request: Request, response: Response):
     user_id = get_user_id(request)
     if not user_id:
         raise HTTPException(status_code=401, detail="Not logged in. Please log in again")
-    
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
 
-    cursor.execute("SELECT * FROM schedules WHERE user_id = %s", (user_id,))
-    schedule = cursor.fetchone()
-    if not schedule:
-        raise HTTPException(status_code=401, detail="No schedule found. Please create a schedule first.")
+    mode = get_mode(request)
+    generated, generated_by, dropped = generate_week(user_id, mode, refresh=request.query_params.get("refresh") == "true")
+    response.headers.update(generation_headers(generated_by, dropped))
+    return generated
 
-    cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-    user = cursor.fetchone()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found. Please log in again.")
-    
-    access_token = user["access_token"]
-    if user["token_expiry"] < datetime.now(timezone.utc):
-        token = refresh_access_token(user["refresh_token"])
-        if not token:
-            raise HTTPException(status_code=401, detail="Failed to refresh access token. Please log in again.")
-        access_token = token["access_token"]
-        token_expiry = datetime.now(timezone.utc) + timedelta(seconds=token["expires_in"])
-        cursor.execute("UPDATE users SET access_token = %s, token_expiry = %s WHERE id = %s", (access_token, token_expiry, user_id))
-    conn.commit()
-    
-    time_zone = schedule["time_zone"]
-    calendar = get_google_calendar_events(access_token, time_zone)
-    events = extract_events(calendar)
-
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=getenv("OPENROUTER_API_KEY")
+# returns (events, what generated them, summaries of tasks dropped from the prompt)
+def generate_week(user_id, mode, refresh=False):
+    schedule, busy = load_generation_inputs(user_id)
+    week_start = get_week_start(schedule["time_zone"])
+    return generate_for_week(user_id, schedule, busy, week_start, mode, refresh)
+
+# Generates one week from already loaded inputs; busy may cover a longer
+# range, anything outside the week is ignored by the solver and repairer
+def generate_for_week(user_id, schedule, busy, week_start, mode, refresh=False):
+    cache_key = generation_key(user_id, week_start, schedule["updated_at"], list(busy), mode)
+    if not refresh:
+        cached = generation_cache.get(cache_key)
+        if cached is not None:
+            return cached["events"], "cache", cached["dropped_tasks"]
+
+    generated_by, dropped = "solver", []
+    if mode == "solver":
+        with span("generate.solver"):
+            generated = solve_week(schedule, busy, week_start)
+    else:
+        try:
+            events, generated_by, dropped = generate_with_llm(schedule, busy, week_start)
+            generated = repair_events(events, schedule, busy, week_start)
+        except HTTPException:
+            if mode != "hybrid":
+                raise
+            generated_by, dropped = "solver", []
+            with span("generate.solver"):
+                generated = solve_week(schedule, busy, week_start)
+
+    generation_cache.set(cache_key, {"events": generated, "dropped_tasks": dropped})
+    return generated, generated_by, dropped
+
+# Generates every week from the one containing ?start through the one
+# containing ?end (YYYY-MM-DD, in the schedule's time zone). The calendar is
+# read once for the whole range and each week only sees its own events,
+# so cached weeks stay valid while other weeks of the range change. Weeks
+# starting before the calendar mirror's horizon are rejected, since their
+# early events may be missing from the mirror.
+@router.get("/generate/range")
+def generate_range(request: Request):
+    user_id = get_user_id(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not logged in. Please log in again")
+
+    mode = get_mode(request)
+    refresh = request.query_params.get("refresh") == "true"
+    user, schedule = load_generation_rows(user_id)
+    tz = get_time_zone(schedule["time_zone"])
+    today = datetime.now(tz).date()
+    weeks = week_starts(
+        tz,
+        parse_date(request.query_params.get("start"), today),
+        parse_date(request.query_params.get("end"), today)
     )
+    horizon = mirror_horizon()
+    if weeks[0] < horizon:
+        raise HTTPException(status_code=400, detail=f"Weeks starting before {horizon.astimezone(tz).date().isoformat()} cannot be generated")
+
+    with span("generate.token"):
+        access_token = token_manager.get_access_token(user)
+    busy = extract_events(calendar_events(user_id, access_token, weeks[0], week_end(weeks[-1]), schedule["time_zone"]), schedule["time_zone"])
+    by_week = split_by_week(busy, weeks)
 
-    # Prepare data for the AI prompt
-    user_schedule_json = json.dumps(schedule, default=str)
-    google_events_json = json.dumps(events, default=str)
-
-    prompt = f"""
-You are an advanced AI scheduling assistant tasked with creating an optimal weekly schedule while strictly avoiding all conflicts. The user has provided their ideal weekly schedule template and their existing Google Calendar events.
-
-YOUR PRIMARY OBJECTIVES (IN ORDER OF IMPORTANCE):
-1. MUST include ALL mandatory tasks at their exact specified times (no changes allowed)
-2. MUST avoid ALL conflicts with existing Google Calendar events (absolute priority)
-3. Schedule preferred tasks according to their:
-   - Priority (higher first)
-   - Preferred time windows
-   - Frequency requirements
-4. NEVER double-book any time slots
-5. Maintain reasonable breaks between tasks when possible
-6. MAKE SURE THE SCHEDULE IS FOR THE CURRENT WEEK OF ${datetime.now()} AND THE SCHEDULE SHOULD ONLY BE FOR THE DAYS SPECIFIED IN THE USERS SCHEDULE TEMPLATE
-
-STRICT REQUIREMENTS:
-- All times must be in {time_zone} timezone
-- Each event must have buffer time (at least 30 minutes between events unless otherwise specified)
-- If a preferred task cannot be scheduled without conflict, it should be skipped (do not force it)
-- Absolutely NO overlapping events (cross-validate all events against each other and existing events)
-- For recurring tasks, ensure ALL instances comply with the rules
-
-INPUT DATA:
-1. User's ideal schedule template (JSON):
-{user_schedule_json}
-
-2. Existing Google Calendar events this week (JSON):
-{google_events_json}
-
-OUTPUT REQUIREMENTS:
-- Generate ONLY a valid JSON array of event objects
-- Each event MUST include:
-  * summary (string)
-  * description (string, optional)
-  * location (string, optional)
-  * start (object with dateTime in ISO8601 and timeZone)
-  * end (object with dateTime in ISO8601 and timeZone)
-- ONLY include these fields in a given event
-- Events should be ordered chronologically in the array
-- Include ONLY new events to be added (do not include existing events)
-- If no valid schedule can be created without conflicts, return an empty array
-- Schedule tasks on the weekend if possible
-
-VALIDATION STEPS YOU MUST PERFORM:
-1. First place all mandatory events at their fixed times
-2. Then add existing calendar events as immutable blocks
-3. For preferred tasks:
-   a. Sort by priority (highest first)
-   b. For each task, find the first available slot that:
-      - Matches preferred time window
-      - Doesn't conflict with mandatory/existing events
-      - Has sufficient duration
-      - Maintains buffer time
-4. Double-check no events overlap (start < end of previous event)
-5. Verify all timezones are correctly set to {time_zone}
-
-OUTPUT ONLY THE JSON ARRAY. NO EXPLANATIONS, NO COMMENTS, NO APOLOGIES, ONLY VALID JSON IN THE FORMAT SPECIFIED ABOVE.
-"""
+    def generate(week_start):
+        return generate_for_week(user_id, schedule, by_week[week_start], week_start, mode, refresh)
 
+    with ThreadPoolExecutor(max_workers=min(GENERATE_WEEK_CONCURRENCY, len(weeks))) as executor:
+        generated = list(executor.map(generate, weeks))
+    return [
+        {"week_start": week_start.isoformat(), "events": events, "generated_by": generated_by, "dropped_tasks": dropped}
+        for week_start, (events, generated_by, dropped) in zip(weeks, generated)
+    ]
+
+def parse_date(value, default):
+    if not value:
+        return default
     try:
-        completion = client.chat.completions.create(
-            extra_body={},
-            model="moonshotai/kimi-k2:free",
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-        )
-    except:
-        raise HTTPException(status_code=429, detail="The AI is currently down. Please try again later")
-        
-    response_text = completion.choices[0].message.content
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}. Expected YYYY-MM-DD")
+
+# local midnight of each Monday from the week of start to the week of end
+def week_starts(tz, start, end):
+    if end < start:
+        raise HTTPException(status_code=400, detail="The end date must not be before the start date")
+    first = start - timedelta(days=start.weekday())
+    count = (end - first).days // 7 + 1
+    if count > MAX_GENERATE_WEEKS:
+        raise HTTPException(status_code=400, detail=f"You can generate at most {MAX_GENERATE_WEEKS} weeks at a time")
+    return [tz.localize(datetime.combine(first + timedelta(weeks=week), datetime.min.time())) for week in range(count)]
+
+def week_end(week_start):
+    return week_start.tzinfo.localize(datetime.combine(week_start.date() + timedelta(days=7), datetime.min.time()))
+
+# busy intervals overlapping each week; an event spanning midnight on Sunday
+# belongs to both weeks it touches
+def split_by_week(busy, weeks):
+    return {
+        week_start: CalendarIntervals(busy.between(week_start.timestamp(), week_end(week_start).timestamp()))
+        for week_start in weeks
+    }
+
+@router.get("/generate/cache/stats")
+def generation_cache_stats():
+    return generation_cache.stats()
+
+# Streams the week as NDJSON, one event per line, as soon as each event is
+# complete in the model's output. Mandatory tasks are sent first since they
+# are known up front; every model event is validated and repaired like the
+# non-streaming endpoint. A failure mid-stream is sent as {"error": ...}.
+@router.get("/generate/schedule/stream")
+def generate_schedule_stream(request: Request):
+    user_id = get_user_id(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not logged in. Please log in again")
+
+    schedule, busy = load_generation_inputs(user_id)
+    week_start = get_week_start(schedule["time_zone"])
+    cache_key = generation_key(user_id, week_start, schedule["updated_at"], list(busy), "llm")
+    if request.query_params.get("refresh") != "true":
+        cached = generation_cache.get(cache_key)
+        if cached is not None:
+            return StreamingResponse((json.dumps(event) + "\n" for event in cached["events"]), media_type="application/x-ndjson",
+                                     headers=generation_headers("cache", cached["dropped_tasks"]))
+
+    # the model is picked before streaming starts so its name can go in the
+    # headers; if every model is down this is a plain error response
+    prompt, _, dropped = build_prompt(schedule, busy, week_start)
+    stream, model = llm_provider.stream(prompt)
+    return StreamingResponse(stream_events(schedule, busy, week_start, cache_key, stream, dropped), media_type="application/x-ndjson",
+                             headers=generation_headers(model, dropped))
+
+def generation_headers(generated_by, dropped):
+    headers = {"X-Generated-By": generated_by}
+    if dropped:
+        headers["X-Dropped-Tasks"] = json.dumps(dropped)
+    return headers
+
+def stream_events(schedule, busy, week_start, cache_key, stream, dropped):
+    repairer = EventRepairer(schedule, busy, week_start)
+    generated = list(repairer.mandatory)
+    for event in generated:
+        yield json.dumps(event) + "\n"
+
+    parser = JSONArrayStream()
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            for event in parser.feed(chunk.choices[0].delta.content or ""):
+                event = repairer.repair(event)
+                if event is not None:
+                    generated.append(event)
+                    yield json.dumps(event) + "\n"
+    except Exception:
+        yield json.dumps({"error": "The AI is currently down. Please try again later"}) + "\n"
+        return
+
+    if not parser.finished:
+        yield json.dumps({"error": "Error generating your schedule. Please try again"}) + "\n"
+        return
+    generation_cache.set(cache_key, {"events": repairer.sorted(generated), "dropped_tasks": dropped})
+
+def load_generation_rows(user_id):
+    with span("generate.db"):
+        user, schedule = fetch_user_and_schedule(user_id)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found. Please log in again.")
+    if not schedule:
+        raise HTTPException(status_code=401, detail="No schedule found. Please create a schedule first.")
+    return user, schedule
+
+# Loads the user's schedule, refreshes their Google token if needed and
+# returns (schedule, the current week's calendar as CalendarIntervals) from
+# the local calendar mirror
+def load_generation_inputs(user_id):
+    user, schedule = load_generation_rows(user_id)
+    with span("generate.token"):
+        access_token = token_manager.get_access_token(user)
+    week_start = get_week_start(schedule["time_zone"])
+    busy = extract_events(calendar_events(user_id, access_token, week_start, week_end(week_start), schedule["time_zone"]), schedule["time_zone"])
+    return schedule, busy
+
+# returns (the model's events, the model that wrote them, tasks dropped from the prompt)
+def generate_with_llm(schedule, busy, week_start):
+    with span("generate.prompt"):
+        prompt, _, dropped = build_prompt(schedule, busy, week_start)
+    with span("generate.llm"):
+        response_text, model = llm_provider.complete(prompt)
+
     if not response_text:
         raise HTTPException(status_code=500, detail="Failed to generate schedule. Please try again.")
 
-    conn.commit()
-    conn.close()
     try:
-        events = json.loads(response_text)
+        with span("generate.parse"):
+            events = json.loads(response_text)
     except:
         raise HTTPException(status_code=400, detail="Error generating your schedule. Please try again");
+    if not isinstance(events, list):
+        raise HTTPException(status_code=400, detail="Error generating your schedule. Please try again")
 
-    return events
+    return events, model, dropped
 
-def get_google_calendar_events(access_token, time_zone):
-    # Calculate start and end of the current week in user's time zone
-    tz = pytz.timezone(time_zone)
-    now = datetime.now(tz)
-    start_of_week = now - timedelta(days=now.weekday())  # Monday
-    end_of_week = start_of_week + timedelta(days=7)
+# Normalizes the mirror's raw events once per request: all-day events,
+# per-event time zones and DST are resolved here so the prompt builder,
+# solver and repairer all work on the same UTC epoch intervals
+def extract_events(calendar, time_zone):
+    with span("generate.normalize"):
+        return normalize_events(calendar, pytz.timezone(time_zone))
 
-    time_min = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
-    time_max = end_of_week.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
+# Checks the model's events against the calendar, the mandatory tasks and each
+# other (with buffer time) using a busy-interval index. Mandatory tasks are
+# always emitted at their exact times; a conflicting event is moved to the next
+# free slot on the same day within the schedule's hours, or dropped.
+class EventRepairer:
+    def __init__(self, schedule, busy, week_start, buffer_minutes=BUFFER_MINUTES):
+        self.time_zone = schedule["time_zone"]
+        self.tz = pytz.timezone(self.time_zone)
+        self.buffer = buffer_minutes * 60
+        self.week_start = week_start.timestamp()
+        self.week_end = self.week_start + 7 * 24 * 3600
+        self.end_minutes = to_minutes(schedule["end_time"])
 
-    url = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
-    headers = {
-        "Authorization": f"Bearer {access_token}"
-    }
-    params = {
-        "timeMin": time_min,
-        "timeMax": time_max,
-        "singleEvents": True,
-        "orderBy": "startTime",
-        "maxResults": 2500
-    }
-    try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()["items"]
-    except requests.exceptions.HTTPError as e:
-        if response.status_code == 403:
-            # Permission denied
-            raise HTTPException(
-                status_code=403,
-                detail="Access to your Google Calendar is denied. Please re-authenticate and grant access."
-            )
-        elif response.status_code == 401:
-            # Invalid/expired token
-            raise HTTPException(
-                status_code=401,
-                detail="Your Google session has expired or was revoked. Please log in again."
-            )
-        else:
-            # Other errors
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Unexpected error: {response.text}"
-            )
-    except requests.exceptions.RequestException:
-        raise HTTPException(
-            status_code=503,
-            detail="Network error occurred while contacting Google Calendar API."
-        )
-
-def extract_events(calendar):
-    simplified = []
-    for event in calendar:
-        simplified.append({
-            "summary": event.get("summary"),
-            "start": {
-                "dateTime": event.get("start", {}).get("dateTime"),
-                "timeZone": event.get("start", {}).get("timeZone"),
-            },
-            "end": {
-                "dateTime": event.get("end", {}).get("dateTime"),
-                "timeZone": event.get("end", {}).get("timeZone"),
-            }
-        })
-    return simplified
+        self.mandatory = mandatory_events(schedule, week_start)
+        self.mandatory_keys = {(event["summary"], event_bounds(event)) for event in self.mandatory}
+        self.index = busy.busy_index(event_bounds(event, self.tz) for event in self.mandatory)
+
+    def bounds(self, event):
+        if not isinstance(event, dict):
+            return None
+        bounds = event_bounds(event, self.tz)
+        if bounds is None or not self.week_start <= bounds[0] < self.week_end:
+            return None
+        if (event.get("summary"), bounds) in self.mandatory_keys:
+            return None
+        return bounds
+
+    # returns the event (moved if it had to be) or None if it cannot be kept
+    def repair(self, event, bounds=None):
+        bounds = bounds or self.bounds(event)
+        if bounds is None:
+            return None
+        start, end = bounds
+        if self.index.overlaps(start, end, self.buffer):
+            local_start = datetime.fromtimestamp(start, self.tz)
+            day_end = self.tz.localize(datetime.combine(local_start.date(), datetime.min.time()) + timedelta(minutes=self.end_minutes))
+            moved = self.index.next_free(start, end - start, self.buffer, day_end.timestamp())
+            if moved is None:
+                return None
+            start, end = moved, moved + (end - start)
+            event = dict(event)
+            event["start"] = {"dateTime": datetime.fromtimestamp(start, self.tz).isoformat(), "timeZone": self.time_zone}
+            event["end"] = {"dateTime": datetime.fromtimestamp(end, self.tz).isoformat(), "timeZone": self.time_zone}
+        self.index.add(start, end)
+        return event
+
+    def sorted(self, events):
+        return sorted(events, key=lambda event: event_bounds(event, self.tz)[0])
+
+def repair_events(generated, schedule, busy, week_start, buffer_minutes=BUFFER_MINUTES):
+    with span("generate.repair"):
+        repairer = EventRepairer(schedule, busy, week_start, buffer_minutes)
+        candidates = [(bounds, event) for event in generated if (bounds := repairer.bounds(event))]
+
+        repaired = list(repairer.mandatory)
+        for bounds, event in sorted(candidates, key=lambda candidate: candidate[0]):
+            event = repairer.repair(event, bounds)
+            if event is not None:
+                repaired.append(event)
+        return repairer.sorted(repaired)
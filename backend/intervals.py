@@ -0,0 +1,123 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+import pytz
+
+class BusyIndex:
+    """Disjoint busy intervals kept as two sorted arrays of epoch seconds.
+
+    Overlapping or touching intervals are merged on insert, so starts and
+    ends are both sorted and an overlap query only has to look at the last
+    interval starting before the query ends: O(log n) per lookup.
+    """
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, start, end, buffer=0):
+        """True if [start, end) comes within `buffer` seconds of a busy interval"""
+        i = bisect_left(self.starts, end + buffer) - 1
+        return i >= 0 and self.ends[i] > start - buffer
+
+    def add(self, start, end):
+        lo = bisect_left(self.ends, start)
+        hi = bisect_right(self.starts, end)
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+    def next_free(self, start, duration, buffer=0, latest_end=None):
+        """Earliest start >= `start` for a `duration` long slot clear of every interval by `buffer`"""
+        candidate = start
+        while True:
+            i = bisect_left(self.starts, candidate + duration + buffer) - 1
+            if i < 0 or self.ends[i] + buffer <= candidate:
+                break
+            candidate = self.ends[i] + buffer
+        if latest_end is not None and candidate + duration > latest_end:
+            return None
+        return candidate
+
+class CalendarIntervals:
+    """Calendar events normalized to UTC epoch-second (start, end) pairs.
+
+    Built once per request from the raw events and shared by the prompt
+    builder, the solver and the repairer. Pairs are sorted by start in two
+    parallel arrays; unlike BusyIndex they are not merged, so the longest
+    duration bounds how far back a range query has to look.
+    """
+
+    def __init__(self, intervals=()):
+        pairs = sorted(intervals)
+        self.starts = array("d", (start for start, _ in pairs))
+        self.ends = array("d", (end for _, end in pairs))
+        self.longest = max((end - start for start, end in pairs), default=0)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def between(self, start, end):
+        """(start, end) pairs overlapping [start, end), in start order"""
+        lo = bisect_left(self.starts, start - self.longest)
+        hi = bisect_left(self.starts, end)
+        return [(s, e) for s, e in zip(self.starts[lo:hi], self.ends[lo:hi]) if e > start]
+
+    def busy_index(self, extra=()):
+        return BusyIndex(list(self) + list(extra))
+
+def normalize_events(events, tz=pytz.utc):
+    """Parse raw Calendar events once into CalendarIntervals.
+
+    Timed events use their own offset, or their timeZone when the dateTime
+    has none; all-day events (start.date) cover local midnight to local
+    midnight in `tz`, the schedule's time zone. Events without usable times
+    are dropped.
+    """
+    return CalendarIntervals(bounds for bounds in (event_bounds(event, tz) for event in events) if bounds)
+
+def parse_event_time(value, tz=pytz.utc):
+    """Parse a Calendar {dateTime | date, timeZone} object to an aware datetime, or None"""
+    value = value or {}
+    date_time = value.get("dateTime")
+    if not date_time:
+        if not value.get("date"):
+            return None
+        try:
+            day = date.fromisoformat(value["date"])
+        except ValueError:
+            return None
+        return tz.localize(datetime.combine(day, datetime.min.time()))
+    try:
+        parsed = datetime.fromisoformat(date_time.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        try:
+            zone = pytz.timezone(value["timeZone"]) if value.get("timeZone") else tz
+        except pytz.UnknownTimeZoneError:
+            zone = tz
+        return zone.localize(parsed)
+    return parsed
+
+def event_bounds(event, tz=pytz.utc):
+    """(start, end) of an event as epoch seconds, or None if it has no usable times"""
+    start = parse_event_time(event.get("start"), tz)
+    end = parse_event_time(event.get("end"), tz)
+    if start is None or end is None or end <= start:
+        return None
+    return start.timestamp(), end.timestamp()
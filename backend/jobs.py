@@ -0,0 +1,181 @@
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import JSONResponse
+from dotenv import load_dotenv
+from psycopg2.extras import RealDictCursor, Json
+from starlette.concurrency import run_in_threadpool
+from utils import get_user_id, get_week_start
+from generate import generate_week, get_mode
+from db import get_db
+from store import fetch_user_and_schedule
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "4"))
+# how often this process heartbeats its jobs and looks for abandoned ones
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+# a job not heartbeated for this long belongs to a dead process
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+# identifies this process as the owner of the jobs it queued or runs
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Generation runs in the background so a long LLM call does not hold the
+# client's request open: POST enqueues a job (or returns the one already in
+# flight for the same user, week and mode), GET polls its status and result.
+@router.post("/generate/jobs")
+async def create_generation_job(request: Request):
+    user_id = get_user_id(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not logged in. Please log in again")
+    mode = get_mode(request)
+
+    job, created = await run_in_threadpool(enqueue_job, user_id, mode)
+    if created:
+        await job_queue.put(job["id"])
+    return JSONResponse(status_code=202, content={"job_id": str(job["id"]), "status": job["status"]})
+
+@router.get("/generate/jobs/{job_id}")
+async def get_generation_job(job_id: str, request: Request):
+    user_id = get_user_id(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not logged in. Please log in again")
+
+    job = await run_in_threadpool(fetch_job, user_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {
+        "job_id": str(job["id"]),
+        "status": job["status"],
+        "result": job["result"],
+        "error": job["error"],
+    }
+
+def enqueue_job(user_id, mode):
+    _, schedule = fetch_user_and_schedule(user_id)
+    if not schedule:
+        raise HTTPException(status_code=401, detail="No schedule found. Please create a schedule first.")
+    week_start = get_week_start(schedule["time_zone"]).date()
+
+    with get_db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        # the partial unique index only covers queued/running jobs, so an
+        # identical job already in flight makes this insert a no-op
+        cursor.execute("""INSERT INTO generation_jobs (user_id, week_start, mode, owner, heartbeat_at)
+            VALUES (%s, %s, %s, %s, now())
+            ON CONFLICT (user_id, week_start, mode) WHERE status IN ('queued', 'running') DO NOTHING
+            RETURNING id, status""", (user_id, week_start, mode, WORKER_ID))
+        job = cursor.fetchone()
+        created = job is not None
+        if not created:
+            cursor.execute("""SELECT id, status FROM generation_jobs
+                WHERE user_id = %s AND week_start = %s AND mode = %s AND status IN ('queued', 'running')""",
+                (user_id, week_start, mode))
+            job = cursor.fetchone()
+        conn.commit()
+    if job is None:
+        # the in-flight job finished between the two statements
+        return enqueue_job(user_id, mode)
+    return job, created
+
+def fetch_job(user_id, job_id):
+    try:
+        job_id = str(uuid.UUID(job_id))
+    except ValueError:
+        return None
+    with get_db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute("SELECT id, status, result, error FROM generation_jobs WHERE id = %s AND user_id = %s", (job_id, user_id))
+        return cursor.fetchone()
+
+def run_job(job_id):
+    # only a job this process still owns; if it was reclaimed after this
+    # process stalled, the new owner runs it
+    with get_db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute("""UPDATE generation_jobs SET status = 'running', heartbeat_at = now(), updated_at = now()
+            WHERE id = %s AND status = 'queued' AND owner = %s RETURNING user_id, mode""", (job_id, WORKER_ID))
+        job = cursor.fetchone()
+        conn.commit()
+    if not job:
+        return
+
+    try:
+        result, status, error = generate_week(job["user_id"], job["mode"])[0], "succeeded", None
+    except HTTPException as e:
+        result, status, error = None, "failed", e.detail
+    except Exception:
+        logger.exception("Generation job %s failed", job_id)
+        result, status, error = None, "failed", "Failed to generate schedule. Please try again."
+
+    with get_db() as conn, conn.cursor() as cursor:
+        cursor.execute("""UPDATE generation_jobs SET status = %s, result = %s, error = %s, updated_at = now()
+            WHERE id = %s AND owner = %s""", (status, Json(result) if result is not None else None, error, job_id, WORKER_ID))
+        conn.commit()
+
+def heartbeat_jobs():
+    with get_db() as conn, conn.cursor() as cursor:
+        cursor.execute("""UPDATE generation_jobs SET heartbeat_at = now()
+            WHERE owner = %s AND status IN ('queued', 'running')""", (WORKER_ID,))
+        conn.commit()
+
+def reclaim_abandoned_jobs(stale_seconds=JOB_STALE_SECONDS):
+    """Take over queued or running jobs whose owner stopped heartbeating; returns their ids"""
+    # a row another process reclaims concurrently is re-checked after its
+    # lock is released and skipped, so each job gets exactly one new owner
+    with get_db() as conn, conn.cursor() as cursor:
+        cursor.execute("""UPDATE generation_jobs SET status = 'queued', owner = %s, heartbeat_at = now(), updated_at = now()
+            WHERE status IN ('queued', 'running')
+            AND (heartbeat_at IS NULL OR heartbeat_at < now() - make_interval(secs => %s))
+            RETURNING id""", (WORKER_ID, stale_seconds))
+        job_ids = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+    if job_ids:
+        logger.warning("Reclaimed %d abandoned generation jobs", len(job_ids))
+    return job_ids
+
+job_queue = asyncio.Queue()
+
+async def worker():
+    while True:
+        job_id = await job_queue.get()
+        try:
+            await run_in_threadpool(run_job, job_id)
+        except Exception:
+            logger.exception("Generation job %s could not be run", job_id)
+        finally:
+            job_queue.task_done()
+
+async def maintain_jobs():
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            await run_in_threadpool(heartbeat_jobs)
+            for job_id in await run_in_threadpool(reclaim_abandoned_jobs):
+                job_queue.put_nowait(job_id)
+        except Exception:
+            logger.exception("Generation job heartbeat failed")
+
+async def start_workers():
+    for job_id in await run_in_threadpool(reclaim_abandoned_jobs):
+        job_queue.put_nowait(job_id)
+    workers = [asyncio.create_task(worker()) for _ in range(GENERATION_WORKERS)]
+    return workers + [asyncio.create_task(maintain_jobs())]
+
+def release_jobs():
+    # lets another process (or this one, restarted) reclaim them right away
+    # instead of waiting for the heartbeat to go stale
+    with get_db() as conn, conn.cursor() as cursor:
+        cursor.execute("""UPDATE generation_jobs SET heartbeat_at = NULL
+            WHERE owner = %s AND status IN ('queued', 'running')""", (WORKER_ID,))
+        conn.commit()
+
+async def stop_workers(workers):
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    await run_in_threadpool(release_jobs)
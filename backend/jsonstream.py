@@ -0,0 +1,66 @@
+import json
+
+class JSONArrayStream:
+    """Incrementally parses a JSON array of objects arriving in arbitrary chunks.
+
+    feed() returns every top-level object completed by the new text. Anything
+    before the opening bracket (e.g. a ```json fence) is ignored, and an object
+    that fails to parse is skipped rather than aborting the stream.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._started = False
+        self._depth = 0
+        self._object_start = None
+        self._in_string = False
+        self._escaped = False
+        self.finished = False
+        self.invalid = 0
+
+    def feed(self, text: str) -> list:
+        if self.finished or not text:
+            return []
+        self._buffer += text
+        completed = []
+        buffer = self._buffer
+        i = self._position
+        while i < len(buffer):
+            char = buffer[i]
+            if not self._started:
+                if char == "[":
+                    self._started = True
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._object_start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0 and char == "]":
+                    self.finished = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    try:
+                        completed.append(json.loads(buffer[self._object_start:i + 1]))
+                    except ValueError:
+                        self.invalid += 1
+                    self._object_start = None
+            i += 1
+
+        # drop everything already consumed so the buffer stays small
+        keep_from = self._object_start if self._object_start is not None else i
+        self._buffer = buffer[keep_from:]
+        self._position = i - keep_from
+        if self._object_start is not None:
+            self._object_start = 0
+        return completed
@@ -0,0 +1,214 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from collections import deque
+from fastapi import HTTPException
+from dotenv import load_dotenv
+from clients import get_llm_client
+from metrics import span
+import openai
+import os
+import random
+import threading
+import time
+
+load_dotenv()
+
+# Ordered fallback list, comma separated. An entry is a model name served by
+# OPENROUTER_BASE_URL, or model@base_url for another OpenAI-compatible
+# endpoint (authenticated with LLM_API_KEY, falling back to OPENROUTER_API_KEY).
+LLM_MODELS = os.getenv("LLM_MODELS", "moonshotai/kimi-k2:free")
+# total time one generation may spend across retries, fallbacks and hedges
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "90"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+# with hedging on, the next model is also asked once the current one has
+# been slower than LLM_HEDGE_PERCENTILE of its recent calls
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false") == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# hedge delay until a model has enough latency samples for a percentile
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "20"))
+LLM_HEDGE_MIN_SAMPLES = 20
+
+# timeouts, dropped connections, rate limits and 5xx are worth retrying;
+# anything else (bad request, auth) moves straight on to the next model
+TRANSIENT_ERRORS = (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+class DeadlineExceeded(Exception):
+    pass
+
+class EmptyCompletion(Exception):
+    """The model answered without any message content"""
+
+# failures that mean this model cannot answer; the next one is tried
+MODEL_ERRORS = (openai.OpenAIError, EmptyCompletion)
+
+class LLMEndpoint:
+    def __init__(self, spec: str):
+        model, _, base_url = spec.strip().partition("@")
+        self.model = model
+        self.base_url = base_url or None
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=200)
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+
+    @property
+    def client(self):
+        return get_llm_client(self.base_url)
+
+    def record(self, seconds: float, failed: bool):
+        with self._lock:
+            self.requests += 1
+            if failed:
+                self.errors += 1
+            else:
+                self.latencies.append(seconds)
+
+    def hedged(self):
+        with self._lock:
+            self.hedges += 1
+
+    def hedge_delay(self) -> float:
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return samples[min(int(len(samples) * LLM_HEDGE_PERCENTILE / 100), len(samples) - 1)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = sorted(self.latencies)
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "hedges": self.hedges,
+                "p50_seconds": samples[len(samples) // 2] if samples else 0.0,
+            }
+
+class LLMProvider:
+    """Sends a prompt to an ordered list of models until one answers.
+
+    Each model gets LLM_MAX_RETRIES retries with jittered backoff on
+    transient errors, all within one overall deadline. Optionally hedges:
+    if the current model is slower than usual, the next one is asked too and
+    the first good answer wins. Returns the text and the model that served it.
+    """
+
+    def __init__(self, specs: str = LLM_MODELS, deadline: float = LLM_DEADLINE, max_retries: int = LLM_MAX_RETRIES, hedge: bool = LLM_HEDGE):
+        self.endpoints = [LLMEndpoint(spec) for spec in specs.split(",") if spec.strip()]
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+    @property
+    def primary(self) -> str:
+        return self.endpoints[0].model
+
+    def complete(self, prompt: str):
+        """(response text, model) from the first model to answer"""
+        deadline = time.monotonic() + self.deadline
+        if self.hedge and len(self.endpoints) > 1:
+            return self._complete_hedged(prompt, deadline)
+        for endpoint in self.endpoints:
+            try:
+                return self._call_with_retries(endpoint, prompt, deadline), endpoint.model
+            except DeadlineExceeded:
+                break
+            except MODEL_ERRORS:
+                continue
+        raise self._failure(deadline)
+
+    def stream(self, prompt: str):
+        """(chunk stream, model) from the first model that accepts the request"""
+        deadline = time.monotonic() + self.deadline
+        for endpoint in self.endpoints:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                with span("llm.request"):
+                    stream = endpoint.client.chat.completions.create(
+                        extra_body={},
+                        model=endpoint.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        stream=True,
+                        timeout=remaining
+                    )
+                return stream, endpoint.model
+            except openai.OpenAIError:
+                endpoint.record(0.0, failed=True)
+                continue
+        raise self._failure(deadline)
+
+    def _failure(self, deadline) -> HTTPException:
+        if time.monotonic() >= deadline:
+            return HTTPException(status_code=504, detail="The AI took too long to respond. Please try again later")
+        return HTTPException(status_code=503, detail="The AI is currently down. Please try again later")
+
+    def _call_with_retries(self, endpoint, prompt, deadline) -> str:
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded()
+            started = time.monotonic()
+            try:
+                with span("llm.request"):
+                    completion = endpoint.client.chat.completions.create(
+                        extra_body={},
+                        model=endpoint.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        timeout=remaining
+                    )
+            except TRANSIENT_ERRORS:
+                endpoint.record(time.monotonic() - started, failed=True)
+                if attempt == self.max_retries:
+                    raise
+                # exponential backoff with full jitter, capped at 8 seconds
+                time.sleep(min(random.uniform(0, min(8.0, 0.5 * 2 ** attempt)), max(deadline - time.monotonic(), 0)))
+                continue
+            except openai.OpenAIError:
+                endpoint.record(time.monotonic() - started, failed=True)
+                raise
+            message = completion.choices[0].message if completion.choices else None
+            if message is None or not message.content:
+                endpoint.record(time.monotonic() - started, failed=True)
+                raise EmptyCompletion(endpoint.model)
+            endpoint.record(time.monotonic() - started, failed=False)
+            return message.content
+
+    def _complete_hedged(self, prompt, deadline):
+        pending = {}
+        remaining_endpoints = list(self.endpoints)
+
+        def launch():
+            endpoint = remaining_endpoints.pop(0)
+            pending[self._executor.submit(self._call_with_retries, endpoint, prompt, deadline)] = endpoint
+            return endpoint
+
+        current = launch()
+        while pending:
+            timeout = max(deadline - time.monotonic(), 0)
+            if remaining_endpoints:
+                timeout = min(timeout, current.hedge_delay())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    return future.result(), endpoint.model
+                except (DeadlineExceeded, *MODEL_ERRORS):
+                    pass
+            if time.monotonic() >= deadline:
+                break
+            if remaining_endpoints:
+                # either every finished request failed (fall back) or the
+                # current model is slow (hedge): ask the next one as well
+                if not done:
+                    current.hedged()
+                current = launch()
+        # requests still in flight finish in the background and are ignored
+        raise self._failure(deadline)
+
+    def stats(self) -> dict:
+        return {endpoint.model: endpoint.stats() for endpoint in self.endpoints}
+
+llm_provider = LLMProvider()
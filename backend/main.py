@@ -5,14 +5,46 @@ from auth import router as auth_router
 from schedule import router as schedule_router
 from generate import router as generate_router
 from sync import router as sync_router
+from jobs import router as jobs_router, start_workers, stop_workers
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+from db import init_pool, close_pool
+from migrate import migrate
+from utils import load_jwt_settings
+from clients import init_clients, close_clients, upstream_stats
+from metrics import router as metrics_router, register_collector, request_seconds
+from db import pool_stats
+from cache import generation_cache
+from mirror import mirror_stats
+from tokens import token_manager
+from utils import token_cache
+from oauth import load_client_config, cert_cache, CLIENT_SECRETS_FILE
+from llm import llm_provider
+from fastapi import Request
 import os
+import time
 
 load_dotenv()
 
 frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    load_jwt_settings()
+    init_pool()
+    init_clients()
+    # parse the OAuth client config once; a checkout without secrets can
+    # still serve everything except Google login
+    if os.path.exists(CLIENT_SECRETS_FILE):
+        load_client_config()
+    migrate()
+    workers = await start_workers()
+    yield
+    await stop_workers(workers)
+    await close_clients()
+    close_pool()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(SessionMiddleware, secret_key=os.getenv("SESSION_SECRET_KEY", "supersecret"))
 app.add_middleware(
     CORSMiddleware,
@@ -32,3 +64,29 @@ app.include_router(auth_router)
 app.include_router(schedule_router)
 app.include_router(generate_router)
 app.include_router(sync_router)
+app.include_router(jobs_router)
+app.include_router(metrics_router)
+
+# Per-route latency up to the response headers; a streamed body is not
+# included. Unmatched paths share one label so scans cannot blow up the
+# series count.
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        request_seconds.observe(time.perf_counter() - started, request.method, route.path if route else "unmatched", str(status))
+
+register_collector("db_pool", pool_stats)
+register_collector("generation_cache", generation_cache.stats)
+register_collector("upstream", upstream_stats.snapshot, label="upstream")
+register_collector("calendar_mirror", mirror_stats.snapshot)
+register_collector("jwt_cache", token_cache.stats)
+register_collector("google_tokens", lambda: {"refreshes": token_manager.refreshes})
+register_collector("google_certs", cert_cache.stats)
+register_collector("llm", llm_provider.stats, label="model")
@@ -0,0 +1,115 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from bisect import bisect_left
+from dotenv import load_dotenv
+import json
+import logging
+import os
+import threading
+import time
+
+load_dotenv()
+
+router = APIRouter()
+
+logger = logging.getLogger("planweekly.metrics")
+
+# also log every span as a JSON line on the planweekly.metrics logger
+METRICS_LOG = os.getenv("METRICS_LOG", "false") == "true"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def label_value(value) -> str:
+    """A label value quoted for the Prometheus text format"""
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+class Histogram:
+    """Prometheus-style histogram keyed by a fixed set of label names"""
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series = {}
+
+    def observe(self, value: float, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for label_values, counts, total in sorted(series):
+            labels = [f"{name}={label_value(value)}" for name, value in zip(self.labels, label_values)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                bucket_labels = ",".join(labels + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+request_seconds = Histogram("planweekly_request_seconds", "Time to response headers per route", ("method", "route", "status"))
+stage_seconds = Histogram("planweekly_stage_seconds", "Time spent in each stage of a request", ("stage",))
+
+class span:
+    """Times a block into planweekly_stage_seconds{stage=...}:
+
+        with span("generate.llm"):
+            ...
+    """
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        stage_seconds.observe(seconds, self.stage)
+        if METRICS_LOG:
+            logger.info(json.dumps({"stage": self.stage, "seconds": round(seconds, 6), "error": exc_type is not None}))
+        return False
+
+# name -> function returning a dict of numbers (or of dicts of numbers, which
+# are exported with the outer key as a label), read on every scrape
+_collectors = {}
+
+def register_collector(name: str, collect, label: str = None):
+    _collectors[name] = (collect, label)
+
+def render_collector(name, collect, label) -> list:
+    lines = []
+    for key, value in collect().items():
+        if isinstance(value, dict) and label:
+            for field, number in value.items():
+                if isinstance(number, (int, float)) and not isinstance(number, bool):
+                    lines.append(f"planweekly_{name}_{field}{{{label}={label_value(key)}}} {number}")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"planweekly_{name}_{key} {value}")
+    return lines
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    lines = request_seconds.render() + stage_seconds.render()
+    for name, (collect, label) in list(_collectors.items()):
+        try:
+            lines.extend(render_collector(name, collect, label))
+        except Exception:
+            logger.exception("metrics collector %s failed", name)
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
@@ -0,0 +1,70 @@
+from pathlib import Path
+from db import get_db, init_pool, close_pool
+import re
+import sys
+
+# Versioned schema migrations. Each file in migrations/ is named
+# NNNN_description.sql and applied once, in version order, inside its own
+# transaction together with its row in schema_migrations. Applied files must
+# never be edited; change the schema by adding a new file.
+#
+# Runs on app startup, or by hand with:
+#     python migrate.py          apply pending migrations
+#     python migrate.py status   list applied and pending migrations
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+# pg_advisory_xact_lock key, so app instances starting together take turns
+MIGRATION_LOCK = 7253190
+
+def available_migrations():
+    migrations = []
+    for path in MIGRATIONS_DIR.iterdir():
+        match = MIGRATION_FILE.match(path.name)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), path))
+    return sorted(migrations)
+
+def applied_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version integer PRIMARY KEY,
+            name text NOT NULL,
+            applied_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def migrate() -> list:
+    """Apply every pending migration; returns the names of those applied"""
+    applied = []
+    with get_db() as conn, conn.cursor() as cursor:
+        for version, name, path in available_migrations():
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK,))
+            if version in applied_versions(cursor):
+                conn.commit()
+                continue
+            cursor.execute(path.read_text())
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+            applied.append(path.name)
+    return applied
+
+def status() -> list:
+    with get_db() as conn, conn.cursor() as cursor:
+        applied = applied_versions(cursor)
+        conn.commit()
+    return [(path.name, version in applied) for version, name, path in available_migrations()]
+
+if __name__ == "__main__":
+    init_pool()
+    try:
+        if sys.argv[1:] == ["status"]:
+            for name, applied in status():
+                print(f"{'applied' if applied else 'pending'}  {name}")
+        else:
+            for name in migrate():
+                print(f"applied  {name}")
+    finally:
+        close_pool()
@@ -0,0 +1,123 @@
+-- Tables the app relies on. IF NOT EXISTS everywhere so databases created
+-- before migrations existed (by hand, or by the old startup schema check)
+-- are adopted as they are.
+
+CREATE TABLE IF NOT EXISTS users (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    email text NOT NULL,
+    access_token text,
+    refresh_token text,
+    token_expiry timestamptz,
+    granted_scopes text[]
+);
+
+-- Databases from before this index can hold several users per email, from
+-- concurrent first logins. Merge them into the one that logged in last
+-- (latest token_expiry): it keeps its own schedule, or takes over the most
+-- recently updated one of the others. Rows of other tables that belong to
+-- the merged-away users (sync records, calendar mirror, jobs) are dropped;
+-- they are rebuilt on use.
+DO $$
+DECLARE
+    foreign_key record;
+BEGIN
+    CREATE TEMP TABLE merged_users ON COMMIT DROP AS
+    SELECT id, keep_id FROM (
+        SELECT id, first_value(id) OVER (PARTITION BY email ORDER BY token_expiry DESC NULLS LAST, ctid DESC) AS keep_id
+        FROM users
+    ) ranked
+    WHERE id <> keep_id;
+
+    IF to_regclass('schedules') IS NOT NULL THEN
+        DELETE FROM schedules s USING merged_users m
+        WHERE s.user_id = m.id AND (
+            EXISTS (SELECT 1 FROM schedules kept WHERE kept.user_id = m.keep_id)
+            OR EXISTS (
+                SELECT 1 FROM schedules other JOIN merged_users om ON other.user_id = om.id
+                WHERE om.keep_id = m.keep_id AND (other.updated_at, other.ctid) > (s.updated_at, s.ctid)
+            )
+        );
+        UPDATE schedules s SET user_id = m.keep_id FROM merged_users m WHERE s.user_id = m.id;
+    END IF;
+
+    FOR foreign_key IN
+        SELECT c.conrelid::regclass AS referencing, a.attname AS column_name
+        FROM pg_constraint c JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+        WHERE c.contype = 'f' AND c.confrelid = 'users'::regclass
+    LOOP
+        EXECUTE format('DELETE FROM %s WHERE %I IN (SELECT id FROM merged_users)', foreign_key.referencing, foreign_key.column_name);
+    END LOOP;
+
+    DELETE FROM users WHERE id IN (SELECT id FROM merged_users);
+    DROP TABLE merged_users;
+END $$;
+
+-- login upserts ON CONFLICT (email)
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_key ON users (email);
+
+CREATE TABLE IF NOT EXISTS schedules (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    name text NOT NULL,
+    start_time time NOT NULL,
+    end_time time NOT NULL,
+    active_days jsonb NOT NULL DEFAULT '[]',
+    tasks jsonb NOT NULL DEFAULT '[]',
+    mandatory_tasks jsonb NOT NULL DEFAULT '[]',
+    time_zone text NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+-- one schedule per user; every schedule query is by user_id and schedule
+-- creation uses ON CONFLICT (user_id)
+CREATE UNIQUE INDEX IF NOT EXISTS schedules_user_id_key ON schedules (user_id);
+
+-- what /sync/schedule has already pushed to Google Calendar, keyed by a
+-- fingerprint of summary/start/end so re-syncs skip unchanged events
+CREATE TABLE IF NOT EXISTS synced_events (
+    user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    fingerprint text NOT NULL,
+    content_hash text NOT NULL,
+    google_event_id text NOT NULL,
+    start_at timestamptz NOT NULL,
+    end_at timestamptz NOT NULL,
+    synced_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS synced_events_user_start_idx ON synced_events (user_id, start_at);
+
+-- per-user mirror of Google Calendar, kept current with syncToken deltas;
+-- start_at/end_at index the event (all-day events in calendar_sync_state.time_zone)
+CREATE TABLE IF NOT EXISTS calendar_events (
+    user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    event_id text NOT NULL,
+    summary text,
+    event_start jsonb NOT NULL,
+    event_end jsonb NOT NULL,
+    start_at timestamptz NOT NULL,
+    end_at timestamptz NOT NULL,
+    PRIMARY KEY (user_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS calendar_events_user_start_idx ON calendar_events (user_id, start_at);
+
+CREATE TABLE IF NOT EXISTS calendar_sync_state (
+    user_id uuid PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    sync_token text,
+    synced_at timestamptz NOT NULL
+);
+
+-- background generation jobs; the partial unique index de-duplicates
+-- identical jobs while they are still queued or running
+CREATE TABLE IF NOT EXISTS generation_jobs (
+    id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    week_start date NOT NULL,
+    mode text NOT NULL,
+    status text NOT NULL DEFAULT 'queued',
+    result jsonb,
+    error text,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS generation_jobs_in_flight_idx
+    ON generation_jobs (user_id, week_start, mode) WHERE status IN ('queued', 'running');
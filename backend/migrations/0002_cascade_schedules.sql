@@ -0,0 +1,18 @@
+-- Pre-existing schedules tables may reference users without ON DELETE
+-- CASCADE (or not at all). Replace whatever foreign key is there with a
+-- cascading one so deleting a user removes their schedule.
+
+DO $$
+DECLARE
+    constraint_name text;
+BEGIN
+    FOR constraint_name IN
+        SELECT c.conname FROM pg_constraint c
+        WHERE c.conrelid = 'schedules'::regclass AND c.contype = 'f' AND c.confrelid = 'users'::regclass
+    LOOP
+        EXECUTE format('ALTER TABLE schedules DROP CONSTRAINT %I', constraint_name);
+    END LOOP;
+END $$;
+
+ALTER TABLE schedules
+    ADD CONSTRAINT schedules_user_id_fkey FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
@@ -0,0 +1,12 @@
+-- Which process holds a queued or running job and when it last said so.
+-- Every process heartbeats its own jobs; a job whose heartbeat is older
+-- than JOB_STALE_SECONDS belongs to a process that died and is requeued by
+-- whichever process notices first. Jobs from before this migration have no
+-- heartbeat and count as abandoned.
+
+ALTER TABLE generation_jobs
+    ADD COLUMN IF NOT EXISTS owner text,
+    ADD COLUMN IF NOT EXISTS heartbeat_at timestamptz;
+
+CREATE INDEX IF NOT EXISTS generation_jobs_unfinished_heartbeat_idx
+    ON generation_jobs (heartbeat_at) WHERE status IN ('queued', 'running');
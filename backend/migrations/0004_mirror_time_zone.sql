@@ -0,0 +1,7 @@
+-- The time zone the calendar mirror's all-day events were indexed in.
+-- A mirror indexed in another zone than the schedule's is rebuilt with a
+-- full sync; mirrors from before this migration have none and are rebuilt
+-- on their next read.
+
+ALTER TABLE calendar_sync_state
+    ADD COLUMN IF NOT EXISTS time_zone text;
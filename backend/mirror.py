@@ -0,0 +1,187 @@
+from fastapi import HTTPException
+from psycopg2.extras import RealDictCursor, execute_values
+from dotenv import load_dotenv
+from db import get_db
+from clients import get_google_client, GOOGLE_CALENDAR_API_URL
+from metrics import span
+from intervals import event_bounds
+from datetime import datetime, timedelta, timezone
+import httpx
+import json
+import os
+import pytz
+import threading
+
+load_dotenv()
+
+CALENDAR_EVENTS_URL = f"{GOOGLE_CALENDAR_API_URL}/calendars/primary/events"
+# a mirror synced this recently is read as is, without asking Google for deltas
+MIRROR_MAX_AGE = timedelta(seconds=float(os.getenv("CALENDAR_MIRROR_MAX_AGE", "30")))
+# how far back a full sync starts; incremental syncs cannot be time-bounded
+MIRROR_LOOKBACK = timedelta(days=int(os.getenv("CALENDAR_MIRROR_LOOKBACK_DAYS", "7")))
+
+class SyncTokenExpired(Exception):
+    """Google answered 410 Gone; the mirror has to be rebuilt with a full sync"""
+
+class MirrorStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.full = 0
+        self.incremental = 0
+        self.fresh = 0
+
+    def record(self, kind: str):
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"full": self.full, "incremental": self.incremental, "fresh": self.fresh}
+
+mirror_stats = MirrorStats()
+
+def mirror_horizon():
+    """Earliest instant the mirror is guaranteed to hold events from"""
+    # a full sync fetches from MIRROR_LOOKBACK before it ran and incremental
+    # syncs only add to that, so now - MIRROR_LOOKBACK is always covered
+    return datetime.now(timezone.utc) - MIRROR_LOOKBACK
+
+def calendar_events(user_id, access_token, time_min, time_max, time_zone="UTC"):
+    """Calendar events overlapping [time_min, time_max), served from the local mirror.
+
+    The mirror is brought up to date first: a full sync the first time (or
+    after Google expires the sync token, or when all-day events were indexed
+    in another time zone than time_zone), an incremental syncToken fetch of
+    only the changes after that.
+    """
+    with span("calendar.refresh"):
+        refresh_mirror(user_id, access_token, time_zone)
+    with span("calendar.read"):
+        return read_mirror(user_id, time_min, time_max)
+
+def refresh_mirror(user_id, access_token, time_zone):
+    now = datetime.now(timezone.utc)
+    with get_db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute("SELECT sync_token, synced_at, time_zone FROM calendar_sync_state WHERE user_id = %s", (user_id,))
+        state = cursor.fetchone()
+    if state and state["time_zone"] != time_zone:
+        state = None
+
+    if state and state["synced_at"] > now - MIRROR_MAX_AGE:
+        mirror_stats.record("fresh")
+        return
+    if state and state["sync_token"]:
+        try:
+            items, sync_token = list_events(access_token, {"syncToken": state["sync_token"], "singleEvents": True, "maxResults": 2500})
+        except SyncTokenExpired:
+            pass
+        else:
+            apply_changes(user_id, items, sync_token, time_zone, full=False)
+            mirror_stats.record("incremental")
+            return
+
+    items, sync_token = list_events(access_token, {"timeMin": (now - MIRROR_LOOKBACK).isoformat(), "singleEvents": True, "maxResults": 2500})
+    apply_changes(user_id, items, sync_token, time_zone, full=True)
+    mirror_stats.record("full")
+
+# Follows nextPageToken through every page; returns (items, nextSyncToken)
+def list_events(access_token, params):
+    headers = {
+        "Authorization": f"Bearer {access_token}"
+    }
+    params = dict(params)
+    items = []
+    try:
+        while True:
+            response = get_google_client().get(CALENDAR_EVENTS_URL, headers=headers, params=params)
+            response.raise_for_status()
+            page = response.json()
+            items.extend(page.get("items", []))
+            if not page.get("nextPageToken"):
+                return items, page.get("nextSyncToken")
+            params["pageToken"] = page["nextPageToken"]
+    except httpx.HTTPStatusError as e:
+        status_code = e.response.status_code
+        if status_code == 410:
+            raise SyncTokenExpired()
+        elif status_code == 403:
+            # Permission denied
+            raise HTTPException(
+                status_code=403,
+                detail="Access to your Google Calendar is denied. Please re-authenticate and grant access."
+            )
+        elif status_code == 401:
+            # Invalid/expired token
+            raise HTTPException(
+                status_code=401,
+                detail="Your Google session has expired or was revoked. Please log in again."
+            )
+        else:
+            # Other errors
+            raise HTTPException(
+                status_code=status_code,
+                detail=f"Unexpected error: {e.response.text}"
+            )
+    except httpx.RequestError:
+        raise HTTPException(
+            status_code=503,
+            detail="Network error occurred while contacting Google Calendar API."
+        )
+
+# Time range used to index an event; all-day events start and end at
+# midnight in the schedule's time zone, as the generator reads them
+def index_range(event, tz):
+    bounds = event_bounds(event, tz)
+    if bounds is None:
+        return None
+    return datetime.fromtimestamp(bounds[0], timezone.utc), datetime.fromtimestamp(bounds[1], timezone.utc)
+
+def apply_changes(user_id, items, sync_token, time_zone, full):
+    tz = pytz.timezone(time_zone)
+    rows, cancelled = [], []
+    for event in items:
+        bounds = index_range(event, tz) if event.get("status") != "cancelled" else None
+        if bounds is None:
+            cancelled.append(event["id"])
+            continue
+        rows.append((
+            user_id,
+            event["id"],
+            event.get("summary"),
+            json.dumps(event["start"]),
+            json.dumps(event["end"]),
+            bounds[0],
+            bounds[1]
+        ))
+
+    with get_db() as conn, conn.cursor() as cursor:
+        if full:
+            cursor.execute("DELETE FROM calendar_events WHERE user_id = %s", (user_id,))
+        elif cancelled:
+            cursor.execute("DELETE FROM calendar_events WHERE user_id = %s AND event_id = ANY(%s)", (user_id, cancelled))
+        if rows:
+            execute_values(cursor, """
+                INSERT INTO calendar_events (user_id, event_id, summary, event_start, event_end, start_at, end_at)
+                VALUES %s
+                ON CONFLICT (user_id, event_id) DO UPDATE SET
+                    summary = EXCLUDED.summary,
+                    event_start = EXCLUDED.event_start,
+                    event_end = EXCLUDED.event_end,
+                    start_at = EXCLUDED.start_at,
+                    end_at = EXCLUDED.end_at
+            """, rows)
+        cursor.execute("""
+            INSERT INTO calendar_sync_state (user_id, sync_token, synced_at, time_zone) VALUES (%s, %s, now(), %s)
+            ON CONFLICT (user_id) DO UPDATE SET sync_token = EXCLUDED.sync_token, synced_at = EXCLUDED.synced_at,
+                time_zone = EXCLUDED.time_zone
+        """, (user_id, sync_token, time_zone))
+        conn.commit()
+
+def read_mirror(user_id, time_min, time_max):
+    with get_db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute("""
+            SELECT summary, event_start AS start, event_end AS "end" FROM calendar_events
+            WHERE user_id = %s AND start_at < %s AND end_at > %s
+            ORDER BY start_at
+        """, (user_id, time_max, time_min))
+        return [dict(row) for row in cursor.fetchall()]
@@ -0,0 +1,123 @@
+from fastapi import HTTPException
+from pydantic import AfterValidator, BaseModel, ConfigDict, TypeAdapter, field_validator
+from datetime import datetime, time
+from typing import Annotated, Any, Dict, List, Literal, Optional
+from uuid import UUID
+import pytz
+
+# Typed mirrors of the frontend interfaces in frontend/src/utils/interfaces.ts
+
+Day = Literal["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY"]
+PreferredTime = Literal["morning", "afternoon", "evening", "night"]
+Priority = Literal["low", "medium", "high"]
+
+def parse_time_string(time_str: str) -> time:
+    """Convert time string (HH:MM) to time object"""
+    try:
+        hours, minutes = map(int, time_str.split(':'))
+        return time(hours, minutes)
+    except (ValueError, AttributeError):
+        raise HTTPException(status_code=400, detail=f"Invalid time format: {time_str}. Expected HH:MM")
+
+def validate_time_string(value: str) -> str:
+    """Pydantic-friendly HH:MM check; returns the normalized string"""
+    try:
+        return parse_time_string(value).strftime("%H:%M")
+    except HTTPException as e:
+        raise ValueError(e.detail)
+
+def validate_time_zone(value: str) -> str:
+    """Only IANA names pytz knows, since generation localizes every time with pytz.timezone"""
+    if value not in pytz.all_timezones_set:
+        raise ValueError(f"Unknown time zone: {value}")
+    return value
+
+TimeZone = Annotated[str, AfterValidator(validate_time_zone)]
+
+class Model(BaseModel):
+    # the frontend sends form state that may carry extra keys; ignore them
+    model_config = ConfigDict(extra="ignore")
+
+class Duration(Model):
+    hours: int = 0
+    minutes: int = 0
+
+class Task(Model):
+    id: str
+    summary: str
+    duration: Duration
+    on_weekends: bool = False
+    preferred_time: Optional[PreferredTime] = None
+    frequency: int = 1
+    color: Optional[str] = None
+    priority: Optional[Priority] = None
+
+    @field_validator("preferred_time", "priority", mode="before")
+    @classmethod
+    def empty_as_none(cls, value):
+        # unselected <select> values arrive as ""
+        return value or None
+
+    @field_validator("frequency", mode="before")
+    @classmethod
+    def default_frequency(cls, value):
+        return 1 if value is None else value
+
+class MandatoryTask(Model):
+    id: str
+    summary: str
+    start_time: str
+    end_time: str
+    start_day: Day
+    end_day: Day
+    color: Optional[str] = None
+    location: Optional[str] = None
+
+    @field_validator("start_time", "end_time")
+    @classmethod
+    def check_time(cls, value):
+        return validate_time_string(value)
+
+class Schedule(Model):
+    name: str
+    time_zone: TimeZone
+    start_time: str
+    end_time: str
+    active_days: List[Day]
+    tasks: List[Task] = []
+    mandatory_tasks: List[MandatoryTask] = []
+    id: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    @field_validator("start_time", "end_time")
+    @classmethod
+    def check_time(cls, value):
+        return validate_time_string(value)
+
+class StoredSchedule(Model):
+    """A schedules row as /schedule/get returns it.
+
+    Tasks and the time zone are passed through as stored rather than
+    re-validated, so a row saved before a model change is still served (and
+    can be fixed by the user); generation rejects an unknown stored zone
+    with a 400.
+    """
+    id: UUID
+    user_id: UUID
+    name: str
+    time_zone: str
+    start_time: str
+    end_time: str
+    active_days: List[str]
+    tasks: List[Dict[str, Any]]
+    mandatory_tasks: List[Dict[str, Any]]
+    created_at: datetime
+    updated_at: datetime
+
+ACTIVE_DAYS = TypeAdapter(List[Day])
+TASK = TypeAdapter(Task)
+MANDATORY_TASK = TypeAdapter(MandatoryTask)
+TASKS = TypeAdapter(List[Task])
+MANDATORY_TASKS = TypeAdapter(List[MandatoryTask])
+TIMESTAMP = TypeAdapter(datetime)
@@ -0,0 +1,149 @@
+from dotenv import load_dotenv
+from google.auth import jwt
+from google.auth.exceptions import GoogleAuthError
+from clients import get_google_client
+from metrics import span
+import google_auth_oauthlib.flow
+import httpx
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SCOPES = [
+    "openid",
+    "https://www.googleapis.com/auth/userinfo.email",
+    "https://www.googleapis.com/auth/calendar.events"
+]
+
+CLIENT_SECRETS_FILE = os.getenv("GOOGLE_CLIENT_SECRETS_FILE", "secrets/client_secret.json")
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# used when Google's response has no usable Cache-Control max-age
+CERTS_DEFAULT_MAX_AGE = float(os.getenv("GOOGLE_CERTS_DEFAULT_MAX_AGE", "3600"))
+# refresh in the background once the certs are this close to expiring
+CERTS_REFRESH_AHEAD = float(os.getenv("GOOGLE_CERTS_REFRESH_AHEAD", "300"))
+# a token signed by an unknown key refetches the certs at most this often,
+# so a stream of forged key ids cannot turn every login into a Google request
+CERTS_MIN_REFETCH_INTERVAL = float(os.getenv("GOOGLE_CERTS_MIN_REFETCH_INTERVAL", "60"))
+
+_client_config = None
+_client_config_lock = threading.Lock()
+
+def load_client_config() -> dict:
+    """The parsed client_secret.json, read from disk only once per process"""
+    global _client_config
+    if _client_config is None:
+        with _client_config_lock:
+            if _client_config is None:
+                with open(CLIENT_SECRETS_FILE) as f:
+                    _client_config = json.load(f)
+    return _client_config
+
+def create_flow(state=None) -> google_auth_oauthlib.flow.Flow:
+    flow = google_auth_oauthlib.flow.Flow.from_client_config(load_client_config(), scopes=SCOPES, state=state)
+    flow.redirect_uri = os.getenv("REDIRECT_URI")
+    return flow
+
+def max_age(cache_control: str) -> float:
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return float(match.group(1)) if match else CERTS_DEFAULT_MAX_AGE
+
+class CertCache:
+    """Google's ID token signing certificates, kept for their Cache-Control max-age.
+
+    Certificates close to expiry are still served while a background thread
+    fetches new ones, so a login only waits on Google when the cache is empty
+    or fully expired, or when a token is signed by a key we have not seen.
+    """
+
+    def __init__(self, url: str = GOOGLE_CERTS_URL, refresh_ahead: float = CERTS_REFRESH_AHEAD,
+                 min_refetch_interval: float = CERTS_MIN_REFETCH_INTERVAL):
+        self.url = url
+        self.refresh_ahead = refresh_ahead
+        self.min_refetch_interval = min_refetch_interval
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._certs = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._refreshing = False
+        self._refetched_at = None
+        self.fetches = 0
+
+    def get(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            certs = self._certs
+            if certs is not None and now < self._expires_at:
+                if now >= self._refresh_at and not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._background_refresh, daemon=True).start()
+                return certs
+        # one fetch when the cache is empty or expired; concurrent logins
+        # wait for it instead of each asking Google
+        with self._fetch_lock:
+            with self._lock:
+                if self._certs is not None and time.monotonic() < self._expires_at:
+                    return self._certs
+            return self.refresh()
+
+    def refresh(self) -> dict:
+        response = get_google_client().get(self.url)
+        response.raise_for_status()
+        certs = response.json()
+        ttl = max_age(response.headers.get("cache-control"))
+        with self._lock:
+            self._certs = certs
+            self._expires_at = time.monotonic() + ttl
+            # short-lived responses refresh halfway through instead
+            self._refresh_at = self._expires_at - min(self.refresh_ahead, ttl / 2)
+            self.fetches += 1
+        return certs
+
+    def refresh_for_unknown_key(self) -> dict:
+        """Fetch the certs again for a key id we do not have, at most once per min_refetch_interval"""
+        now = time.monotonic()
+        with self._lock:
+            recent = self._refetched_at is not None and now - self._refetched_at < self.min_refetch_interval
+            if recent and self._certs is not None:
+                return self._certs
+            self._refetched_at = now
+        return self.refresh()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except (httpx.HTTPError, ValueError):
+            # the current certs stay in use until they expire
+            logger.warning("Refreshing Google certificates failed", exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"fetches": self.fetches, "ttl_seconds": max(self._expires_at - time.monotonic(), 0)}
+
+cert_cache = CertCache()
+
+def verify_id_token(token: str, audience: str, clock_skew_in_seconds: int = 10) -> dict:
+    """Verify a Google ID token like id_token.verify_oauth2_token, with cached certificates"""
+    with span("auth.verify_id_token"):
+        try:
+            claims = jwt.decode(token, certs=cert_cache.get(), audience=audience, clock_skew_in_seconds=clock_skew_in_seconds)
+        except ValueError as e:
+            # signed by a key newer than our copy of the certs; fetch them again
+            # unless that was just done
+            if "Certificate for key id" not in str(e):
+                raise
+            claims = jwt.decode(token, certs=cert_cache.refresh_for_unknown_key(), audience=audience, clock_skew_in_seconds=clock_skew_in_seconds)
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise GoogleAuthError(f"Wrong issuer. 'iss' should be one of the following: {GOOGLE_ISSUERS}")
+    return claims
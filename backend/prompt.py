@@ -0,0 +1,151 @@
+from fastapi import HTTPException
+from dotenv import load_dotenv
+from datetime import datetime, time, timedelta
+from solver import DAYS, BUFFER_MINUTES, PRIORITY_ORDER, to_minutes, task_minutes
+import json
+import os
+import pytz
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+load_dotenv()
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+
+# Busy block detail levels tried in order until the prompt fits the budget:
+# (multiple of the smallest useful gap below which blocks are merged, parts
+# of the daily hours that get at most one block each). The last two send
+# half-day and then whole-day blocks.
+CALENDAR_DETAIL = ((1, None), (2, None), (4, None), (1, 2), (1, 1))
+
+INSTRUCTIONS = """You are a scheduling assistant. Build this week's schedule for the user.
+
+RULES (in order of importance):
+1. Do NOT output the mandatory tasks; they are added separately and their times are busy.
+2. Never overlap a busy block, a mandatory task or another event, and leave at least {buffer} minutes between events.
+3. Only use the listed days and stay within the daily hours.
+4. Place tasks by priority (high first), within their preferred time when possible, as many times per week as their frequency and on at most one occasion per day.
+5. Tasks with on_weekends false must not be placed on SATURDAY or SUNDAY.
+6. Skip a task occurrence rather than break a rule.
+
+All times are {time_zone}. Busy blocks are HH:MM-HH:MM ranges already taken on that date.
+
+SCHEDULE:
+{schedule}
+
+BUSY BLOCKS:
+{busy}
+
+OUTPUT: only a JSON array, ordered by start, of objects with "summary", "start" and "end", where start/end are {{"dateTime": ISO8601 with offset, "timeZone": "{time_zone}"}}. Optional "description" and "location". No other text."""
+
+def count_tokens(text: str) -> int:
+    if tiktoken is not None:
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    # roughly 4 characters per token for English/JSON text
+    return len(text) // 4 + 1
+
+def format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+# only the fields the model needs to place tasks, without ids, colors,
+# timestamps or the user id
+def project_schedule(schedule, week_start, tasks):
+    active_days = [day for day in DAYS if day in (schedule.get("active_days") or [])]
+    return {
+        "days": {day: (week_start + timedelta(days=DAYS.index(day))).date().isoformat() for day in active_days},
+        "hours": f"{format_minutes(to_minutes(schedule['start_time']))}-{format_minutes(to_minutes(schedule['end_time']))}",
+        "tasks": [
+            {
+                "summary": task.get("summary"),
+                "minutes": task_minutes(task),
+                "frequency": int(task.get("frequency") or 1),
+                "priority": task.get("priority") or "medium",
+                **({"preferred_time": task["preferred_time"]} if task.get("preferred_time") else {}),
+                **({"on_weekends": False} if not task.get("on_weekends") else {}),
+            }
+            for task in tasks if task_minutes(task) > 0
+        ],
+        "mandatory_tasks": [
+            {
+                "summary": task.get("summary"),
+                "time": f"{task.get('start_time')}-{task.get('end_time')}",
+                "days": task.get("start_day") if task.get("start_day") == task.get("end_day") else f"{task.get('start_day')}-{task.get('end_day')}",
+            }
+            for task in schedule.get("mandatory_tasks") or []
+        ],
+    }
+
+# Merges the calendar's busy intervals into per-day blocks clipped to the
+# schedule's daily hours. Gaps shorter than min_gap minutes cannot fit
+# anything once buffers are applied, so they are folded into the surrounding
+# blocks. With parts set, the daily hours are split into that many equal
+# parts and everything busy within one part becomes a single block.
+def busy_blocks(schedule, busy, week_start, min_gap, parts=None):
+    tz = pytz.timezone(schedule["time_zone"])
+    window_start = to_minutes(schedule["start_time"])
+    window_end = to_minutes(schedule["end_time"])
+    part_minutes = (window_end - window_start) / parts if parts else None
+
+    def same_part(start, end):
+        return part_minutes is not None and (start - window_start) // part_minutes == (end - window_start) // part_minutes
+
+    blocks = {}
+    for day in DAYS:
+        if day not in (schedule.get("active_days") or []):
+            continue
+        date = (week_start + timedelta(days=DAYS.index(day))).date()
+        midnight = tz.localize(datetime.combine(date, time()))
+        day_start = midnight.timestamp() + window_start * 60
+        day_end = midnight.timestamp() + window_end * 60
+        ranges = []
+        for start, end in busy.between(day_start, day_end):
+            start = int((max(start, day_start) - midnight.timestamp()) // 60)
+            end = int((min(end, day_end) - midnight.timestamp() + 59) // 60)
+            if ranges and (start - ranges[-1][1] < min_gap or same_part(ranges[-1][0], start)):
+                ranges[-1][1] = max(ranges[-1][1], end)
+            else:
+                ranges.append([start, end])
+        if ranges:
+            blocks[date.isoformat()] = ", ".join(f"{format_minutes(start)}-{format_minutes(end)}" for start, end in ranges)
+    return blocks
+
+def render(schedule, projected, blocks):
+    return INSTRUCTIONS.format(
+        buffer=BUFFER_MINUTES,
+        time_zone=schedule["time_zone"],
+        schedule=json.dumps(projected, separators=(",", ":")),
+        busy="\n".join(f"{date}: {ranges}" for date, ranges in blocks.items()) or "none",
+    )
+
+def build_prompt(schedule, busy, week_start, budget=PROMPT_TOKEN_BUDGET):
+    """Return (prompt, token count, summaries of dropped tasks), degrading detail until the prompt fits the budget.
+
+    A dense calendar is what grows the prompt, so the busy blocks are made
+    coarser first (see CALENDAR_DETAIL). Only when the coarsest blocks still
+    do not fit are the lowest priority tasks dropped.
+    """
+    tasks = sorted(schedule.get("tasks") or [], key=lambda task: PRIORITY_ORDER.get(task.get("priority"), 1))
+    shortest = min((task_minutes(task) for task in tasks if task_minutes(task) > 0), default=0)
+    # a gap can only hold a task if it fits the task plus a buffer on each side
+    min_gap = shortest + 2 * BUFFER_MINUTES
+
+    projected = project_schedule(schedule, week_start, tasks)
+    for gap_factor, parts in CALENDAR_DETAIL:
+        blocks = busy_blocks(schedule, busy, week_start, min_gap * gap_factor, parts)
+        prompt = render(schedule, projected, blocks)
+        tokens = count_tokens(prompt)
+        if tokens <= budget:
+            return prompt, tokens, []
+
+    # still over budget with the coarsest blocks: drop the lowest priority tasks until it fits
+    kept = tasks
+    while tokens > budget and kept:
+        kept = kept[:-1]
+        prompt = render(schedule, project_schedule(schedule, week_start, kept), blocks)
+        tokens = count_tokens(prompt)
+    if tokens > budget:
+        raise HTTPException(status_code=400, detail="Your calendar is too busy to generate a schedule with AI this week. Please try again with mode=solver.")
+    return prompt, tokens, [task.get("summary") for task in tasks[len(kept):]]
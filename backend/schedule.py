@@ -0,0 +1,248 @@
+from fastapi import APIRouter
+from fastapi import Request
+from fastapi import HTTPException
+from utils import get_user_id
+from db import get_db
+from store import fetch_user_and_schedule, invalidate
+from models import Schedule, StoredSchedule, Task, MandatoryTask, ACTIVE_DAYS, TASK, TASKS, MANDATORY_TASK, MANDATORY_TASKS, TIMESTAMP, parse_time_string
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from psycopg2.extras import RealDictCursor
+from datetime import datetime, time, timezone
+import orjson
+from typing import List, Dict, Any, Optional
+
+router = APIRouter()
+
+def format_time_for_db(time_str: str) -> time:
+    """Convert frontend time string to PostgreSQL time type"""
+    return parse_time_string(time_str)
+
+def format_active_days_for_db(active_days: List[str]) -> str:
+    """Convert active days list to JSONB string - matches frontend Day enum values"""
+    # Frontend sends: ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY"]
+    # We store as JSONB array of uppercase strings
+    return orjson.dumps(active_days).decode()
+
+def format_tasks_for_db(tasks: List[Dict[str, Any]]) -> str:
+    """Convert tasks list to JSONB string - matches frontend Task interface"""
+    # Frontend Task structure:
+    # {
+    #   id: string,
+    #   summary: string,
+    #   duration: { hours: number, minutes: number },
+    #   onWeekends: boolean,
+    #   preferredTime?: "morning" | "afternoon" | "evening" | "night",
+    #   frequency: number,
+    #   color?: string,
+    #   priority?: 'low' | 'medium' | 'high'
+    # }
+    return orjson.dumps(tasks).decode()
+
+def format_mandatory_tasks_for_db(mandatory_tasks: List[Dict[str, Any]]) -> str:
+    """Convert mandatory tasks list to JSONB string - matches frontend MandatoryTask interface"""
+    # Frontend MandatoryTask structure:
+    # {
+    #   id: string,
+    #   summary: string,
+    #   startTime: string, // "HH:MM"
+    #   endTime: string,   // "HH:MM"
+    #   startDay: Day,
+    #   endDay: Day,
+    #   color?: string,
+    #   location?: string
+    # }
+    return orjson.dumps(mandatory_tasks).decode()
+
+def get_current_timestamp() -> datetime:
+    """Get current UTC timestamp for timestamptz fields"""
+    return datetime.now(timezone.utc)
+
+def time_to_str(val):
+    if isinstance(val, time):
+        return val.strftime("%H:%M")
+    if isinstance(val, str):
+        return val
+    return ""
+
+@router.get("/schedule/get")
+def get_schedule(request: Request) -> Optional[StoredSchedule]:
+    user_id = get_user_id(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="There was an error logging in. Please log in again.")
+    
+    # one query for the user and their schedule, creating the default schedule
+    # on first visit. Not served from the row cache: the client sends
+    # updated_at back as the PATCH precondition, and a row cached before
+    # another process saved would turn that PATCH into a spurious 409.
+    user, schedule = fetch_user_and_schedule(user_id, create_schedule=True, cached=False)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found. Please log in.")
+
+    if schedule:
+        schedule = dict(schedule)
+        schedule["start_time"] = time_to_str(schedule["start_time"])
+        schedule["end_time"] = time_to_str(schedule["end_time"])
+    # with the return type as response model, FastAPI validates the row and
+    # serializes it straight to JSON bytes in pydantic-core, skipping the
+    # generic jsonable_encoder pass
+    return schedule
+
+@router.post("/schedule/save")
+async def save_schedule(request: Request, schedule: Schedule):
+    user_id = get_user_id(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not logged in. Please log in again")#
+
+    data = schedule.model_dump(mode="json", exclude_none=True)
+
+    # psycopg2 blocks, so run the write in the threadpool instead of on the event loop
+    await run_in_threadpool(update_schedule, user_id, data["name"], data["start_time"], data["end_time"], data["active_days"], data["tasks"], data["mandatory_tasks"], data["time_zone"])
+    return {"message": "Schedule saved successfully"}
+
+def update_schedule(user_id, name, start_time, end_time, active_days, tasks, mandatory_tasks, time_zone):
+    with get_db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute("""UPDATE schedules SET name = %s, start_time = %s, end_time = %s, active_days = %s, tasks = %s, mandatory_tasks = %s, updated_at = %s, time_zone = %s WHERE user_id = %s""",
+        (name, 
+        start_time, 
+        end_time, 
+        format_active_days_for_db(active_days),
+        format_tasks_for_db(tasks),
+        format_mandatory_tasks_for_db(mandatory_tasks),
+        get_current_timestamp(),
+        time_zone,
+        user_id))
+        conn.commit()
+    invalidate(user_id)
+
+def validate(adapter, value):
+    """Validate a PATCH value against a models adapter, as a 422 like FastAPI's body validation"""
+    try:
+        return adapter.validate_python(value)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+def validate_partial(model, values: dict) -> dict:
+    """Validate only the given fields of model, field validators included, as a 422.
+
+    Keys that are not fields of the model are dropped, like a full save does.
+    Returns the validated values in their JSON form.
+    """
+    fields = {field: value for field, value in values.items() if field in model.model_fields}
+    instance = model.model_construct()
+    try:
+        for field, value in fields.items():
+            model.__pydantic_validator__.validate_assignment(instance, field, value)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    return instance.model_dump(mode="json", include=set(fields))
+
+def validate_field(model, field, value):
+    return validate_partial(model, {field: value})[field]
+
+# columns a PATCH may set directly, with the converter applied to the value
+PATCHABLE_FIELDS = {
+    "name": lambda value: validate_field(Schedule, "name", value),
+    "start_time": lambda value: format_time_for_db(validate_field(Schedule, "start_time", value)),
+    "end_time": lambda value: format_time_for_db(validate_field(Schedule, "end_time", value)),
+    "active_days": lambda value: format_active_days_for_db(validate(ACTIVE_DAYS, value)),
+    "time_zone": lambda value: validate_field(Schedule, "time_zone", value),
+    "tasks": lambda value: TASKS.dump_json(validate(TASKS, value), exclude_none=True).decode(),
+    "mandatory_tasks": lambda value: MANDATORY_TASKS.dump_json(validate(MANDATORY_TASKS, value), exclude_none=True).decode(),
+}
+
+# Partial save: only the fields present in the body are written, and
+# individual tasks can be changed with ops instead of resending the list:
+#   {"updated_at": "<from /schedule/get>",
+#    "name": "...",
+#    "task_ops": [{"op": "add", "value": {...}},
+#                 {"op": "update", "id": "...", "value": {"frequency": 3}},
+#                 {"op": "replace", "id": "...", "value": {...}},
+#                 {"op": "remove", "id": "..."}],
+#    "mandatory_task_ops": [...]}
+# updated_at must match the stored value, otherwise the schedule was changed
+# elsewhere and the request fails with 409.
+@router.patch("/schedule/save")
+async def patch_schedule(request: Request):
+    user_id = get_user_id(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not logged in. Please log in again")
+
+    data = await request.json()
+    if not isinstance(data, dict) or not data.get("updated_at"):
+        raise HTTPException(status_code=400, detail="updated_at is required to save changes.")
+    data["updated_at"] = validate(TIMESTAMP, data["updated_at"])
+
+    updated_at = await run_in_threadpool(apply_schedule_patch, user_id, data)
+    return {"message": "Schedule saved successfully", "updated_at": updated_at}
+
+def task_ops_expression(column, ops):
+    """Build a JSONB expression applying ops to column, returning (sql, params)"""
+    if not isinstance(ops, list):
+        raise HTTPException(status_code=400, detail=f"{column} ops must be a list.")
+    model = Task if column == "tasks" else MandatoryTask
+    adapter = TASK if column == "tasks" else MANDATORY_TASK
+    expression, params = column, []
+    for op in ops:
+        kind = op.get("op") if isinstance(op, dict) else None
+        value = None
+        # add and replace carry a whole task, so validate it like a full save
+        if kind in ("add", "replace"):
+            value = [adapter.dump_json(validate(adapter, op.get("value")), exclude_none=True).decode()]
+        elif kind == "update" and isinstance(op.get("value"), dict):
+            # only the keys being changed are validated; optional fields set
+            # to null are removed from the task, as a full save never stores nulls
+            fields = validate_partial(model, op["value"])
+            if "id" in fields and fields["id"] != str(op.get("id")):
+                raise HTTPException(status_code=400, detail=f"A {column} update cannot change the task id.")
+            cleared = [field for field, field_value in fields.items() if field_value is None]
+            changed = {field: field_value for field, field_value in fields.items() if field_value is not None}
+            value = [cleared, orjson.dumps(changed).decode()]
+        if kind == "add":
+            expression = f"({expression} || jsonb_build_array(%s::jsonb))"
+            params = params + value
+        elif kind in ("replace", "update") and op.get("id") is not None and value is not None:
+            # update merges the given keys into the task, replace swaps it entirely
+            merged = "(t - %s::text[]) || %s::jsonb" if kind == "update" else "%s::jsonb"
+            expression = f"""(SELECT COALESCE(jsonb_agg(CASE WHEN t->>'id' = %s THEN {merged} ELSE t END ORDER BY ord), '[]'::jsonb)
+                FROM jsonb_array_elements({expression}) WITH ORDINALITY AS e(t, ord))"""
+            params = [str(op["id"])] + value + params
+        elif kind == "remove" and op.get("id") is not None:
+            expression = f"""(SELECT COALESCE(jsonb_agg(t ORDER BY ord), '[]'::jsonb)
+                FROM jsonb_array_elements({expression}) WITH ORDINALITY AS e(t, ord) WHERE t->>'id' IS DISTINCT FROM %s)"""
+            params = params + [str(op["id"])]
+        else:
+            raise HTTPException(status_code=400, detail=f"Invalid {column} op: {op}")
+    return expression, params
+
+def apply_schedule_patch(user_id, data):
+    assignments, params = [], []
+    for field, convert in PATCHABLE_FIELDS.items():
+        if field in data:
+            assignments.append(f"{field} = %s")
+            params.append(convert(data[field]))
+    for column, key in (("tasks", "task_ops"), ("mandatory_tasks", "mandatory_task_ops")):
+        if data.get(key):
+            if column in data:
+                raise HTTPException(status_code=400, detail=f"Send either {column} or {key}, not both.")
+            expression, expression_params = task_ops_expression(column, data[key])
+            assignments.append(f"{column} = {expression}")
+            params.extend(expression_params)
+    if not assignments:
+        raise HTTPException(status_code=400, detail="No changes to save.")
+
+    with get_db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(
+            f"UPDATE schedules SET {', '.join(assignments)}, updated_at = %s WHERE user_id = %s AND updated_at = %s::timestamptz RETURNING updated_at",
+            params + [get_current_timestamp(), user_id, data["updated_at"]]
+        )
+        row = cursor.fetchone()
+        if row is None:
+            conn.rollback()
+            cursor.execute("SELECT 1 FROM schedules WHERE user_id = %s", (user_id,))
+            if cursor.fetchone() is None:
+                raise HTTPException(status_code=404, detail="No schedule found. Please create a schedule first.")
+            raise HTTPException(status_code=409, detail="Your schedule was changed somewhere else. Please reload it and try again.")
+        conn.commit()
+    invalidate(user_id)
+    return row["updated_at"]
@@ -0,0 +1,168 @@
+from bisect import insort
+from datetime import datetime, time, timedelta
+from fastapi import HTTPException
+from intervals import event_bounds
+import pytz
+
+# Deterministic alternative to the LLM: places mandatory tasks at their fixed
+# times, then greedily fits preferred tasks (highest priority first) into the
+# earliest free slot of their preferred window, spreading repeats across the
+# least busy days. Everything is done in minutes since local midnight.
+
+DAYS = ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY"]
+WEEKEND = {"SATURDAY", "SUNDAY"}
+PRIORITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+# preferred_time windows as (start, end) minutes since midnight
+PREFERRED_WINDOWS = {
+    "morning": (6 * 60, 12 * 60),
+    "afternoon": (12 * 60, 17 * 60),
+    "evening": (17 * 60, 21 * 60),
+    "night": (21 * 60, 24 * 60),
+}
+BUFFER_MINUTES = 30
+MINUTES_PER_DAY = 24 * 60
+
+def to_minutes(value) -> int:
+    if isinstance(value, time):
+        return value.hour * 60 + value.minute
+    try:
+        hours, minutes = map(int, str(value).split(":")[:2])
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid time format: {value}. Expected HH:MM")
+    return hours * 60 + minutes
+
+def task_minutes(task) -> int:
+    duration = task.get("duration") or {}
+    return int(duration.get("hours") or 0) * 60 + int(duration.get("minutes") or 0)
+
+def is_day_in_range(day, start_day, end_day) -> bool:
+    index, start, end = DAYS.index(day), DAYS.index(start_day), DAYS.index(end_day)
+    if start <= end:
+        return start <= index <= end
+    # ranges that wrap around, e.g. FRIDAY to MONDAY
+    return index >= start or index <= end
+
+class DayPlan:
+    """Busy intervals of one day, kept sorted by start minute"""
+
+    def __init__(self, day, date, window_start, window_end):
+        self.day = day
+        self.date = date
+        self.window_start = window_start
+        self.window_end = window_end
+        self.busy = []
+        self.scheduled_minutes = 0
+
+    def block(self, start, end):
+        insort(self.busy, (max(start, 0), min(end, MINUTES_PER_DAY)))
+
+    def find_slot(self, duration, window_start, window_end, buffer):
+        # earliest start in [window_start, window_end - duration] keeping
+        # `buffer` minutes clear of every busy interval
+        candidate = window_start
+        for busy_start, busy_end in self.busy:
+            if candidate + duration + buffer <= busy_start:
+                break
+            if busy_end + buffer > candidate:
+                candidate = busy_end + buffer
+        if candidate + duration <= window_end:
+            return candidate
+        return None
+
+def solve_week(schedule, busy, week_start, buffer=BUFFER_MINUTES):
+    """Return a conflict-free list of events for the week starting at week_start (local midnight Monday).
+
+    busy holds the calendar's (start, end) epoch-second intervals, e.g. a
+    CalendarIntervals.
+    """
+    tz = pytz.timezone(schedule["time_zone"])
+    window_start = to_minutes(schedule["start_time"])
+    window_end = to_minutes(schedule["end_time"])
+    active_days = [day for day in DAYS if day in (schedule.get("active_days") or [])]
+
+    plans = {}
+    for offset, day in enumerate(DAYS):
+        if day in active_days:
+            date = (week_start + timedelta(days=offset)).date()
+            plans[day] = DayPlan(day, date, window_start, window_end)
+
+    block_intervals(plans, busy, tz)
+
+    events = mandatory_events(schedule, week_start)
+    block_intervals(plans, (event_bounds(event, tz) for event in events), tz)
+
+    tasks = sorted(
+        schedule.get("tasks") or [],
+        key=lambda task: (PRIORITY_ORDER.get(task.get("priority"), 1), -task_minutes(task))
+    )
+    for task in tasks:
+        duration = task_minutes(task)
+        if duration <= 0:
+            continue
+        windows = [(window_start, window_end)]
+        preferred = PREFERRED_WINDOWS.get(task.get("preferred_time"))
+        if preferred:
+            windows.insert(0, (max(preferred[0], window_start), min(preferred[1], window_end)))
+
+        placed = 0
+        days = [plan for day, plan in plans.items() if day not in WEEKEND or task.get("on_weekends")]
+        for plan in sorted(days, key=lambda plan: (plan.scheduled_minutes, DAYS.index(plan.day))):
+            if placed >= int(task.get("frequency") or 1):
+                break
+            for start_bound, end_bound in windows:
+                start = plan.find_slot(duration, start_bound, end_bound, buffer)
+                if start is not None:
+                    plan.block(start, start + duration)
+                    plan.scheduled_minutes += duration
+                    events.append(build_event(task, plan.date, start, start + duration, tz))
+                    placed += 1
+                    break
+
+    events.sort(key=lambda event: event["start"]["dateTime"])
+    return events
+
+def mandatory_events(schedule, week_start):
+    """Every occurrence of the schedule's mandatory tasks on active days of the week"""
+    tz = pytz.timezone(schedule["time_zone"])
+    active_days = schedule.get("active_days") or []
+    events = []
+    for task in schedule.get("mandatory_tasks") or []:
+        start, end = to_minutes(task["start_time"]), to_minutes(task["end_time"])
+        if end <= start:
+            # overnight task, ends the following morning
+            end += MINUTES_PER_DAY
+        for offset, day in enumerate(DAYS):
+            if day in active_days and is_day_in_range(day, task["start_day"], task["end_day"]):
+                date = (week_start + timedelta(days=offset)).date()
+                events.append(build_event(task, date, start, end, tz))
+    return events
+
+def block_intervals(plans, intervals, tz):
+    by_date = {plan.date: plan for plan in plans.values()}
+    for bounds in intervals:
+        if not bounds:
+            continue
+        start = datetime.fromtimestamp(bounds[0], tz)
+        end = datetime.fromtimestamp(bounds[1], tz)
+        # split events that span midnight across each day they touch
+        current = start
+        while current < end:
+            day_end = tz.localize(datetime.combine(current.date() + timedelta(days=1), time()))
+            plan = by_date.get(current.date())
+            if plan:
+                start_minute = current.hour * 60 + current.minute
+                end_minute = MINUTES_PER_DAY if end >= day_end else end.hour * 60 + end.minute
+                plan.block(start_minute, end_minute)
+            current = day_end
+
+def build_event(task, date, start, end, tz):
+    start_at = tz.localize(datetime.combine(date, time()) + timedelta(minutes=start))
+    end_at = tz.localize(datetime.combine(date, time()) + timedelta(minutes=end))
+    event = {
+        "summary": task.get("summary"),
+        "start": {"dateTime": start_at.isoformat(), "timeZone": tz.zone},
+        "end": {"dateTime": end_at.isoformat(), "timeZone": tz.zone},
+    }
+    if task.get("location"):
+        event["location"] = task["location"]
+    return event
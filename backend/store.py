@@ -0,0 +1,96 @@
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+from datetime import datetime, time, timezone
+from cache import InMemoryBackend
+from db import get_db
+import json
+import os
+
+load_dotenv()
+
+USER_COLUMNS = ("id", "email", "access_token", "refresh_token", "token_expiry", "granted_scopes")
+SCHEDULE_COLUMNS = (
+    "id", "user_id", "name", "start_time", "end_time", "active_days", "tasks",
+    "mandatory_tasks", "time_zone", "created_at", "updated_at"
+)
+
+# one round trip for both rows; the schedule half is all NULL when the user
+# has not created one yet
+USER_AND_SCHEDULE_QUERY = "SELECT {}, {} FROM users u LEFT JOIN schedules s ON s.user_id = u.id WHERE u.id = %s".format(
+    ", ".join(f"u.{column} AS user_{column}" for column in USER_COLUMNS),
+    ", ".join(f"s.{column} AS schedule_{column}" for column in SCHEDULE_COLUMNS),
+)
+
+# lazily creates the default schedule; the no-op update makes RETURNING
+# hand back the existing row if a concurrent request created it first
+CREATE_SCHEDULE_QUERY = f"""INSERT INTO schedules (
+    user_id, name, start_time, end_time, active_days, tasks, mandatory_tasks, created_at, updated_at, time_zone )
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (user_id) DO UPDATE SET user_id = EXCLUDED.user_id
+    RETURNING {", ".join(SCHEDULE_COLUMNS)}"""
+
+# Per-process cache of (user, schedule) rows. Writers call invalidate(), which
+# only clears this process's copy: with several worker processes, another
+# one would keep serving a user's old rows (an old updated_at, an old
+# refresh_token) for up to ROW_CACHE_TTL after a save or token refresh. So
+# the cache assumes a single process and is off when WEB_CONCURRENCY (the
+# worker count uvicorn and gunicorn read) is above 1. ROW_CACHE=true or
+# false overrides that.
+def row_cache_enabled() -> bool:
+    setting = os.getenv("ROW_CACHE", "auto")
+    if setting != "auto":
+        return setting == "true"
+    return int(os.getenv("WEB_CONCURRENCY", "1")) <= 1
+
+ROW_CACHE_ENABLED = row_cache_enabled()
+row_cache = InMemoryBackend(
+    maxsize=int(os.getenv("ROW_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("ROW_CACHE_TTL", "60"))
+)
+
+def _split(row):
+    user = {column: row[f"user_{column}"] for column in USER_COLUMNS}
+    if row["schedule_id"] is None:
+        return user, None
+    return user, {column: row[f"schedule_{column}"] for column in SCHEDULE_COLUMNS}
+
+def fetch_user_and_schedule(user_id, create_schedule=False, cached=True):
+    """Return (user, schedule) for user_id; user is None if it does not exist.
+
+    cached=False always reads Postgres (and refreshes the cache), for callers
+    that hand a value such as updated_at back to the client. The returned
+    dicts are shared with the cache and must not be mutated.
+    """
+    rows = row_cache.get(str(user_id)) if cached and ROW_CACHE_ENABLED else None
+    if rows is not None and (rows[1] is not None or not create_schedule):
+        return rows
+
+    with get_db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(USER_AND_SCHEDULE_QUERY, (user_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None, None
+        user, schedule = _split(row)
+        if schedule is None and create_schedule:
+            now = datetime.now(timezone.utc)
+            cursor.execute(CREATE_SCHEDULE_QUERY, (
+                user_id,
+                "My Schedule",
+                time(9, 0),
+                time(17, 0),
+                json.dumps(["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY"]),
+                json.dumps([]),
+                json.dumps([]),
+                now,
+                now,
+                "America/New_York"
+            ))
+            schedule = dict(cursor.fetchone())
+            conn.commit()
+
+    if ROW_CACHE_ENABLED:
+        row_cache.set(str(user_id), (user, schedule))
+    return user, schedule
+
+def invalidate(user_id):
+    row_cache.delete(str(user_id))
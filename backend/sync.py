@@ -1,14 +1,42 @@
 from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from psycopg2.extras import RealDictCursor
-import requests
-from utils import get_db_connection, get_user_id, refresh_access_token
-from datetime import datetime, timedelta, timezone
+from starlette.concurrency import run_in_threadpool
+from utils import get_user_id
+from tokens import token_manager
+from db import get_db
+from store import fetch_user_and_schedule
+from clients import get_google_async_client, GOOGLE_CALENDAR_API_URL
+from metrics import span
+from intervals import parse_event_time
+from datetime import timezone
+import asyncio
+import hashlib
+import httpx
+import json
+import os
+import random
 
 load_dotenv()
 
 router = APIRouter()
 
+CALENDAR_EVENTS_URL = f"{GOOGLE_CALENDAR_API_URL}/calendars/primary/events"
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", "5"))
+SYNC_MAX_RETRIES = int(os.getenv("SYNC_MAX_RETRIES", "4"))
+# longest wait between retries; an event whose Retry-After asks for longer
+# fails instead of holding the whole sync request open
+SYNC_MAX_RETRY_DELAY = float(os.getenv("SYNC_MAX_RETRY_DELAY", "8"))
+# Google reports quota errors as 403 with one of these reasons
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+# psycopg2 is blocking, so the async handler runs the DB work through the
+# threadpool; the Calendar requests use an async client on the event loop.
+# Events already recorded in synced_events are skipped (or patched if their
+# details changed), so re-syncing the same week does not duplicate anything.
+# With ?prune=true, previously synced events in the same time range that are
+# no longer part of the schedule are deleted from Google Calendar.
 @router.post("/sync/schedule")
 async def sync_schedule(request: Request):
     user_id = get_user_id(request)
@@ -16,10 +44,37 @@ async def sync_schedule(request: Request):
         raise HTTPException(status_code=401, detail="User not logged in. Please log in before syncing your schedule.")
 
     # Get user's access token from DB
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-    user = cursor.fetchone()
+    with span("sync.token"):
+        access_token = await run_in_threadpool(get_calendar_access_token, user_id)
+
+    # Get events from request body
+    events = await request.json()
+    if not events:
+        raise HTTPException(status_code=400, detail="No events provided.")
+    prune = request.query_params.get("prune") == "true"
+
+    entries = [fingerprint_event(event) for event in events]
+    with span("sync.load"):
+        index = await run_in_threadpool(load_synced_events, user_id, entries, prune)
+    with span("sync.push"):
+        results = await apply_sync_plan(access_token, plan_sync(entries, index, prune))
+    with span("sync.record"):
+        await run_in_threadpool(record_synced_events, user_id, results)
+
+    for result in results:
+        result.pop("entry", None)
+    failed = [result for result in results if result["status"] == "failed"]
+    if any(result.get("status_code") == 401 for result in failed):
+        raise HTTPException(status_code=401, detail="Your Google session has expired or was revoked. Please log in again.")
+    if failed:
+        return JSONResponse(status_code=502, content={
+            "detail": f"{len(failed)} of {len(results)} events could not be synced. Please try again",
+            "results": results
+        })
+    return {"message": "Schedule synced successfully", "results": results}
+
+def get_calendar_access_token(user_id):
+    user, _ = fetch_user_and_schedule(user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found. Please log in again.")
 
@@ -30,33 +85,173 @@ async def sync_schedule(request: Request):
     
     if not has_calendar_scope:
         raise HTTPException(status_code=401, detail="You do not have permission to sync your schedule. Please log out and log in with permissions.")
-    
-    access_token = user["access_token"]
-    if user["token_expiry"] < datetime.now(timezone.utc):
-        token = refresh_access_token(user["refresh_token"])
-        if not token:
-            raise HTTPException(status_code=401, detail="Failed to refresh access token. Please log in again.")
-        access_token = token["access_token"]
-        token_expiry = datetime.now(timezone.utc) + timedelta(seconds=token["expires_in"])
-        cursor.execute("UPDATE users SET access_token = %s, token_expiry = %s WHERE id = %s", (access_token, token_expiry, user_id))
-    conn.commit()
 
-    # Get events from request body
-    events = await request.json()
-    if not events:
-        raise HTTPException(status_code=400, detail="No events provided.")
+    return token_manager.get_access_token(user)
 
-    # Insert each event into Google Calendar
-    url = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
+def event_time(value):
+    parsed = parse_event_time(value) if isinstance(value, dict) else None
+    if parsed is None:
+        raise HTTPException(status_code=400, detail=f"Invalid event time: {value}. Every event needs a start and end dateTime or date.")
+    return parsed.astimezone(timezone.utc)
+
+# fingerprint identifies an event by what it is (summary and the instants it
+# covers); content_hash covers every field so edits to e.g. the description
+# are patched rather than inserted again
+def fingerprint_event(event):
+    start_at = event_time(event.get("start"))
+    end_at = event_time(event.get("end"))
+    identity = f"{event.get('summary') or ''}|{start_at.isoformat()}|{end_at.isoformat()}"
+    content = json.dumps(event, sort_keys=True, separators=(",", ":"), default=str)
+    return {
+        "event": event,
+        "fingerprint": hashlib.sha256(identity.encode()).hexdigest(),
+        "content_hash": hashlib.sha256(content.encode()).hexdigest(),
+        "start_at": start_at,
+        "end_at": end_at,
+    }
+
+def load_synced_events(user_id, entries, prune):
+    fingerprints = [entry["fingerprint"] for entry in entries]
+    with get_db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        if prune:
+            cursor.execute("""SELECT fingerprint, content_hash, google_event_id FROM synced_events
+                WHERE user_id = %s AND (fingerprint = ANY(%s) OR (start_at < %s AND end_at > %s))""",
+                (user_id, fingerprints, max(entry["end_at"] for entry in entries), min(entry["start_at"] for entry in entries)))
+        else:
+            cursor.execute("""SELECT fingerprint, content_hash, google_event_id FROM synced_events
+                WHERE user_id = %s AND fingerprint = ANY(%s)""", (user_id, fingerprints))
+        return {row["fingerprint"]: row for row in cursor.fetchall()}
+
+# returns a list of (action, entry, google_event_id) with action one of
+# insert, patch, skip or delete
+def plan_sync(entries, index, prune):
+    plan = []
+    seen = set()
+    for entry in entries:
+        fingerprint = entry["fingerprint"]
+        synced = index.get(fingerprint)
+        if fingerprint in seen:
+            plan.append(("skip", entry, synced["google_event_id"] if synced else None))
+        elif not synced:
+            plan.append(("insert", entry, None))
+        elif synced["content_hash"] != entry["content_hash"]:
+            plan.append(("patch", entry, synced["google_event_id"]))
+        else:
+            plan.append(("skip", entry, synced["google_event_id"]))
+        seen.add(fingerprint)
+    if prune:
+        for fingerprint, synced in index.items():
+            if fingerprint not in seen:
+                plan.append(("delete", {"fingerprint": fingerprint, "event": {}}, synced["google_event_id"]))
+    return plan
+
+# Runs the plan over the shared keep-alive client with at most
+# SYNC_CONCURRENCY requests in flight, returning one result per event instead
+# of stopping at the first failure
+async def apply_sync_plan(access_token, plan):
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json"
     }
+    semaphore = asyncio.Semaphore(SYNC_CONCURRENCY)
 
-    for event in events:
-        response = requests.post(url, headers=headers, json=event)
-        if not response.ok:
-            raise HTTPException(status_code=400, detail="There was an error syncing your schedule. Please try again")
+    async def run(index, step):
+        async with semaphore:
+            return await apply_sync_step(headers, index, *step)
 
-    return {"success"}
-    
+    return await asyncio.gather(*(run(index, step) for index, step in enumerate(plan)))
+
+async def apply_sync_step(headers, index, action, entry, google_event_id):
+    result = {"index": index, "summary": entry["event"].get("summary"), "entry": entry}
+    if action == "skip":
+        result.update(status="unchanged", id=google_event_id)
+        return result
+
+    if action == "delete":
+        response = await send_with_retries(headers, "DELETE", f"{CALENDAR_EVENTS_URL}/{google_event_id}")
+        # already gone from Google counts as deleted
+        if response is not None and (response.is_success or response.status_code in (404, 410)):
+            result.update(status="deleted", id=google_event_id)
+            return result
+    else:
+        response = None
+        if action == "patch":
+            response = await send_with_retries(headers, "PATCH", f"{CALENDAR_EVENTS_URL}/{google_event_id}", entry["event"])
+            if response is not None and response.is_success:
+                result.update(status="patched", id=google_event_id)
+                return result
+        # a patch of an event the user removed in Google falls back to an insert
+        if action == "insert" or (response is not None and response.status_code in (404, 410)):
+            response = await send_with_retries(headers, "POST", CALENDAR_EVENTS_URL, entry["event"])
+            if response is not None and response.is_success:
+                result.update(status="created", id=response.json().get("id"))
+                return result
+
+    result["status"] = "failed"
+    if response is None:
+        result["error"] = "Network error occurred while contacting Google Calendar API."
+    else:
+        result["status_code"] = response.status_code
+        result["error"] = response.text
+    return result
+
+async def send_with_retries(headers, method, url, body=None):
+    client = get_google_async_client()
+    for attempt in range(SYNC_MAX_RETRIES + 1):
+        try:
+            response = await client.request(method, url, headers=headers, json=body)
+        except httpx.RequestError:
+            response = None
+        if response is not None and response.is_success:
+            return response
+        if attempt == SYNC_MAX_RETRIES or not is_retryable(response):
+            return response
+        delay = retry_delay(response, attempt)
+        if delay is None:
+            return response
+        await asyncio.sleep(delay)
+
+def record_synced_events(user_id, results):
+    upserts = []
+    deletes = []
+    for result in results:
+        entry = result["entry"]
+        if result["status"] in ("created", "patched"):
+            upserts.append((user_id, entry["fingerprint"], entry["content_hash"], result["id"], entry["start_at"], entry["end_at"]))
+        elif result["status"] == "deleted":
+            deletes.append(entry["fingerprint"])
+    if not upserts and not deletes:
+        return
+
+    with get_db() as conn, conn.cursor() as cursor:
+        if upserts:
+            cursor.executemany("""INSERT INTO synced_events (user_id, fingerprint, content_hash, google_event_id, start_at, end_at)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (user_id, fingerprint) DO UPDATE SET
+                    content_hash = EXCLUDED.content_hash,
+                    google_event_id = EXCLUDED.google_event_id,
+                    synced_at = now()""", upserts)
+        if deletes:
+            cursor.execute("DELETE FROM synced_events WHERE user_id = %s AND fingerprint = ANY(%s)", (user_id, deletes))
+        conn.commit()
+
+def is_retryable(response):
+    if response is None or response.status_code == 429 or response.status_code >= 500:
+        return True
+    if response.status_code == 403:
+        try:
+            errors = response.json()["error"]["errors"]
+        except (ValueError, KeyError, TypeError):
+            return False
+        return any(error.get("reason") in RATE_LIMIT_REASONS for error in errors)
+    return False
+
+# seconds to wait before the next attempt, or None to give up now because
+# Google asked for a longer wait than SYNC_MAX_RETRY_DELAY
+def retry_delay(response, attempt):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        delay = float(retry_after)
+        return delay if delay <= SYNC_MAX_RETRY_DELAY else None
+    # exponential backoff with full jitter, capped at SYNC_MAX_RETRY_DELAY
+    return random.uniform(0, min(SYNC_MAX_RETRY_DELAY, 0.5 * 2 ** attempt))
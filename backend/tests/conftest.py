@@ -0,0 +1,220 @@
+from pathlib import Path
+import os
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# the app modules read these at import time
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+
+from psycopg2.extensions import connection, cursor, parse_dsn
+from psycopg2.extras import RealDictCursor
+import psycopg2
+from datetime import datetime, timedelta, timezone
+import pytest
+import tempfile
+
+# Tests that need Postgres use TEST_DATABASE_URL (a server where the test
+# user may create databases) or, if the pgserver package is installed, a
+# throwaway local server. Without either they are skipped.
+
+class QueryLog(list):
+    """Every statement executed through the test pool, in order"""
+
+    def statements(self, prefix):
+        return [query for query in self if query.lstrip().upper().startswith(prefix.upper())]
+
+query_log = QueryLog()
+
+def log_query(cursor, query, vars):
+    # logged with the parameters bound, so a test can EXPLAIN it as is
+    query_log.append(cursor.mogrify(query, vars).decode())
+
+class CountingCursor(cursor):
+    def execute(self, query, vars=None):
+        log_query(self, query, vars)
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        log_query(self, query, None)
+        return super().executemany(query, vars_list)
+
+class CountingRealDictCursor(RealDictCursor):
+    def execute(self, query, vars=None):
+        log_query(self, query, vars)
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        log_query(self, query, None)
+        return super().executemany(query, vars_list)
+
+class CountingConnection(connection):
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get("cursor_factory")
+        kwargs["cursor_factory"] = CountingRealDictCursor if factory is RealDictCursor else (factory or CountingCursor)
+        return super().cursor(*args, **kwargs)
+
+@pytest.fixture(scope="session")
+def postgres_dsn():
+    url = os.getenv("TEST_DATABASE_URL")
+    server = None
+    if not url:
+        try:
+            import pgserver
+        except ImportError:
+            pytest.skip("needs TEST_DATABASE_URL or the pgserver package")
+        server = pgserver.get_server(tempfile.mkdtemp(prefix="planweekly-test-"), cleanup_mode="stop")
+        url = server.get_uri()
+
+    admin = psycopg2.connect(url)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute("DROP DATABASE IF EXISTS planweekly_test")
+        cur.execute("CREATE DATABASE planweekly_test")
+    admin.close()
+    yield {**parse_dsn(url), "dbname": "planweekly_test"}
+    if server is not None:
+        server.cleanup()
+
+@pytest.fixture(scope="session")
+def database(postgres_dsn):
+    """Migrated test database behind the app's own pool"""
+    import db
+    from migrate import migrate
+
+    pool = db.ConnectionPool(1, 10, 5, connection_factory=CountingConnection, **postgres_dsn)
+    db._pool = pool
+    migrate()
+    yield pool
+    db._pool = None
+    pool.close()
+
+@pytest.fixture
+def db_pool(database):
+    """The migrated database, emptied, with process caches and the query log cleared"""
+    from store import row_cache
+    from tokens import token_manager
+    from utils import token_cache
+
+    with database.connection() as conn, conn.cursor() as cur:
+        cur.execute("TRUNCATE users CASCADE")
+        conn.commit()
+    row_cache._entries.clear()
+    token_cache.clear()
+    token_manager._tokens.clear()
+    query_log.clear()
+    yield database
+    assert database.stats()["in_use"] == 0
+
+@pytest.fixture
+def queries():
+    query_log.clear()
+    return query_log
+
+@pytest.fixture
+def make_user(db_pool):
+    """Insert a user (with a fresh Google token) and optionally a schedule; returns the user id"""
+    from datetime import datetime, timedelta, timezone
+    import json
+
+    def make(email="user@example.com", schedule=True, token_expiry=None):
+        expiry = token_expiry or datetime.now(timezone.utc) + timedelta(hours=1)
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("""INSERT INTO users (email, access_token, refresh_token, token_expiry, granted_scopes)
+                VALUES (%s, 'access', 'refresh', %s, %s) RETURNING id""",
+                (email, expiry, ["https://www.googleapis.com/auth/calendar.events"]))
+            user_id = str(cur.fetchone()[0])
+            if schedule:
+                cur.execute("""INSERT INTO schedules (user_id, name, start_time, end_time, active_days, tasks, mandatory_tasks, time_zone)
+                    VALUES (%s, 'My Schedule', '09:00', '17:00', %s, %s, '[]', 'UTC')""",
+                    (user_id, json.dumps(["MONDAY", "TUESDAY"]), json.dumps([
+                        {"id": "t1", "summary": "Gym", "duration": {"hours": 1, "minutes": 0}, "frequency": 1}
+                    ])))
+            conn.commit()
+        query_log.clear()
+        return user_id
+
+    return make
+
+@pytest.fixture
+def client_for(db_pool):
+    """A TestClient for the app logged in as the given user; the lifespan is not run"""
+    from fastapi.testclient import TestClient
+    from utils import create_token
+    from main import app
+
+    def client_for(user_id, email="user@example.com"):
+        return TestClient(app, cookies={"token": create_token({"user_id": user_id, "email": email})})
+
+    return client_for
+
+@pytest.fixture
+def fake_google(monkeypatch):
+    """Route the shared Google client to bench.fakes.create_google_app.
+
+    Call with Faults and create_google_app's options; both the sync and the
+    async client are replaced, and the returned client's `requests` lists
+    every (method, path) either of them sent to the fake.
+    """
+    from fastapi.testclient import TestClient
+    from bench.fakes import Faults, create_google_app
+    import clients
+    import httpx
+
+    def install(faults=None, **options):
+        app = create_google_app(faults or Faults(), **options)
+        client = TestClient(app, base_url="https://www.googleapis.com")
+        client.requests = []
+
+        def record(request):
+            client.requests.append((request.method, request.url.path))
+
+        async def record_async(request):
+            record(request)
+
+        client.event_hooks = {"request": [record], "response": []}
+        async_client = httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="https://www.googleapis.com",
+                                         event_hooks={"request": [record_async]})
+        monkeypatch.setitem(clients._clients, "google", client)
+        monkeypatch.setitem(clients._clients, "google_async", async_client)
+        return client
+
+    return install
+
+class FakeFlow:
+    """Stands in for google_auth_oauthlib's Flow: no network, fixed credentials"""
+
+    def __init__(self, state=None, email="user@example.com"):
+        self.state = state or "state-123"
+        self.credentials = type("Credentials", (), {
+            "id_token": "id-token",
+            "client_id": "client-id",
+            "scopes": ["openid", "https://www.googleapis.com/auth/calendar.events"],
+            "expiry": datetime.now(timezone.utc) + timedelta(hours=1),
+            "token": f"access-{email}",
+            "refresh_token": "refresh",
+        })()
+
+    def authorization_url(self, **kwargs):
+        return "https://accounts.google.test/auth", self.state
+
+    def fetch_token(self, authorization_response):
+        pass
+
+@pytest.fixture
+def login(db_pool, monkeypatch):
+    """Run the OAuth login and callback for email; verify replaces verify_id_token"""
+    from fastapi.testclient import TestClient
+    import auth
+    from main import app
+
+    monkeypatch.setenv("FRONTEND_URL", "http://frontend.test")
+    monkeypatch.setattr(auth, "create_flow", lambda state=None: FakeFlow(state))
+
+    def login(email="user@example.com", verify=None):
+        monkeypatch.setattr(auth, "verify_id_token", verify or (lambda token, audience, clock_skew_in_seconds=10: {"email": email}))
+        client = TestClient(app, base_url="https://testserver", follow_redirects=False)
+        client.get("/auth/google/login")
+        return client.get("/auth/google/callback?state=state-123&code=code")
+
+    return login
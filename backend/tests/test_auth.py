@@ -0,0 +1,128 @@
+from bench.fakes import google_id_token, signing_key
+from oauth import CertCache
+import clients
+import httpx
+import oauth
+import pytest
+import time
+
+@pytest.fixture
+def certs_endpoint(monkeypatch):
+    """A fake certs endpoint serving `served` after `delay` seconds; `fetches` counts requests, `fail` makes them error"""
+    endpoint = type("CertsEndpoint", (), {"served": {}, "fetches": 0, "fail": False, "delay": 0})()
+
+    def handler(request):
+        endpoint.fetches += 1
+        time.sleep(endpoint.delay)
+        if endpoint.fail:
+            raise httpx.ConnectError("unreachable", request=request)
+        return httpx.Response(200, json=endpoint.served, headers={"cache-control": "public, max-age=3600"})
+
+    monkeypatch.setitem(clients._clients, "google", httpx.Client(transport=httpx.MockTransport(handler)))
+    cache = CertCache(url="https://certs.test/oauth2/v1/certs", min_refetch_interval=60)
+    monkeypatch.setattr(oauth, "cert_cache", cache)
+    endpoint.cache = cache
+    return endpoint
+
+def test_known_key_verifies_with_one_fetch(certs_endpoint):
+    signer, cert = signing_key("current")
+    certs_endpoint.served = {"current": cert}
+    for _ in range(3):
+        assert oauth.verify_id_token(google_id_token(signer), "client-id")["email"] == "user@example.com"
+    assert certs_endpoint.fetches == 1
+
+def test_concurrent_logins_on_a_cold_cache_fetch_once(certs_endpoint):
+    from concurrent.futures import ThreadPoolExecutor
+
+    signer, cert = signing_key("current")
+    certs_endpoint.served = {"current": cert}
+    certs_endpoint.delay = 0.05
+    tokens = [google_id_token(signer) for _ in range(20)]
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        claims = list(executor.map(lambda token: oauth.verify_id_token(token, "client-id"), tokens))
+    assert all(claim["email"] == "user@example.com" for claim in claims)
+    assert certs_endpoint.fetches == 1
+
+def test_rotated_key_is_fetched_once(certs_endpoint):
+    old_signer, old_cert = signing_key("old")
+    certs_endpoint.served = {"old": old_cert}
+    oauth.verify_id_token(google_id_token(old_signer), "client-id")
+
+    new_signer, new_cert = signing_key("new")
+    certs_endpoint.served = {"old": old_cert, "new": new_cert}
+    assert oauth.verify_id_token(google_id_token(new_signer), "client-id")["email"] == "user@example.com"
+    assert certs_endpoint.fetches == 2
+
+def test_unknown_key_refetch_is_rate_limited(certs_endpoint):
+    signer, cert = signing_key("current")
+    certs_endpoint.served = {"current": cert}
+    oauth.verify_id_token(google_id_token(signer), "client-id")
+
+    forged, _ = signing_key("forged")
+    for _ in range(10):
+        with pytest.raises(ValueError):
+            oauth.verify_id_token(google_id_token(forged), "client-id")
+    # one refetch for the first unknown key, then none within the interval
+    assert certs_endpoint.fetches == 2
+
+    certs_endpoint.cache._refetched_at -= 61
+    with pytest.raises(ValueError):
+        oauth.verify_id_token(google_id_token(forged), "client-id")
+    assert certs_endpoint.fetches == 3
+
+def test_unreachable_certs_raise_http_error(certs_endpoint):
+    signer, _ = signing_key("current")
+    certs_endpoint.fail = True
+    with pytest.raises(httpx.HTTPError):
+        oauth.verify_id_token(google_id_token(signer), "client-id")
+
+def test_login_redirects_to_dashboard(login):
+    response = login()
+    assert response.headers["location"] == "http://frontend.test/dashboard"
+    assert "token=" in response.headers["set-cookie"]
+
+def test_login_with_unreachable_certs_redirects_to_error(login):
+    def unreachable(token, audience, clock_skew_in_seconds=10):
+        raise httpx.ConnectError("unreachable")
+
+    response = login(verify=unreachable)
+    assert response.status_code == 307
+    assert response.headers["location"] == "http://frontend.test/login?error=server_error"
+
+def user_rows(email):
+    from db import get_db
+
+    with get_db() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT id, access_token FROM users WHERE email = %s", (email,))
+        return cursor.fetchall()
+
+def test_login_is_one_statement(login, queries):
+    login("new@example.com")
+    assert len(queries) == 1
+    assert queries[0].lstrip().startswith("INSERT INTO users")
+    queries.clear()
+    # returning user: still one statement, same row
+    login("new@example.com")
+    assert len(queries) == 1
+    assert len(user_rows("new@example.com")) == 1
+
+def test_concurrent_first_logins_create_one_user(login):
+    from concurrent.futures import ThreadPoolExecutor
+    from utils import decode_token
+    import threading
+
+    threads = 10
+    barrier = threading.Barrier(threads)
+
+    def first_login(_):
+        barrier.wait()
+        return login("race@example.com")
+
+    with ThreadPoolExecutor(threads) as executor:
+        responses = list(executor.map(first_login, range(threads)))
+
+    assert all(response.headers["location"] == "http://frontend.test/dashboard" for response in responses)
+    rows = user_rows("race@example.com")
+    assert len(rows) == 1
+    tokens = [response.headers["set-cookie"].split("token=")[1].split(";")[0] for response in responses]
+    assert {decode_token(token)["user_id"] for token in tokens} == {str(rows[0][0])}
@@ -0,0 +1,106 @@
+from datetime import datetime
+from bench.fakes import FakeRedis
+from cache import GenerationCache, InMemoryBackend, RedisBackend, generation_key
+import cache
+import pytest
+import pytz
+
+WEEK_START = pytz.utc.localize(datetime(2025, 6, 2))
+EVENTS = [{"summary": "Standup", "start": {"dateTime": "2025-06-02T09:00:00+00:00"}, "end": {"dateTime": "2025-06-02T09:15:00+00:00"}}]
+WEEK = {"events": [{"summary": "Gym"}], "dropped_tasks": []}
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable clock shared by InMemoryBackend and FakeRedis"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    return now
+
+@pytest.fixture(params=["memory", "redis"])
+def make_cache(request, clock):
+    """GenerationCache factory over each backend, sized max_keys with the given TTL"""
+    def make(ttl=60, max_keys=100):
+        if request.param == "memory":
+            return GenerationCache(InMemoryBackend(max_keys, ttl))
+        return GenerationCache(RedisBackend(None, ttl, client=FakeRedis(max_keys, clock=lambda: clock[0])))
+    return make
+
+def test_hit_and_miss_are_counted(make_cache):
+    generation_cache = make_cache()
+    assert generation_cache.get("week") is None
+    generation_cache.set("week", WEEK)
+    assert generation_cache.get("week") == WEEK
+    stats = generation_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["errors"]) == (1, 1, 0)
+
+def test_entries_expire_after_the_ttl(make_cache, clock):
+    generation_cache = make_cache(ttl=60)
+    generation_cache.set("week", WEEK)
+    clock[0] += 59
+    assert generation_cache.get("week") == WEEK
+    clock[0] += 1
+    assert generation_cache.get("week") is None
+
+def test_least_recently_used_entry_is_evicted(make_cache):
+    generation_cache = make_cache(max_keys=2)
+    generation_cache.set("a", WEEK)
+    generation_cache.set("b", WEEK)
+    generation_cache.get("a")
+    generation_cache.set("c", WEEK)
+    assert generation_cache.get("b") is None
+    assert generation_cache.get("a") == WEEK
+    assert generation_cache.get("c") == WEEK
+
+def test_backend_errors_are_counted_not_raised():
+    client = FakeRedis()
+    generation_cache = GenerationCache(RedisBackend(None, 60, client=client))
+    generation_cache.set("week", WEEK)
+    client.down = True
+    generation_cache.set("other", WEEK)
+    assert generation_cache.get("week") is None
+    client.down = False
+    assert generation_cache.get("week") == WEEK
+    assert generation_cache.stats() == {"backend": "RedisBackend", "hits": 1, "misses": 1, "errors": 2}
+
+def test_redis_keys_are_prefixed_json():
+    client = FakeRedis()
+    RedisBackend(None, 60, client=client).set("week", WEEK)
+    assert client.get("planweekly:generate:week") == b'{"events": [{"summary": "Gym"}], "dropped_tasks": []}'
+
+def test_missing_redis_package_is_reported(monkeypatch):
+    monkeypatch.setattr(cache, "redis", None)
+    with pytest.raises(RuntimeError, match="redis package is not installed"):
+        RedisBackend("redis://localhost:6379/0", 60)
+
+def test_memory_stats_include_size():
+    generation_cache = GenerationCache(InMemoryBackend(10, 60))
+    generation_cache.set("week", WEEK)
+    assert generation_cache.stats() == {"backend": "InMemoryBackend", "hits": 0, "misses": 0, "errors": 0, "size": 1}
+
+def test_generation_key_is_stable():
+    reordered = [{"end": EVENTS[0]["end"], "start": EVENTS[0]["start"], "summary": "Standup"}]
+    key = generation_key("u1", WEEK_START, "2025-06-01T10:00:00+00:00", EVENTS, "llm")
+    assert key == generation_key("u1", WEEK_START, "2025-06-01T10:00:00+00:00", reordered, "llm")
+    assert key.startswith("u1:2025-06-02:2025-06-01T10:00:00+00:00:llm:")
+
+def test_generation_key_changes_with_its_inputs():
+    key = generation_key("u1", WEEK_START, "v1", EVENTS, "llm")
+    moved = [{**EVENTS[0], "end": {"dateTime": "2025-06-02T09:30:00+00:00"}}]
+    assert len({
+        key,
+        generation_key("u2", WEEK_START, "v1", EVENTS, "llm"),
+        generation_key("u1", pytz.utc.localize(datetime(2025, 6, 9)), "v1", EVENTS, "llm"),
+        generation_key("u1", WEEK_START, "v2", EVENTS, "llm"),
+        generation_key("u1", WEEK_START, "v1", moved, "llm"),
+        generation_key("u1", WEEK_START, "v1", EVENTS, "solver"),
+    }) == 6
+
+def test_stats_endpoint(make_user, client_for, fake_google, monkeypatch):
+    import generate
+
+    fake_google()
+    monkeypatch.setattr(generate, "generation_cache", GenerationCache(InMemoryBackend(10, 60)))
+    client = client_for(make_user())
+    client.get("/generate/schedule?mode=solver")
+    client.get("/generate/schedule?mode=solver")
+    assert client.get("/generate/cache/stats").json() == {"backend": "InMemoryBackend", "hits": 1, "misses": 1, "errors": 0, "size": 1}
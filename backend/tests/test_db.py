@@ -0,0 +1,139 @@
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+from fastapi import HTTPException
+import psycopg2
+import pytest
+import threading
+import db
+
+class FakeInfo:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @property
+    def transaction_status(self):
+        return self.conn.status
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection for ThreadedConnectionPool"""
+
+    def __init__(self):
+        self.closed = 0
+        self.status = TRANSACTION_STATUS_IDLE
+        self.info = FakeInfo(self)
+        self.rollbacks = 0
+        self.fail_rollback = False
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise psycopg2.InterfaceError("connection already closed")
+        self.rollbacks += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+@pytest.fixture
+def pool(monkeypatch):
+    connections = []
+
+    def connect(*args, **kwargs):
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(psycopg2, "connect", connect)
+    pool = db.ConnectionPool(1, 2, 0.1)
+    pool.connections = connections
+    monkeypatch.setattr(db, "_pool", pool)
+    yield pool
+    pool.close()
+
+def test_checkout_and_return(pool):
+    with db.get_db() as conn:
+        assert pool.stats()["in_use"] == 1
+    stats = pool.stats()
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+    assert stats["checkouts"] == 1
+    assert conn.rollbacks == 0
+
+def test_exception_in_block_rolls_back(pool):
+    with pytest.raises(RuntimeError):
+        with db.get_db() as conn:
+            conn.status = TRANSACTION_STATUS_INTRANS
+            raise RuntimeError("boom")
+    assert conn.rollbacks == 1
+    assert pool.stats()["in_use"] == 0
+    assert pool.stats()["discarded"] == 0
+
+def test_open_transaction_is_rolled_back_on_return(pool):
+    with db.get_db() as conn:
+        conn.status = TRANSACTION_STATUS_INTRANS
+    assert conn.rollbacks == 1
+    assert conn.get_transaction_status() == TRANSACTION_STATUS_IDLE
+    assert pool.stats()["in_use"] == 0
+    # and the same connection is handed out next time
+    with db.get_db() as again:
+        assert again is conn
+
+def test_closed_connection_is_discarded(pool):
+    with db.get_db() as conn:
+        conn.closed = 2
+    stats = pool.stats()
+    assert stats["in_use"] == 0
+    assert stats["discarded"] == 1
+    assert stats["idle"] == 0
+    with db.get_db() as fresh:
+        assert fresh is not conn
+    assert pool.stats()["created"] == 2
+
+def test_failed_rollback_discards_connection(pool):
+    with db.get_db() as conn:
+        conn.status = TRANSACTION_STATUS_INTRANS
+        conn.fail_rollback = True
+    assert conn.closed
+    assert pool.stats()["in_use"] == 0
+    assert pool.stats()["discarded"] == 1
+
+def test_checkout_times_out_with_503(pool):
+    first, second = pool.getconn(), pool.getconn()
+    with pytest.raises(HTTPException) as error:
+        with db.get_db():
+            pass
+    assert error.value.status_code == 503
+    assert pool.stats()["timeouts"] == 1
+    pool.putconn(first)
+    pool.putconn(second)
+    assert pool.stats()["in_use"] == 0
+
+def test_waiter_gets_connection_when_one_is_returned(pool):
+    pool.timeout = 5
+    held = [pool.getconn(), pool.getconn()]
+    got = threading.Event()
+
+    def waiter():
+        with db.get_db():
+            got.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    assert not got.wait(0.05)
+    pool.putconn(held.pop())
+    thread.join(5)
+    assert got.is_set()
+    pool.putconn(held.pop())
+    assert pool.stats()["in_use"] == 0
+    assert pool.stats()["created"] == 2
+
+def test_aborted_transaction_against_postgres(db_pool):
+    with pytest.raises(psycopg2.errors.DivisionByZero):
+        with db.get_db() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT 1 / 0")
+    assert db_pool.stats()["in_use"] == 0
+    # the connection came back usable, not stuck in an aborted transaction
+    with db.get_db() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        assert cursor.fetchone() == (1,)
+        conn.commit()
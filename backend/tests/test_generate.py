@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+import pytest
+
+@pytest.fixture
+def client(make_user, client_for, fake_google):
+    return client_for(make_user())
+
+def test_range_before_mirror_horizon_is_rejected(client, fake_google):
+    google = fake_google()
+    start = date.today() - timedelta(days=30)
+    response = client.get(f"/generate/range?mode=solver&start={start.isoformat()}&end={date.today().isoformat()}")
+    assert response.status_code == 400
+    assert "cannot be generated" in response.json()["detail"]
+    # rejected before the calendar is read
+    assert google.requests == []
+
+def test_range_from_this_week_is_generated(client, fake_google):
+    google = fake_google()
+    end = date.today() + timedelta(days=7)
+    response = client.get(f"/generate/range?mode=solver&end={end.isoformat()}")
+    assert response.status_code == 200
+    weeks = response.json()
+    assert len(weeks) == 2
+    assert all(week["generated_by"] == "solver" for week in weeks)
+    assert google.requests == [("GET", "/calendar/v3/calendars/primary/events")]
+
+def test_dropped_tasks_are_reported(client, fake_google, monkeypatch):
+    import generate
+
+    fake_google()
+    monkeypatch.setattr(generate, "build_prompt", lambda schedule, busy, week_start: ("prompt", 1, ["Gym"]))
+    monkeypatch.setattr(generate.llm_provider, "complete", lambda prompt: ("[]", "fake-model"))
+
+    response = client.get("/generate/schedule?mode=llm")
+    assert response.status_code == 200
+    assert response.headers["X-Generated-By"] == "fake-model"
+    assert response.headers["X-Dropped-Tasks"] == '["Gym"]'
+
+    # served from the cache with the same report
+    response = client.get("/generate/schedule?mode=llm")
+    assert response.headers["X-Generated-By"] == "cache"
+    assert response.headers["X-Dropped-Tasks"] == '["Gym"]'
+
+    [week] = client.get("/generate/range?mode=llm").json()
+    assert week["dropped_tasks"] == ["Gym"]
+
+def test_solver_drops_nothing_from_a_prompt(client, fake_google):
+    fake_google()
+    response = client.get("/generate/schedule?mode=solver")
+    assert "X-Dropped-Tasks" not in response.headers
+    [week] = client.get("/generate/range?mode=solver").json()
+    assert week["dropped_tasks"] == []
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+from hypothesis import given, settings, strategies as st
+from intervals import BusyIndex, CalendarIntervals
+from generate import repair_events
+from solver import BUFFER_MINUTES
+import pytz
+
+# Brute-force references: plain lists of intervals, scanned linearly
+
+def brute_overlaps(intervals, start, end, buffer=0):
+    return any(s < end + buffer and e > start - buffer for s, e in intervals)
+
+def brute_next_free(intervals, start, duration, buffer=0, latest_end=None):
+    # the earliest free start is either `start` itself or just clear of some interval
+    candidates = [start] + [e + buffer for _, e in intervals if e + buffer >= start]
+    best = min(c for c in candidates if not brute_overlaps(intervals, c, c + duration, buffer))
+    if latest_end is not None and best + duration > latest_end:
+        return None
+    return best
+
+interval = st.tuples(st.integers(0, 1000), st.integers(1, 100)).map(lambda pair: (pair[0], pair[0] + pair[1]))
+intervals = st.lists(interval, max_size=30)
+
+def check_invariants(index):
+    assert all(s < e for s, e in zip(index.starts, index.ends))
+    # disjoint and not touching, so both arrays are strictly increasing
+    assert all(e < s for e, s in zip(index.ends, index.starts[1:]))
+
+@given(intervals, interval, st.integers(0, 20))
+def test_overlaps_matches_brute_force(busy, query, buffer):
+    index = BusyIndex(busy)
+    check_invariants(index)
+    assert index.overlaps(*query, buffer) == brute_overlaps(busy, *query, buffer)
+
+@given(intervals, intervals, st.lists(st.tuples(interval, st.integers(0, 20)), max_size=20))
+def test_add_matches_brute_force(initial, added, queries):
+    index = BusyIndex(initial)
+    for start, end in added:
+        index.add(start, end)
+        check_invariants(index)
+    everything = initial + added
+    for (start, end), buffer in queries:
+        assert index.overlaps(start, end, buffer) == brute_overlaps(everything, start, end, buffer)
+
+@given(intervals, st.integers(0, 1100), st.integers(1, 120), st.integers(0, 20), st.none() | st.integers(0, 1500))
+def test_next_free_matches_brute_force(busy, start, duration, buffer, latest_end):
+    index = BusyIndex(busy)
+    assert index.next_free(start, duration, buffer, latest_end) == brute_next_free(busy, start, duration, buffer, latest_end)
+
+@given(intervals, st.integers(0, 1100), st.integers(0, 200))
+def test_between_matches_brute_force(busy, start, length):
+    calendar = CalendarIntervals(busy)
+    expected = sorted((s, e) for s, e in busy if s < start + length and e > start)
+    assert sorted(calendar.between(start, start + length)) == expected
+
+WEEK_START = pytz.utc.localize(datetime(2025, 6, 2))
+SCHEDULE = {
+    "time_zone": "UTC",
+    "start_time": "08:00",
+    "end_time": "22:00",
+    "active_days": ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY"],
+    "mandatory_tasks": [
+        {"id": "m1", "summary": "Lunch", "start_time": "12:00", "end_time": "13:00", "start_day": "MONDAY", "end_day": "FRIDAY"}
+    ],
+    "tasks": [],
+}
+
+def event(summary, start, end):
+    return {
+        "summary": summary,
+        "start": {"dateTime": start.isoformat(), "timeZone": "UTC"},
+        "end": {"dateTime": end.isoformat(), "timeZone": "UTC"},
+    }
+
+def minutes_into_week(minutes):
+    return WEEK_START + timedelta(minutes=minutes)
+
+def brute_repair(candidates, busy, buffer):
+    """The repairer's greedy pass over candidates in start order, with linear scans"""
+    lunch = [(minutes_into_week(day * 1440 + 720).timestamp(), minutes_into_week(day * 1440 + 780).timestamp()) for day in range(5)]
+    taken = list(busy) + lunch
+    kept = []
+    for start, end in sorted(candidates):
+        if brute_overlaps(taken, start, end, buffer):
+            day = datetime.fromtimestamp(start, pytz.utc).replace(hour=0, minute=0)
+            day_end = (day + timedelta(hours=22)).timestamp()
+            moved = brute_next_free(taken, start, end - start, buffer, day_end)
+            if moved is None:
+                continue
+            start, end = moved, moved + (end - start)
+        taken.append((start, end))
+        kept.append((start, end))
+    return sorted(kept)
+
+# (start minute within the week, duration in minutes), in 5 minute steps
+slot = st.tuples(st.integers(0, 7 * 24 * 12 - 1), st.integers(1, 36)).map(lambda pair: (pair[0] * 5, pair[1] * 5))
+
+@settings(max_examples=200, deadline=None)
+@given(st.lists(slot, max_size=40), st.lists(slot, max_size=40))
+def test_repair_matches_brute_force(generated, busy_slots):
+    busy = [(minutes_into_week(start).timestamp(), minutes_into_week(start + length).timestamp()) for start, length in busy_slots]
+    events = [event(f"Task {i}", minutes_into_week(start), minutes_into_week(start + length)) for i, (start, length) in enumerate(generated)]
+
+    repaired = repair_events(events, SCHEDULE, CalendarIntervals(busy), WEEK_START)
+
+    kept = sorted(
+        (datetime.fromisoformat(e["start"]["dateTime"]).timestamp(), datetime.fromisoformat(e["end"]["dateTime"]).timestamp())
+        for e in repaired if e["summary"] != "Lunch"
+    )
+    candidates = [(minutes_into_week(start).timestamp(), minutes_into_week(start + length).timestamp()) for start, length in generated]
+    assert kept == brute_repair(candidates, busy, BUFFER_MINUTES * 60)
+    # nothing kept comes within the buffer of a busy event or of another kept task
+    for i, (start, end) in enumerate(kept):
+        others = busy + kept[:i] + kept[i + 1:]
+        assert not brute_overlaps(others, start, end, BUFFER_MINUTES * 60)
@@ -0,0 +1,105 @@
+from fastapi import HTTPException
+import jobs
+import logging
+
+def insert_job(user_id, status="queued", owner=None, heartbeat_age=None, mode="solver", week_start="2025-06-02"):
+    from db import get_db
+
+    with get_db() as conn, conn.cursor() as cursor:
+        cursor.execute("""INSERT INTO generation_jobs (user_id, week_start, mode, status, owner, heartbeat_at)
+            VALUES (%s, %s, %s, %s, %s, CASE WHEN %s::float IS NULL THEN NULL ELSE now() - make_interval(secs => %s::float) END)
+            RETURNING id""", (user_id, week_start, mode, status, owner, heartbeat_age, heartbeat_age))
+        job_id = cursor.fetchone()[0]
+        conn.commit()
+    return job_id
+
+def job_row(job_id):
+    from db import get_db
+    from psycopg2.extras import RealDictCursor
+
+    with get_db() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute("SELECT status, owner, result, error, heartbeat_at FROM generation_jobs WHERE id = %s", (job_id,))
+        return cursor.fetchone()
+
+def test_only_abandoned_jobs_are_reclaimed(make_user):
+    user_id = make_user()
+    alive = insert_job(user_id, "running", "other-process", heartbeat_age=5, mode="llm")
+    stale_running = insert_job(user_id, "running", "dead-process", heartbeat_age=600, mode="solver")
+    stale_queued = insert_job(user_id, "queued", "dead-process", heartbeat_age=600, mode="hybrid")
+    legacy = insert_job(user_id, "queued", week_start="2025-06-09")
+    finished = insert_job(user_id, "succeeded", "dead-process", heartbeat_age=600)
+
+    reclaimed = jobs.reclaim_abandoned_jobs(stale_seconds=60)
+
+    assert set(reclaimed) == {stale_running, stale_queued, legacy}
+    for job_id in reclaimed:
+        assert job_row(job_id)["status"] == "queued"
+        assert job_row(job_id)["owner"] == jobs.WORKER_ID
+    assert job_row(alive)["owner"] == "other-process"
+    assert job_row(alive)["status"] == "running"
+    assert job_row(finished)["status"] == "succeeded"
+    # reclaimed jobs are heartbeated now, so nobody takes them again
+    assert jobs.reclaim_abandoned_jobs(stale_seconds=60) == []
+
+def test_heartbeat_only_touches_own_jobs(make_user):
+    user_id = make_user()
+    own = insert_job(user_id, "running", jobs.WORKER_ID, heartbeat_age=600, mode="llm")
+    other = insert_job(user_id, "running", "other-process", heartbeat_age=600, mode="solver")
+    jobs.heartbeat_jobs()
+    assert jobs.reclaim_abandoned_jobs(stale_seconds=60) == [other]
+    assert job_row(own)["owner"] == jobs.WORKER_ID
+
+def test_run_job_runs_own_jobs_only(make_user, monkeypatch):
+    user_id = make_user()
+    monkeypatch.setattr(jobs, "generate_week", lambda user_id, mode: ([{"summary": "Gym"}], "solver"))
+    own = insert_job(user_id, "queued", jobs.WORKER_ID, heartbeat_age=0, mode="solver")
+    other = insert_job(user_id, "queued", "other-process", heartbeat_age=0, mode="llm")
+
+    jobs.run_job(own)
+    jobs.run_job(other)
+
+    assert job_row(own)["status"] == "succeeded"
+    assert job_row(own)["result"] == [{"summary": "Gym"}]
+    assert job_row(other)["status"] == "queued"
+
+def test_failed_generation_is_logged(make_user, monkeypatch, caplog):
+    user_id = make_user()
+
+    def broken(user_id, mode):
+        raise RuntimeError("model exploded")
+
+    monkeypatch.setattr(jobs, "generate_week", broken)
+    job_id = insert_job(user_id, "queued", jobs.WORKER_ID, heartbeat_age=0)
+    with caplog.at_level(logging.ERROR, logger="jobs"):
+        jobs.run_job(job_id)
+    assert job_row(job_id)["status"] == "failed"
+    assert job_row(job_id)["error"] == "Failed to generate schedule. Please try again."
+    assert any("model exploded" in record.exc_text for record in caplog.records if record.exc_text)
+
+def test_expected_failure_is_stored_without_logging(make_user, monkeypatch, caplog):
+    user_id = make_user()
+
+    def no_schedule(user_id, mode):
+        raise HTTPException(status_code=401, detail="No schedule found. Please create a schedule first.")
+
+    monkeypatch.setattr(jobs, "generate_week", no_schedule)
+    job_id = insert_job(user_id, "queued", jobs.WORKER_ID, heartbeat_age=0)
+    with caplog.at_level(logging.ERROR, logger="jobs"):
+        jobs.run_job(job_id)
+    assert job_row(job_id)["error"] == "No schedule found. Please create a schedule first."
+    assert not caplog.records
+
+def test_released_jobs_are_reclaimable_at_once(make_user):
+    user_id = make_user()
+    job_id = insert_job(user_id, "queued", jobs.WORKER_ID, heartbeat_age=0)
+    assert jobs.reclaim_abandoned_jobs(stale_seconds=60) == []
+    jobs.release_jobs()
+    assert jobs.reclaim_abandoned_jobs(stale_seconds=60) == [job_id]
+
+def test_enqueue_dedupes_in_flight_jobs(make_user):
+    user_id = make_user()
+    job, created = jobs.enqueue_job(user_id, "solver")
+    again, created_again = jobs.enqueue_job(user_id, "solver")
+    assert created and not created_again
+    assert again["id"] == job["id"]
+    assert job_row(job["id"])["owner"] == jobs.WORKER_ID
@@ -0,0 +1,88 @@
+from fastapi.testclient import TestClient
+from openai import OpenAI
+from jsonstream import JSONArrayStream
+from bench.fakes import Faults, create_openai_app
+from llm import LLMProvider
+from utils import get_week_start
+import clients
+import json
+import pytest
+
+TRICKY = [
+    {"summary": "Quote \" and backslash \\ and brace } in a string", "start": {"dateTime": "2025-06-02T09:00:00+00:00"}},
+    {"summary": "Brackets ] [ { and an escaped slash \\/", "nested": {"list": [1, [2, {"deep": "]"}], {}], "empty": []}},
+    {"summary": "Unicode café ☃ and \\u escapes", "escaped": "line\nbreak\ttab \\\"quoted\\\""},
+    {"summary": "", "numbers": [-1.5e3, 0, True, False, None]},
+]
+
+DOCUMENTS = [
+    json.dumps(TRICKY),
+    json.dumps(TRICKY, indent=2),
+    "```json\n" + json.dumps(TRICKY) + "\n```",
+    "Here is your schedule: " + json.dumps(TRICKY, ensure_ascii=False) + " trailing text [ignored]",
+]
+
+def parse(chunks):
+    parser = JSONArrayStream()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return events, parser
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_every_single_split_point(document):
+    for i in range(len(document) + 1):
+        events, parser = parse([document[:i], document[i:]])
+        assert events == TRICKY, f"split at {i}: {document[:i]!r} | {document[i:]!r}"
+        assert parser.finished
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_one_character_at_a_time(document):
+    events, parser = parse(list(document))
+    assert events == TRICKY
+    assert parser.finished
+
+def test_every_pair_of_split_points():
+    document = json.dumps(TRICKY[:2])
+    for i in range(len(document) + 1):
+        for j in range(i, len(document) + 1):
+            events, _ = parse([document[:i], document[i:j], document[j:]])
+            assert events == TRICKY[:2]
+
+def test_objects_are_returned_as_soon_as_complete():
+    document = json.dumps(TRICKY)
+    first_end = len(json.dumps(TRICKY[0])) + 1
+    parser = JSONArrayStream()
+    assert parser.feed(document[:first_end - 1]) == []
+    assert parser.feed(document[first_end - 1:first_end]) == [TRICKY[0]]
+    assert not parser.finished
+
+def test_invalid_object_is_skipped():
+    events, parser = parse(['[{"a": 1}, {"b": tru', 'e}, {"c": nope}, {"d": 4}]'])
+    assert events == [{"a": 1}, {"b": True}, {"d": 4}]
+    assert parser.invalid == 1
+    assert parser.finished
+
+def test_unfinished_array_is_not_finished():
+    events, parser = parse(['[{"a": 1}, {"b": '])
+    assert events == [{"a": 1}]
+    assert not parser.finished
+    assert parser.feed("") == []
+
+def test_streams_the_fake_completion(monkeypatch):
+    from generate import stream_events
+    from intervals import CalendarIntervals
+
+    app = create_openai_app(Faults(), events_per_week=10, stream_chunk_size=5)
+    base_url = "http://fake-llm/v1"
+    fake = OpenAI(base_url=base_url, api_key="test", max_retries=0, http_client=TestClient(app, base_url="http://fake-llm"))
+    monkeypatch.setitem(clients._clients, f"llm:{base_url}", fake)
+
+    stream, model = LLMProvider(f"fake-model@{base_url}").stream("prompt")
+    assert model == "fake-model"
+
+    schedule = {"time_zone": "UTC", "start_time": "08:00", "end_time": "23:00", "active_days": [], "mandatory_tasks": [], "tasks": []}
+    lines = [json.loads(line) for line in stream_events(schedule, CalendarIntervals(), get_week_start("UTC"), "test-stream", stream, [])]
+    assert len(lines) == 10
+    assert all("error" not in line for line in lines)
+    assert [line["summary"] for line in lines] == [f"Task {i}" for i in range(10)]
@@ -0,0 +1,158 @@
+from types import SimpleNamespace
+from fastapi import HTTPException
+from llm import LLMProvider
+import clients
+import httpx
+import llm
+import openai
+import pytest
+import threading
+import time
+
+REQUEST = httpx.Request("POST", "https://llm.test/v1/chat/completions")
+
+def server_error():
+    return openai.InternalServerError("down", response=httpx.Response(503, request=REQUEST), body=None)
+
+def bad_request():
+    return openai.BadRequestError("bad", response=httpx.Response(400, request=REQUEST), body=None)
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+class FakeModel:
+    """chat.completions.create answering with each behaviour in turn (the last one repeats)
+
+    A behaviour is an exception to raise, a completion to return, or a
+    number of seconds to hang before timing out like the real client.
+    """
+
+    def __init__(self, *behaviours):
+        self.behaviours = list(behaviours)
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, timeout, **kwargs):
+        with self._lock:
+            behaviour = self.behaviours[min(self.calls, len(self.behaviours) - 1)]
+            self.calls += 1
+        if isinstance(behaviour, Exception):
+            raise behaviour
+        if isinstance(behaviour, (int, float)):
+            time.sleep(min(behaviour, timeout))
+            if behaviour >= timeout:
+                raise openai.APITimeoutError(request=REQUEST)
+            return completion(f"after {behaviour}s")
+        return behaviour
+
+@pytest.fixture
+def models(monkeypatch):
+    """Install fake models by name; returns an LLMProvider factory over them"""
+    installed = {}
+
+    def provider(deadline=5, max_retries=1, hedge=False, **fakes):
+        for name, fake in fakes.items():
+            installed[name] = fake
+            monkeypatch.setitem(clients._clients, f"llm:https://{name}.test/v1", fake)
+        return LLMProvider(",".join(f"{name}@https://{name}.test/v1" for name in fakes), deadline, max_retries, hedge)
+
+    monkeypatch.setattr(llm.random, "uniform", lambda low, high: 0)
+    return provider
+
+def test_first_model_answers(models):
+    provider = models(primary=FakeModel(completion("[]")), backup=FakeModel(completion("unused")))
+    assert provider.complete("prompt") == ("[]", "primary")
+    assert provider.endpoints[1].requests == 0
+
+def test_transient_errors_are_retried_then_fall_back(models):
+    primary = FakeModel(server_error())
+    backup = FakeModel(completion("[]"))
+    provider = models(primary=primary, backup=backup)
+    assert provider.complete("prompt") == ("[]", "backup")
+    assert primary.calls == 2
+    assert provider.stats()["primary"]["errors"] == 2
+
+def test_transient_error_then_success_stays_on_model(models):
+    primary = FakeModel(server_error(), completion("[]"))
+    provider = models(primary=primary, backup=FakeModel(completion("unused")))
+    assert provider.complete("prompt") == ("[]", "primary")
+    assert primary.calls == 2
+
+def test_bad_request_falls_back_without_retrying(models):
+    primary = FakeModel(bad_request())
+    provider = models(primary=primary, backup=FakeModel(completion("[]")))
+    assert provider.complete("prompt") == ("[]", "backup")
+    assert primary.calls == 1
+
+@pytest.mark.parametrize("answer", [
+    SimpleNamespace(choices=[]),
+    SimpleNamespace(choices=None),
+    SimpleNamespace(choices=[SimpleNamespace(message=None)]),
+    completion(None),
+    completion(""),
+])
+def test_empty_completion_falls_back(models, answer):
+    primary = FakeModel(answer)
+    provider = models(primary=primary, backup=FakeModel(completion("[]")))
+    assert provider.complete("prompt") == ("[]", "backup")
+    assert primary.calls == 1
+    assert provider.stats()["primary"]["errors"] == 1
+
+def test_every_model_down_is_503(models):
+    provider = models(primary=FakeModel(server_error()), backup=FakeModel(bad_request()), last=FakeModel(SimpleNamespace(choices=[])))
+    with pytest.raises(HTTPException) as error:
+        provider.complete("prompt")
+    assert error.value.status_code == 503
+
+def test_deadline_is_504(models):
+    backup = FakeModel(completion("too late"))
+    provider = models(deadline=0.3, primary=FakeModel(10), backup=backup)
+    started = time.monotonic()
+    with pytest.raises(HTTPException) as error:
+        provider.complete("prompt")
+    assert error.value.status_code == 504
+    assert time.monotonic() - started < 1
+    assert backup.calls == 0
+
+def test_hedge_asks_next_model_when_primary_is_slow(models, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_HEDGE_DEFAULT_DELAY", 0.05)
+    provider = models(hedge=True, primary=FakeModel(1), backup=FakeModel(completion("[]")))
+    started = time.monotonic()
+    assert provider.complete("prompt") == ("[]", "backup")
+    assert time.monotonic() - started < 0.5
+    assert provider.stats()["primary"]["hedges"] == 1
+
+def test_hedge_keeps_fast_primary(models, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_HEDGE_DEFAULT_DELAY", 0.5)
+    backup = FakeModel(completion("unused"))
+    provider = models(hedge=True, primary=FakeModel(completion("[]")), backup=backup)
+    assert provider.complete("prompt") == ("[]", "primary")
+    assert backup.calls == 0
+
+def test_hedged_failure_falls_back_immediately(models, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_HEDGE_DEFAULT_DELAY", 10)
+    provider = models(hedge=True, primary=FakeModel(SimpleNamespace(choices=[])), backup=FakeModel(completion("[]")))
+    started = time.monotonic()
+    assert provider.complete("prompt") == ("[]", "backup")
+    assert time.monotonic() - started < 1
+    assert provider.stats()["primary"]["hedges"] == 0
+
+def test_hedged_all_down_is_503_and_deadline_504(models, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_HEDGE_DEFAULT_DELAY", 0.05)
+    provider = models(hedge=True, primary=FakeModel(server_error()), backup=FakeModel(bad_request()))
+    with pytest.raises(HTTPException) as error:
+        provider.complete("prompt")
+    assert error.value.status_code == 503
+
+    provider = models(hedge=True, deadline=0.3, slow=FakeModel(10), slower=FakeModel(10))
+    with pytest.raises(HTTPException) as error:
+        provider.complete("prompt")
+    assert error.value.status_code == 504
+
+def test_stream_falls_back_when_request_is_refused(models):
+    primary = FakeModel(server_error())
+    provider = models(primary=primary, backup=FakeModel(iter(["chunk"])))
+    stream, model = provider.stream("prompt")
+    assert model == "backup"
+    assert list(stream) == ["chunk"]
@@ -0,0 +1,68 @@
+from metrics import Histogram, register_collector, render_collector, span, stage_seconds
+import metrics
+
+def series(lines, prefix):
+    return [line for line in lines if line.startswith(prefix)]
+
+def test_buckets_are_cumulative_with_sum_and_count():
+    histogram = Histogram("test_seconds", "Test histogram", ("route",), buckets=(0.1, 1, 5))
+    for value in (0.05, 0.1, 0.5, 2, 7):
+        histogram.observe(value, "/a")
+
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP test_seconds Test histogram", "# TYPE test_seconds histogram"]
+    assert lines[2:] == [
+        'test_seconds_bucket{route="/a",le="0.1"} 2',
+        'test_seconds_bucket{route="/a",le="1"} 3',
+        'test_seconds_bucket{route="/a",le="5"} 4',
+        'test_seconds_bucket{route="/a",le="+Inf"} 5',
+        'test_seconds_sum{route="/a"} 9.65',
+        'test_seconds_count{route="/a"} 5',
+    ]
+
+def test_each_label_set_is_its_own_series_in_order():
+    histogram = Histogram("test_seconds", "Test histogram", ("method", "route"), buckets=(1,))
+    histogram.observe(0.5, "POST", "/b")
+    histogram.observe(2, "GET", "/a")
+    histogram.observe(3, "GET", "/a")
+
+    lines = histogram.render()
+    assert series(lines, "test_seconds_count") == [
+        'test_seconds_count{method="GET",route="/a"} 2',
+        'test_seconds_count{method="POST",route="/b"} 1',
+    ]
+    assert 'test_seconds_bucket{method="GET",route="/a",le="1"} 0' in lines
+    assert 'test_seconds_sum{method="GET",route="/a"} 5.0' in lines
+
+def test_unlabelled_histogram():
+    histogram = Histogram("test_seconds", "Test histogram", buckets=(1,))
+    histogram.observe(1)
+    assert histogram.render()[2:] == ['test_seconds_bucket{le="1"} 1', 'test_seconds_bucket{le="+Inf"} 1',
+                                      "test_seconds_sum 1.0", "test_seconds_count 1"]
+
+def test_label_values_are_escaped():
+    histogram = Histogram("test_seconds", "Test histogram", ("route",), buckets=(1,))
+    histogram.observe(0.5, 'a\\b"c\nd')
+    assert histogram.render()[-1] == 'test_seconds_count{route="a\\\\b\\"c\\nd"} 1'
+
+def test_collector_output_escapes_keys():
+    lines = render_collector("pool", lambda: {"primary": {"in_use": 2, "healthy": True}, 'odd"name': {"in_use": 1}, "total": 3}, "pool")
+    assert lines == ['planweekly_pool_in_use{pool="primary"} 2', 'planweekly_pool_in_use{pool="odd\\"name"} 1', "planweekly_pool_total 3"]
+
+def test_span_records_the_stage():
+    with span("test.stage"):
+        pass
+    assert any(line.startswith('planweekly_stage_seconds_count{stage="test.stage"}') for line in stage_seconds.render())
+
+def test_metrics_endpoint(monkeypatch):
+    from fastapi.testclient import TestClient
+    from main import app
+
+    monkeypatch.setattr(metrics, "_collectors", {})
+    register_collector("broken", lambda: 1 / 0)
+    register_collector("jobs", lambda: {"queued": 4})
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "planweekly_jobs_queued 4" in response.text.splitlines()
+    assert "# TYPE planweekly_request_seconds histogram" in response.text
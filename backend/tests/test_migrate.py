@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta, timezone
+import psycopg2
+import pytest
+import db
+import migrate
+
+@pytest.fixture
+def fresh_database(postgres_dsn, monkeypatch):
+    """An empty database with the app's pool pointed at it; yields a psql-like runner"""
+    admin = psycopg2.connect(**{**postgres_dsn, "dbname": "postgres"})
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute("DROP DATABASE IF EXISTS planweekly_migrate_test")
+        cursor.execute("CREATE DATABASE planweekly_migrate_test")
+    pool = db.ConnectionPool(1, 2, 5, **{**postgres_dsn, "dbname": "planweekly_migrate_test"})
+    monkeypatch.setattr(db, "_pool", pool)
+
+    def run(sql, params=None):
+        with db.get_db() as conn, conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall() if cursor.description else None
+            conn.commit()
+        return rows
+
+    yield run
+    pool.close()
+    with admin.cursor() as cursor:
+        cursor.execute("DROP DATABASE planweekly_migrate_test")
+    admin.close()
+
+def test_migrations_apply_to_empty_database(fresh_database):
+    names = [path.name for _, _, path in migrate.available_migrations()]
+    assert names[:2] == ["0001_initial.sql", "0002_cascade_schedules.sql"]
+    assert migrate.migrate() == names
+    assert migrate.migrate() == []
+    assert migrate.status() == [(name, True) for name in names]
+    tables = {row[0] for row in fresh_database("SELECT tablename FROM pg_tables WHERE schemaname = 'public'")}
+    assert {"users", "schedules", "synced_events", "calendar_events", "calendar_sync_state", "generation_jobs"} <= tables
+
+def test_legacy_schema_is_adopted_and_cascades(fresh_database):
+    # the shape of a database created by hand before migrations existed
+    fresh_database("""
+        CREATE TABLE users (id uuid PRIMARY KEY DEFAULT gen_random_uuid(), email text NOT NULL UNIQUE,
+            access_token text, refresh_token text, token_expiry timestamptz, granted_scopes text[]);
+        CREATE TABLE schedules (id uuid PRIMARY KEY DEFAULT gen_random_uuid(), user_id uuid REFERENCES users(id),
+            name text NOT NULL, start_time time NOT NULL, end_time time NOT NULL, active_days jsonb NOT NULL DEFAULT '[]',
+            tasks jsonb NOT NULL DEFAULT '[]', mandatory_tasks jsonb NOT NULL DEFAULT '[]', time_zone text NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now(), updated_at timestamptz NOT NULL DEFAULT now());
+    """)
+    user_id = fresh_database("INSERT INTO users (email) VALUES ('old@example.com') RETURNING id")[0][0]
+    fresh_database("INSERT INTO schedules (user_id, name, start_time, end_time, time_zone) VALUES (%s, 'Old', '09:00', '17:00', 'UTC')", (user_id,))
+
+    migrate.migrate()
+
+    fresh_database("DELETE FROM users WHERE id = %s", (user_id,))
+    assert fresh_database("SELECT count(*) FROM schedules")[0][0] == 0
+
+def test_duplicate_emails_are_merged_into_the_last_login(fresh_database):
+    # concurrent first logins could insert one user per request before email was unique
+    fresh_database("""
+        CREATE TABLE users (id uuid PRIMARY KEY DEFAULT gen_random_uuid(), email text NOT NULL,
+            access_token text, refresh_token text, token_expiry timestamptz, granted_scopes text[]);
+        CREATE TABLE schedules (id uuid PRIMARY KEY DEFAULT gen_random_uuid(), user_id uuid REFERENCES users(id),
+            name text NOT NULL, start_time time NOT NULL, end_time time NOT NULL, active_days jsonb NOT NULL DEFAULT '[]',
+            tasks jsonb NOT NULL DEFAULT '[]', mandatory_tasks jsonb NOT NULL DEFAULT '[]', time_zone text NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now(), updated_at timestamptz NOT NULL DEFAULT now());
+    """)
+
+    def user(email, hours_ago, schedule=None, updated_hours_ago=0):
+        user_id = fresh_database("INSERT INTO users (email, token_expiry) VALUES (%s, now() - %s * interval '1 hour') RETURNING id",
+                                 (email, hours_ago))[0][0]
+        if schedule:
+            fresh_database("""INSERT INTO schedules (user_id, name, start_time, end_time, time_zone, updated_at)
+                VALUES (%s, %s, '09:00', '17:00', 'UTC', now() - %s * interval '1 hour')""", (user_id, schedule, updated_hours_ago))
+        return user_id
+
+    # the last login has no schedule: it takes the most recently updated one
+    user("a@example.com", 3, "Stale", updated_hours_ago=5)
+    user("a@example.com", 2, "Current", updated_hours_ago=1)
+    kept_a = user("a@example.com", 1)
+    # the last login has a schedule of its own and keeps it
+    user("b@example.com", 2, "Older")
+    kept_b = user("b@example.com", 1, "Own", updated_hours_ago=3)
+    single = user("c@example.com", 1, "Alone")
+
+    migrate.migrate()
+
+    assert sorted(fresh_database("SELECT email, id FROM users")) == [
+        ("a@example.com", kept_a), ("b@example.com", kept_b), ("c@example.com", single)]
+    assert dict(fresh_database("SELECT user_id, name FROM schedules")) == {kept_a: "Current", kept_b: "Own", single: "Alone"}
+    assert "users_email_key" in {row[0] for row in fresh_database("SELECT indexname FROM pg_indexes WHERE tablename = 'users'")}
+
+def explain(sql):
+    with db.get_db() as conn, conn.cursor() as cursor:
+        # with sequential scans priced out, the planner only picks one when no index can serve the query
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute(f"EXPLAIN {sql}")
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+        conn.rollback()
+    return plan
+
+def only_statement(queries):
+    assert len(queries) == 1, queries
+    return queries[0]
+
+def test_user_and_schedule_query_uses_indexes(make_user, queries):
+    from store import fetch_user_and_schedule
+
+    fetch_user_and_schedule(make_user())
+    plan = explain(only_statement(queries))
+    assert "Seq Scan" not in plan
+    assert "users_pkey" in plan
+    assert "schedules_user_id_key" in plan
+
+def test_login_upsert_uses_email_index(make_user):
+    plan = explain("""INSERT INTO users (email, access_token, refresh_token, token_expiry, granted_scopes)
+        VALUES ('user@example.com', 'a', 'r', now(), '{}')
+        ON CONFLICT (email) DO UPDATE SET access_token = EXCLUDED.access_token RETURNING id""")
+    assert "Conflict Arbiter Indexes: users_email_key" in plan
+
+def test_read_mirror_uses_index(make_user, queries):
+    from mirror import read_mirror
+
+    now = datetime.now(timezone.utc)
+    read_mirror(make_user(), now, now + timedelta(days=7))
+    plan = explain(only_statement(queries))
+    assert "Seq Scan" not in plan
+    assert "calendar_events_" in plan
+
+@pytest.mark.parametrize("prune", [False, True])
+def test_load_synced_events_uses_index(make_user, queries, prune):
+    from sync import load_synced_events
+
+    now = datetime.now(timezone.utc)
+    entries = [{"fingerprint": "abc", "start_at": now, "end_at": now + timedelta(hours=1)}]
+    load_synced_events(make_user(), entries, prune)
+    plan = explain(only_statement(queries))
+    assert "Seq Scan" not in plan
+    assert "synced_events_" in plan
+
+def test_job_reclaim_uses_index(make_user, queries):
+    from jobs import reclaim_abandoned_jobs
+
+    reclaim_abandoned_jobs()
+    plan = explain(only_statement(queries))
+    assert "Seq Scan" not in plan
+    assert "generation_jobs_" in plan
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+from bench.fakes import week_start_utc
+import clients
+import httpx
+import mirror
+import pytest
+import pytz
+
+def test_list_events_follows_every_page(fake_google):
+    google = fake_google(events_per_week=5, page_size=7)
+    items, sync_token = mirror.list_events("token", {"singleEvents": True})
+    # the fake seeds four weeks of events
+    assert len(items) == 20
+    assert len({item["id"] for item in items}) == 20
+    assert sync_token == "sync-token"
+    assert len(google.requests) == 3
+
+def test_calendar_events_full_then_incremental(make_user, fake_google, monkeypatch):
+    monkeypatch.setattr(mirror, "MIRROR_MAX_AGE", timedelta(0))
+    google = fake_google(events_per_week=5, page_size=4)
+    user_id = make_user()
+    week_start = week_start_utc()
+    before = mirror.mirror_stats.snapshot()
+
+    first = mirror.calendar_events(user_id, "token", week_start, week_start + timedelta(days=7))
+    assert len(first) == 5
+    assert len(google.requests) == 5
+
+    second = mirror.calendar_events(user_id, "token", week_start, week_start + timedelta(days=7))
+    assert second == first
+    # one incremental request with the stored sync token
+    assert len(google.requests) == 6
+    after = mirror.mirror_stats.snapshot()
+    assert after["full"] - before["full"] == 1
+    assert after["incremental"] - before["incremental"] == 1
+
+def test_fresh_mirror_is_read_without_google(make_user, fake_google):
+    google = fake_google()
+    user_id = make_user()
+    week_start = week_start_utc()
+    mirror.calendar_events(user_id, "token", week_start, week_start + timedelta(days=7))
+    requests = len(google.requests)
+    mirror.calendar_events(user_id, "token", week_start, week_start + timedelta(days=7))
+    assert len(google.requests) == requests
+
+def test_expired_sync_token_rebuilds_the_mirror(make_user, monkeypatch):
+    monkeypatch.setattr(mirror, "MIRROR_MAX_AGE", timedelta(0))
+    week_start = week_start_utc()
+    event = {"id": "e1", "status": "confirmed", "summary": "Kept",
+             "start": {"dateTime": (week_start + timedelta(hours=9)).isoformat()},
+             "end": {"dateTime": (week_start + timedelta(hours=10)).isoformat()}}
+    calls = []
+
+    def handler(request):
+        calls.append(dict(request.url.params))
+        if "syncToken" in request.url.params:
+            return httpx.Response(410, json={"error": {"code": 410}})
+        return httpx.Response(200, json={"items": [event], "nextSyncToken": f"token-{len(calls)}"})
+
+    monkeypatch.setitem(clients._clients, "google", httpx.Client(transport=httpx.MockTransport(handler)))
+    user_id = make_user()
+    mirror.calendar_events(user_id, "token", week_start, week_start + timedelta(days=7))
+    events = mirror.calendar_events(user_id, "token", week_start, week_start + timedelta(days=7))
+
+    assert [e["summary"] for e in events] == ["Kept"]
+    assert ["syncToken" in params for params in calls] == [False, True, False]
+
+def test_all_day_events_are_indexed_in_the_schedules_time_zone(make_user, monkeypatch):
+    monkeypatch.setattr(mirror, "MIRROR_MAX_AGE", timedelta(0))
+    tz = pytz.timezone("Pacific/Auckland")
+    today = datetime.now(tz).date()
+    monday = today - timedelta(days=today.weekday())
+    week_start = tz.localize(datetime.combine(monday, datetime.min.time()))
+    events = [
+        {"id": day.isoformat(), "status": "confirmed", "summary": label,
+         "start": {"date": day.isoformat()}, "end": {"date": (day + timedelta(days=1)).isoformat()}}
+        for day, label in ((monday - timedelta(days=1), "Sunday before"), (monday, "Monday"), (monday + timedelta(days=7), "Monday after"))
+    ]
+    calls = []
+
+    def handler(request):
+        calls.append(dict(request.url.params))
+        return httpx.Response(200, json={"items": events, "nextSyncToken": "token"})
+
+    monkeypatch.setitem(clients._clients, "google", httpx.Client(transport=httpx.MockTransport(handler)))
+    user_id = make_user()
+    read = mirror.calendar_events(user_id, "token", week_start, week_start + timedelta(days=7), "Pacific/Auckland")
+    # UTC midnights would put the Sunday inside the week
+    assert [event["summary"] for event in read] == ["Monday"]
+
+    # indexed for another zone: rebuilt with a full sync
+    mirror.calendar_events(user_id, "token", week_start, week_start + timedelta(days=7), "Pacific/Auckland")
+    mirror.calendar_events(user_id, "token", week_start, week_start + timedelta(days=7), "UTC")
+    assert ["syncToken" in params for params in calls] == [False, True, False]
+
+@pytest.mark.parametrize("status, expected", [(401, 401), (403, 403), (500, 500)])
+def test_google_errors_become_http_errors(monkeypatch, status, expected):
+    from fastapi import HTTPException
+
+    monkeypatch.setitem(clients._clients, "google", httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(status))))
+    with pytest.raises(HTTPException) as error:
+        mirror.list_events("token", {})
+    assert error.value.status_code == expected
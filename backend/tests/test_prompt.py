@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from intervals import CalendarIntervals
+from prompt import build_prompt, busy_blocks, count_tokens
+from solver import BUFFER_MINUTES
+import pytest
+import pytz
+
+WEEK_START = pytz.utc.localize(datetime(2025, 6, 2))
+
+def make_schedule(tasks=None):
+    return {
+        "id": "schedule-id",
+        "user_id": "user-id",
+        "time_zone": "UTC",
+        "start_time": "08:00",
+        "end_time": "20:00",
+        "active_days": ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY"],
+        "tasks": tasks if tasks is not None else [
+            {"id": "t1", "summary": "Gym", "duration": {"hours": 1, "minutes": 0}, "priority": "high", "color": "#ff0000"},
+            {"id": "t2", "summary": "Read", "duration": {"hours": 0, "minutes": 30}, "priority": "medium", "preferred_time": "evening"},
+            {"id": "t3", "summary": "Tidy up", "duration": {"hours": 0, "minutes": 45}, "priority": "low", "on_weekends": True},
+        ],
+        "mandatory_tasks": [{"summary": "Class", "start_time": "10:00", "end_time": "11:00", "start_day": "MONDAY", "end_day": "FRIDAY"}],
+    }
+
+def at(day, hour, minute=0):
+    return (WEEK_START + timedelta(days=day, hours=hour, minutes=minute)).timestamp()
+
+def light_calendar():
+    return CalendarIntervals([(at(day, 9), at(day, 9, 30)) for day in range(5)])
+
+def dense_calendar():
+    # a 15 minute meeting every 30 minutes of every working day; the 15
+    # minute gaps cannot hold anything
+    return CalendarIntervals([(at(day, 8, m), at(day, 8, m + 15)) for day in range(5) for m in range(0, 12 * 60, 30)])
+
+def spread_calendar():
+    # half-hour meetings three hours apart, leaving gaps that fit every task
+    return CalendarIntervals([(at(day, hour), at(day, hour, 30)) for day in range(5) for hour in (8, 11, 14, 17)])
+
+def busy_section(prompt):
+    return prompt.split("BUSY BLOCKS:\n")[1].split("\n\nOUTPUT:")[0]
+
+def test_prompt_leaves_out_ids_colors_and_owner():
+    prompt, tokens, dropped = build_prompt(make_schedule(), light_calendar(), WEEK_START)
+    assert dropped == []
+    assert tokens == count_tokens(prompt)
+    for field in ("schedule-id", "user-id", "#ff0000", '"t1"'):
+        assert field not in prompt
+    assert '"days":{"MONDAY":"2025-06-02"' in prompt
+    assert '"summary":"Read","minutes":30,"frequency":1,"priority":"medium","preferred_time":"evening","on_weekends":false' in prompt
+
+def test_busy_blocks_merge_small_gaps_and_clip_to_the_daily_hours():
+    calendar = CalendarIntervals([
+        (at(0, 6), at(0, 9)),            # starts before the daily hours
+        (at(0, 9, 30), at(0, 10)),       # 30 minute gap: merged below 31
+        (at(0, 13), at(0, 14)),
+        (at(0, 19, 30), at(0, 23)),      # ends after them
+        (at(5, 10), at(5, 11)),          # Saturday is not an active day
+    ])
+    blocks = busy_blocks(make_schedule(), calendar, WEEK_START, min_gap=31)
+    assert blocks == {"2025-06-02": "08:00-10:00, 13:00-14:00, 19:30-20:00"}
+    assert busy_blocks(make_schedule(), calendar, WEEK_START, min_gap=30)["2025-06-02"] == "08:00-09:00, 09:30-10:00, 13:00-14:00, 19:30-20:00"
+
+def test_half_and_whole_day_blocks():
+    calendar = CalendarIntervals([(at(0, 8), at(0, 9)), (at(0, 12), at(0, 13)), (at(0, 15), at(0, 16)), (at(0, 18), at(0, 19))])
+    # 08:00-20:00 splits at 14:00
+    assert busy_blocks(make_schedule(), calendar, WEEK_START, 0, parts=2) == {"2025-06-02": "08:00-13:00, 15:00-19:00"}
+    assert busy_blocks(make_schedule(), calendar, WEEK_START, 0, parts=1) == {"2025-06-02": "08:00-19:00"}
+
+def whole_day_tokens(schedule):
+    """Token count of schedule's prompt over spread_calendar with one block per day, the coarsest detail"""
+    whole_days = CalendarIntervals([(at(day, 8), at(day, 17, 30)) for day in range(5)])
+    return build_prompt(schedule, whole_days, WEEK_START, budget=10 ** 6)[1]
+
+def test_light_calendar_keeps_full_detail():
+    prompt, _, dropped = build_prompt(make_schedule(), light_calendar(), WEEK_START)
+    assert dropped == []
+    assert "2025-06-02: 09:00-09:30" in busy_section(prompt)
+
+def test_dense_calendar_is_coarsened_before_tasks_are_dropped():
+    calendar = spread_calendar()
+    detailed, detailed_tokens, _ = build_prompt(make_schedule(), calendar, WEEK_START, budget=10 ** 6)
+    assert busy_section(detailed).splitlines()[0] == "2025-06-02: 08:00-08:30, 11:00-11:30, 14:00-14:30, 17:00-17:30"
+
+    prompt, tokens, dropped = build_prompt(make_schedule(), calendar, WEEK_START, budget=detailed_tokens - 1)
+    assert dropped == []
+    assert tokens < detailed_tokens
+    assert busy_section(prompt).count(",") < busy_section(detailed).count(",")
+
+def test_whole_day_blocks_are_tried_before_any_task_is_dropped():
+    schedule = make_schedule()
+    prompt, _, dropped = build_prompt(schedule, spread_calendar(), WEEK_START, budget=whole_day_tokens(schedule))
+    assert dropped == []
+    assert busy_section(prompt).splitlines() == [f"2025-06-0{day}: 08:00-17:30" for day in range(2, 7)]
+
+def test_tasks_are_dropped_lowest_priority_first_and_reported():
+    schedule = make_schedule()
+    without_tidy_up = make_schedule(schedule["tasks"][:2])
+    prompt, _, dropped = build_prompt(schedule, spread_calendar(), WEEK_START, budget=whole_day_tokens(without_tidy_up))
+    assert dropped == ["Tidy up"]
+    assert '"summary":"Tidy up"' not in prompt
+    assert '"summary":"Read"' in prompt
+
+    prompt, _, dropped = build_prompt(schedule, spread_calendar(), WEEK_START, budget=whole_day_tokens(make_schedule(schedule["tasks"][:1])))
+    assert dropped == ["Read", "Tidy up"]
+
+def test_dense_calendar_folds_gaps_too_small_for_any_task():
+    prompt, _, _ = build_prompt(make_schedule(), dense_calendar(), WEEK_START)
+    assert busy_section(prompt).splitlines()[0] == "2025-06-02: 08:00-19:45"
+
+def test_prompt_that_cannot_fit_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        build_prompt(make_schedule(), dense_calendar(), WEEK_START, budget=10)
+    assert error.value.status_code == 400
+
+def test_min_gap_depends_on_the_shortest_task():
+    calendar = CalendarIntervals([(at(0, 9), at(0, 10)), (at(0, 11, 30), at(0, 12))])
+    thirty_minutes = [{"summary": "Read", "duration": {"hours": 0, "minutes": 30}}]
+    two_hours = [{"summary": "Hike", "duration": {"hours": 2, "minutes": 0}}]
+    # a 90 minute gap fits 30 minutes plus two buffers, not 2 hours
+    assert BUFFER_MINUTES == 30
+    assert "09:00-10:00, 11:30-12:00" in busy_section(build_prompt(make_schedule(thirty_minutes), calendar, WEEK_START)[0])
+    assert "09:00-12:00" in busy_section(build_prompt(make_schedule(two_hours), calendar, WEEK_START)[0])
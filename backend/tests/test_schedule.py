@@ -0,0 +1,126 @@
+import pytest
+
+@pytest.fixture
+def client(make_user, client_for):
+    return client_for(make_user())
+
+def current(client):
+    response = client.get("/schedule/get")
+    assert response.status_code == 200
+    return response.json()
+
+def patch(client, body):
+    return client.patch("/schedule/save", json={"updated_at": current(client)["updated_at"], **body})
+
+def test_update_op_merges_validated_fields(client):
+    response = patch(client, {"task_ops": [{"op": "update", "id": "t1", "value": {"frequency": "3", "priority": "high", "onWeekends": True}}]})
+    assert response.status_code == 200
+    task = current(client)["tasks"][0]
+    assert task["frequency"] == 3
+    assert task["priority"] == "high"
+    assert task["summary"] == "Gym"
+    # unknown keys are dropped like on a full save
+    assert "onWeekends" not in task
+
+def test_update_op_clears_optional_fields(client):
+    patch(client, {"task_ops": [{"op": "update", "id": "t1", "value": {"color": "#fff"}}]})
+    assert current(client)["tasks"][0]["color"] == "#fff"
+    assert patch(client, {"task_ops": [{"op": "update", "id": "t1", "value": {"color": None}}]}).status_code == 200
+    assert "color" not in current(client)["tasks"][0]
+
+@pytest.mark.parametrize("value", [
+    {"frequency": "often"},
+    {"summary": None},
+    {"priority": "urgent"},
+    {"duration": {"hours": "x"}},
+])
+def test_update_op_rejects_invalid_values(client, value):
+    response = patch(client, {"task_ops": [{"op": "update", "id": "t1", "value": value}]})
+    assert response.status_code == 422
+    assert current(client)["tasks"][0]["summary"] == "Gym"
+
+def test_update_op_cannot_change_id(client):
+    response = patch(client, {"task_ops": [{"op": "update", "id": "t1", "value": {"id": "t2"}}]})
+    assert response.status_code == 400
+
+def test_mandatory_update_checks_times(client):
+    mandatory = {"id": "m1", "summary": "Lunch", "start_time": "12:00", "end_time": "13:00", "start_day": "MONDAY", "end_day": "MONDAY"}
+    assert patch(client, {"mandatory_task_ops": [{"op": "add", "value": mandatory}]}).status_code == 200
+    response = patch(client, {"mandatory_task_ops": [{"op": "update", "id": "m1", "value": {"end_time": "25:99"}}]})
+    assert response.status_code == 422
+    assert patch(client, {"mandatory_task_ops": [{"op": "update", "id": "m1", "value": {"end_time": "14:30"}}]}).status_code == 200
+    assert current(client)["mandatory_tasks"][0]["end_time"] == "14:30"
+
+@pytest.mark.parametrize("body", [{"name": None}, {"name": 5}, {"time_zone": None}, {"time_zone": "Mars/Olympus_Mons"}, {"start_time": "nine"}])
+def test_plain_fields_are_validated(client, body):
+    assert patch(client, body).status_code == 422
+    assert current(client)["name"] == "My Schedule"
+
+def test_invalid_updated_at_is_rejected(client):
+    response = client.patch("/schedule/save", json={"updated_at": "yesterday", "name": "New"})
+    assert response.status_code == 422
+
+def test_stale_updated_at_conflicts(client):
+    stale = current(client)["updated_at"]
+    assert patch(client, {"name": "First"}).status_code == 200
+    response = client.patch("/schedule/save", json={"updated_at": stale, "name": "Second"})
+    assert response.status_code == 409
+    assert current(client)["name"] == "First"
+
+def test_get_bypasses_rows_cached_before_another_process_saved(make_user, client_for, db_pool):
+    from store import fetch_user_and_schedule
+
+    user_id = make_user()
+    client = client_for(user_id)
+    fetch_user_and_schedule(user_id)
+    # another worker saves; this process still has the old row cached
+    with db_pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("UPDATE schedules SET name = 'Elsewhere', updated_at = now() WHERE user_id = %s", (user_id,))
+        conn.commit()
+
+    schedule = current(client)
+    assert schedule["name"] == "Elsewhere"
+    assert client.patch("/schedule/save", json={"updated_at": schedule["updated_at"], "name": "Here"}).status_code == 200
+
+def test_get_returns_the_stored_row(client):
+    schedule = current(client)
+    assert set(schedule) == {"id", "user_id", "name", "time_zone", "start_time", "end_time", "active_days",
+                             "tasks", "mandatory_tasks", "created_at", "updated_at"}
+    assert schedule["start_time"] == "09:00"
+    assert schedule["tasks"] == [{"id": "t1", "summary": "Gym", "duration": {"hours": 1, "minutes": 0}, "frequency": 1}]
+
+def test_saved_schedule_round_trips(client):
+    saved = {
+        "name": "Round trip", "time_zone": "Europe/Berlin", "start_time": "07:30", "end_time": "21:00",
+        "active_days": ["SATURDAY", "SUNDAY"],
+        "tasks": [{"id": "a", "summary": "Read", "duration": {"hours": 0, "minutes": 30}, "priority": "", "frequency": None}],
+        "mandatory_tasks": [{"id": "m", "summary": "Class", "start_time": "10:00", "end_time": "11:00", "start_day": "SATURDAY", "end_day": "SATURDAY"}],
+    }
+    assert client.post("/schedule/save", json=saved).status_code == 200
+    schedule = current(client)
+    assert schedule["tasks"] == [{"id": "a", "summary": "Read", "duration": {"hours": 0, "minutes": 30}, "on_weekends": False, "frequency": 1}]
+    assert schedule["mandatory_tasks"] == saved["mandatory_tasks"]
+    assert schedule["start_time"] == "07:30"
+
+def test_save_rejects_unknown_time_zone(client):
+    schedule = {"name": "Zoned", "time_zone": "Europe/Atlantis", "start_time": "08:00", "end_time": "18:00", "active_days": ["MONDAY"]}
+    response = client.post("/schedule/save", json=schedule)
+    assert response.status_code == 422
+    assert "Unknown time zone: Europe/Atlantis" in response.text
+    assert client.post("/schedule/save", json={**schedule, "time_zone": "Europe/Lisbon"}).status_code == 200
+    assert current(client)["time_zone"] == "Europe/Lisbon"
+
+def test_stored_unknown_time_zone_is_served_and_rejected_by_generate(make_user, client_for, db_pool, fake_google):
+    user_id = make_user()
+    # saved before time zones were validated
+    with db_pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("UPDATE schedules SET time_zone = 'Nowhere/Special' WHERE user_id = %s", (user_id,))
+        conn.commit()
+    google = fake_google()
+    client = client_for(user_id)
+    assert current(client)["time_zone"] == "Nowhere/Special"
+    for path in ("/generate/schedule?mode=solver", "/generate/range?mode=solver"):
+        response = client.get(path)
+        assert response.status_code == 400
+        assert "time zone Nowhere/Special is not valid" in response.json()["detail"]
+    assert google.requests == []
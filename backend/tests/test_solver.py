@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+from intervals import BusyIndex, CalendarIntervals, event_bounds, parse_event_time
+from solver import BUFFER_MINUTES, PREFERRED_WINDOWS, solve_week
+import pytz
+
+BERLIN = pytz.timezone("Europe/Berlin")
+WEEK_START = BERLIN.localize(datetime(2025, 6, 2))
+ALL_DAYS = ["MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY"]
+
+def make_schedule(tasks=(), mandatory_tasks=(), **overrides):
+    return {
+        "time_zone": "Europe/Berlin",
+        "start_time": "08:00",
+        "end_time": "20:00",
+        "active_days": ALL_DAYS,
+        "tasks": list(tasks),
+        "mandatory_tasks": list(mandatory_tasks),
+        **overrides,
+    }
+
+def task(summary, hours=1, minutes=0, **fields):
+    return {"id": summary, "summary": summary, "duration": {"hours": hours, "minutes": minutes}, **fields}
+
+def local(week_start, day, hour, minute=0, tz=BERLIN):
+    date = (week_start + timedelta(days=day)).date()
+    return tz.localize(datetime.combine(date, datetime.min.time()) + timedelta(hours=hour, minutes=minute))
+
+def busy_block(start, end):
+    return (start.timestamp(), end.timestamp())
+
+def starts(events, summary, tz=BERLIN):
+    return [parse_event_time(event["start"]).astimezone(tz) for event in events if event["summary"] == summary]
+
+def assert_conflict_free(events, busy, mandatory=(), buffer=BUFFER_MINUTES * 60):
+    """No placed task comes within buffer of the calendar, a mandatory task or another task"""
+    taken = BusyIndex(list(busy))
+    for event in events:
+        if event["summary"] in mandatory:
+            taken.add(*event_bounds(event))
+    for event in events:
+        if event["summary"] in mandatory:
+            continue
+        start, end = event_bounds(event)
+        assert not taken.overlaps(start, end, buffer), event
+        taken.add(start, end)
+
+def test_tasks_avoid_busy_blocks_and_mandatory_tasks():
+    busy = CalendarIntervals([
+        busy_block(local(WEEK_START, day, 8), local(WEEK_START, day, 11)) for day in range(7)
+    ] + [busy_block(local(WEEK_START, 2, 12), local(WEEK_START, 2, 18))])
+    schedule = make_schedule(
+        tasks=[task("Gym", frequency=5, on_weekends=True), task("Read", minutes=30, frequency=7, on_weekends=True)],
+        mandatory_tasks=[{"summary": "Class", "start_time": "11:30", "end_time": "13:00", "start_day": "MONDAY", "end_day": "FRIDAY"}],
+    )
+
+    events = solve_week(schedule, busy, WEEK_START)
+
+    assert_conflict_free(events, busy, mandatory={"Class"})
+    assert len(starts(events, "Class")) == 5
+    assert all(start.hour == 11 and start.minute == 30 for start in starts(events, "Class"))
+    for event in events:
+        start, end = parse_event_time(event["start"]).astimezone(BERLIN), parse_event_time(event["end"]).astimezone(BERLIN)
+        if event["summary"] != "Class":
+            assert start.time() >= datetime.strptime("08:00", "%H:%M").time()
+            assert end.time() <= datetime.strptime("20:00", "%H:%M").time()
+
+def test_events_are_sorted_by_start():
+    schedule = make_schedule(tasks=[task(f"Task {i}", frequency=3, on_weekends=True) for i in range(5)])
+    events = solve_week(schedule, CalendarIntervals(), WEEK_START)
+    assert [event["start"]["dateTime"] for event in events] == sorted(event["start"]["dateTime"] for event in events)
+
+def test_higher_priority_tasks_are_placed_first():
+    # one free hour-long slot (plus buffers) on a single active day
+    schedule = make_schedule(
+        active_days=["MONDAY"], start_time="09:00", end_time="10:00",
+        tasks=[task("Low", priority="low"), task("High", priority="high"), task("Medium", priority="medium")],
+    )
+    events = solve_week(schedule, CalendarIntervals(), WEEK_START)
+    assert [event["summary"] for event in events] == ["High"]
+
+def test_preferred_time_window_is_used_when_free():
+    schedule = make_schedule(tasks=[task(name, preferred_time=name, frequency=7, on_weekends=True) for name in ("morning", "afternoon", "evening")])
+    events = solve_week(schedule, CalendarIntervals(), WEEK_START)
+    for name in ("morning", "afternoon", "evening"):
+        window_start, window_end = PREFERRED_WINDOWS[name]
+        placed = starts(events, name)
+        assert len(placed) == 7
+        assert all(window_start <= start.hour * 60 + start.minute < window_end for start in placed)
+
+def test_preferred_time_falls_back_to_the_daily_hours():
+    busy = CalendarIntervals([busy_block(local(WEEK_START, 0, 8), local(WEEK_START, 0, 12))])
+    schedule = make_schedule(active_days=["MONDAY"], tasks=[task("Run", preferred_time="morning")])
+    [event] = solve_week(schedule, busy, WEEK_START)
+    assert parse_event_time(event["start"]).astimezone(BERLIN).hour == 12
+    assert parse_event_time(event["start"]).astimezone(BERLIN).minute == BUFFER_MINUTES
+
+def test_weekends_only_when_allowed():
+    schedule = make_schedule(tasks=[task("Weekday", frequency=7), task("Any day", frequency=7, on_weekends=True)])
+    events = solve_week(schedule, CalendarIntervals(), WEEK_START)
+    assert sorted(start.weekday() for start in starts(events, "Weekday")) == [0, 1, 2, 3, 4]
+    assert sorted(start.weekday() for start in starts(events, "Any day")) == [0, 1, 2, 3, 4, 5, 6]
+
+def test_frequency_is_spread_over_distinct_days():
+    schedule = make_schedule(tasks=[task("Gym", frequency=3), task("Never", hours=0, minutes=0)])
+    events = solve_week(schedule, CalendarIntervals(), WEEK_START)
+    days = [start.date() for start in starts(events, "Gym")]
+    assert len(days) == 3 == len(set(days))
+    assert starts(events, "Never") == []
+
+def test_inactive_days_are_left_empty():
+    schedule = make_schedule(
+        active_days=["TUESDAY", "THURSDAY"],
+        tasks=[task("Gym", frequency=5, on_weekends=True)],
+        mandatory_tasks=[{"summary": "Class", "start_time": "09:00", "end_time": "10:00", "start_day": "MONDAY", "end_day": "SUNDAY"}],
+    )
+    events = solve_week(schedule, CalendarIntervals(), WEEK_START)
+    assert {start.weekday() for start in starts(events, "Gym") + starts(events, "Class")} == {1, 3}
+
+def test_spring_forward_week_keeps_local_times():
+    # Berlin moves from +01:00 to +02:00 at 02:00 on Sunday 2025-03-30
+    week_start = BERLIN.localize(datetime(2025, 3, 24))
+    sunday_meeting = busy_block(local(week_start, 6, 8), local(week_start, 6, 10))
+    schedule = make_schedule(
+        tasks=[task("Gym", frequency=7, on_weekends=True, preferred_time="morning")],
+        mandatory_tasks=[{"summary": "Standup", "start_time": "13:00", "end_time": "13:30", "start_day": "MONDAY", "end_day": "SUNDAY"}],
+    )
+
+    events = solve_week(schedule, CalendarIntervals([sunday_meeting]), week_start)
+
+    assert_conflict_free(events, [sunday_meeting], mandatory={"Standup"})
+    standups = starts(events, "Standup")
+    assert [start.utcoffset() for start in standups] == [timedelta(hours=1)] * 6 + [timedelta(hours=2)]
+    assert all((start.hour, start.minute) == (13, 0) for start in standups)
+    gym = starts(events, "Gym")
+    assert [(start.hour, start.minute) for start in gym] == [(8, 0)] * 6 + [(10, BUFFER_MINUTES)]
+    assert gym[-1].isoformat() == "2025-03-30T10:30:00+02:00"
+
+def test_fall_back_week_blocks_utc_busy_time_in_local_hours():
+    # Berlin moves from +02:00 to +01:00 on Sunday 2025-10-26; a meeting from
+    # 07:00 to 09:00 UTC is 08:00-10:00 local that day
+    week_start = BERLIN.localize(datetime(2025, 10, 20))
+    meeting = busy_block(pytz.utc.localize(datetime(2025, 10, 26, 7)), pytz.utc.localize(datetime(2025, 10, 26, 9)))
+    schedule = make_schedule(active_days=["SUNDAY"], tasks=[task("Read", on_weekends=True)])
+
+    [event] = solve_week(schedule, CalendarIntervals([meeting]), week_start)
+
+    assert event["start"]["dateTime"] == "2025-10-26T10:30:00+01:00"
+    assert_conflict_free([event], [meeting])
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+from store import fetch_user_and_schedule
+import pytest
+
+def test_rows_are_fetched_once_then_cached(make_user, queries):
+    user_id = make_user()
+    user, schedule = fetch_user_and_schedule(user_id)
+    assert user["email"] == "user@example.com"
+    assert schedule["name"] == "My Schedule"
+    assert len(queries) == 1
+    assert queries[0].lstrip().startswith("SELECT")
+
+    assert fetch_user_and_schedule(user_id) == (user, schedule)
+    assert len(queries) == 1
+
+def test_missing_schedule_is_created_once(make_user, queries):
+    user_id = make_user(schedule=False)
+    assert fetch_user_and_schedule(user_id)[1] is None
+    user, schedule = fetch_user_and_schedule(user_id, create_schedule=True)
+    assert schedule["name"] == "My Schedule"
+    assert len(queries.statements("SELECT")) == 2
+    assert len(queries.statements("INSERT INTO schedules")) == 1
+
+    queries.clear()
+    assert fetch_user_and_schedule(user_id, create_schedule=True) == (user, schedule)
+    assert queries == []
+
+def test_unknown_user_is_not_cached(db_pool, queries):
+    missing = "00000000-0000-0000-0000-000000000000"
+    assert fetch_user_and_schedule(missing) == (None, None)
+    assert fetch_user_and_schedule(missing) == (None, None)
+    assert len(queries) == 2
+
+@pytest.fixture
+def cached_user(make_user, queries):
+    """A user whose rows are in the cache, with the query log cleared"""
+    user_id = make_user()
+    fetch_user_and_schedule(user_id)
+    queries.clear()
+    return user_id
+
+def refetched(user_id, queries):
+    """Fetch again, asserting the cache was invalidated (one query)"""
+    queries.clear()
+    rows = fetch_user_and_schedule(user_id)
+    assert len(queries) == 1
+    return rows
+
+def test_save_invalidates(cached_user, client_for, queries):
+    schedule = {"name": "Saved", "time_zone": "UTC", "start_time": "08:00", "end_time": "18:00", "active_days": ["MONDAY"]}
+    assert client_for(cached_user).post("/schedule/save", json=schedule).status_code == 200
+    assert len(queries.statements("UPDATE schedules")) == 1
+    assert refetched(cached_user, queries)[1]["name"] == "Saved"
+
+def test_patch_invalidates(cached_user, client_for, queries):
+    client = client_for(cached_user)
+    updated_at = client.get("/schedule/get").json()["updated_at"]
+    response = client.patch("/schedule/save", json={"updated_at": updated_at, "name": "Patched"})
+    assert response.status_code == 200
+    assert len(queries.statements("UPDATE schedules")) == 1
+    assert refetched(cached_user, queries)[1]["name"] == "Patched"
+
+def test_token_refresh_invalidates(make_user, fake_google, queries):
+    from tokens import token_manager
+
+    fake_google()
+    user_id = make_user(token_expiry=datetime.now(timezone.utc) - timedelta(minutes=1))
+    user, _ = fetch_user_and_schedule(user_id)
+    access_token = token_manager.get_access_token(user)
+    assert refetched(user_id, queries)[0]["access_token"] == access_token
+
+def test_login_invalidates(cached_user, login, queries):
+    login("user@example.com")
+    assert refetched(cached_user, queries)[0]["access_token"] == "access-user@example.com"
+
+def test_delete_invalidates(cached_user, client_for, queries):
+    response = client_for(cached_user).delete("/auth/delete/account")
+    assert response.status_code == 200
+    assert len(queries.statements("DELETE FROM users")) == 1
+    assert refetched(cached_user, queries) == (None, None)
+
+@pytest.mark.parametrize("env, enabled", [
+    ({}, True),
+    ({"WEB_CONCURRENCY": "1"}, True),
+    ({"WEB_CONCURRENCY": "4"}, False),
+    ({"WEB_CONCURRENCY": "4", "ROW_CACHE": "true"}, True),
+    ({"ROW_CACHE": "false"}, False),
+])
+def test_row_cache_is_off_with_several_workers(monkeypatch, env, enabled):
+    import store
+
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.delenv("ROW_CACHE", raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    assert store.row_cache_enabled() is enabled
+
+def test_disabled_row_cache_reads_every_time(make_user, queries, monkeypatch):
+    import store
+
+    monkeypatch.setattr(store, "ROW_CACHE_ENABLED", False)
+    user_id = make_user()
+    fetch_user_and_schedule(user_id)
+    fetch_user_and_schedule(user_id)
+    assert len(queries) == 2
+    assert len(store.row_cache) == 0
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone
+from bench.fakes import Faults
+import asyncio
+import clients
+import httpx
+import pytest
+import sync
+import time
+
+def events(count, prefix="Focus"):
+    start = datetime(2025, 6, 2, 8, tzinfo=timezone.utc)
+    return [
+        {
+            "summary": f"{prefix} {i}",
+            "start": {"dateTime": (start + timedelta(minutes=30 * i)).isoformat(), "timeZone": "UTC"},
+            "end": {"dateTime": (start + timedelta(minutes=30 * i + 25)).isoformat(), "timeZone": "UTC"},
+        }
+        for i in range(count)
+    ]
+
+def plan(count):
+    return [("insert", sync.fingerprint_event(event), None) for event in events(count)]
+
+def test_inserts_run_concurrently(fake_google, monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_CONCURRENCY", 5)
+    google = fake_google(Faults(latency_ms=50))
+    results = asyncio.run(sync.apply_sync_plan("token", plan(20)))
+    assert [result["status"] for result in results] == ["created"] * 20
+    assert len(google.requests) == 20
+    # the fake's latency keeps requests open long enough to overlap
+    assert 1 < google.app.state.peak_in_flight <= 5
+
+def test_sync_endpoint_records_and_skips_synced_events(make_user, client_for, fake_google):
+    google = fake_google()
+    client = client_for(make_user())
+    body = events(5)
+
+    first = client.post("/sync/schedule", json=body)
+    assert first.status_code == 200
+    assert [result["status"] for result in first.json()["results"]] == ["created"] * 5
+    posts = [request for request in google.requests if request[0] == "POST"]
+    assert len(posts) == 5
+
+    second = client.post("/sync/schedule", json=body)
+    assert [result["status"] for result in second.json()["results"]] == ["unchanged"] * 5
+    assert [request for request in google.requests if request[0] == "POST"] == posts
+
+def install_responses(monkeypatch, *responses):
+    """Answer Calendar requests with the given (status, headers) in turn"""
+    calls = []
+
+    def handler(request):
+        status, headers = responses[min(len(calls), len(responses) - 1)]
+        calls.append(time.perf_counter())
+        return httpx.Response(status, headers=headers, json={"id": "created"} if status == 200 else {"error": {"errors": []}})
+
+    monkeypatch.setitem(clients._clients, "google_async", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return calls
+
+def test_retry_after_within_cap_is_honoured(monkeypatch):
+    calls = install_responses(monkeypatch, (429, {"Retry-After": "1"}), (200, {}))
+    [result] = asyncio.run(sync.apply_sync_plan("token", plan(1)))
+    assert result["status"] == "created"
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 1
+
+def test_retry_after_over_cap_fails_the_event(monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_MAX_RETRY_DELAY", 8)
+    calls = install_responses(monkeypatch, (429, {"Retry-After": "3600"}), (200, {}))
+    started = time.perf_counter()
+    [result] = asyncio.run(sync.apply_sync_plan("token", plan(1)))
+    assert result["status"] == "failed"
+    assert result["status_code"] == 429
+    assert len(calls) == 1
+    assert time.perf_counter() - started < 1
+
+def test_server_errors_retry_with_capped_backoff(monkeypatch):
+    waits = []
+    monkeypatch.setattr(sync.random, "uniform", lambda low, high: waits.append(high) or 0)
+    calls = install_responses(monkeypatch, (503, {}))
+    [result] = asyncio.run(sync.apply_sync_plan("token", plan(1)))
+    assert result["status"] == "failed"
+    assert len(calls) == sync.SYNC_MAX_RETRIES + 1
+    assert all(high <= sync.SYNC_MAX_RETRY_DELAY for high in waits)
+
+@pytest.mark.parametrize("status", [400, 404])
+def test_client_errors_are_not_retried(monkeypatch, status):
+    calls = install_responses(monkeypatch, (status, {}))
+    [result] = asyncio.run(sync.apply_sync_plan("token", plan(1)))
+    assert result["status"] == "failed"
+    assert len(calls) == 1
+
+@pytest.mark.parametrize("value, expected", [
+    ({"dateTime": "2025-06-02T09:00:00Z"}, "2025-06-02T09:00:00+00:00"),
+    ({"dateTime": "2025-06-02T11:00:00+02:00"}, "2025-06-02T09:00:00+00:00"),
+    ({"dateTime": "2025-06-02T11:00:00", "timeZone": "Europe/Berlin"}, "2025-06-02T09:00:00+00:00"),
+    ({"date": "2025-06-02"}, "2025-06-02T00:00:00+00:00"),
+])
+def test_event_times_share_the_calendar_parser(value, expected):
+    assert sync.event_time(value).isoformat() == expected
+
+@pytest.mark.parametrize("value", [None, {}, "2025-06-02T09:00:00Z", {"dateTime": "tomorrow"}, {"date": "2025-13-40"}])
+def test_invalid_event_time_is_400(make_user, client_for, fake_google, value):
+    fake_google()
+    body = [{"summary": "Bad", "start": value, "end": {"dateTime": "2025-06-02T10:00:00Z"}}]
+    response = client_for(make_user()).post("/sync/schedule", json=body)
+    assert response.status_code == 400
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from bench.fakes import Faults
+from store import fetch_user_and_schedule
+from tokens import token_manager
+import threading
+
+def test_concurrent_requests_share_one_refresh(make_user, fake_google, queries):
+    google = fake_google(Faults(latency_ms=200))
+    user_id = make_user(token_expiry=datetime.now(timezone.utc) - timedelta(minutes=1))
+    user, _ = fetch_user_and_schedule(user_id)
+    queries.clear()
+    refreshes = token_manager.refreshes
+
+    threads = 20
+    barrier = threading.Barrier(threads)
+
+    def get_token():
+        barrier.wait()
+        return token_manager.get_access_token(user)
+
+    with ThreadPoolExecutor(threads) as executor:
+        tokens = list(executor.map(lambda _: get_token(), range(threads)))
+
+    assert len(set(tokens)) == 1
+    assert tokens[0].startswith("fake-access-")
+    assert google.requests == [("POST", "/token")]
+    assert token_manager.refreshes == refreshes + 1
+    assert len(queries.statements("UPDATE users")) == 1
+    assert queries == queries.statements("UPDATE users")
+
+    # the refreshed token is persisted and cached for the next request
+    fresh_user, _ = fetch_user_and_schedule(user_id)
+    assert fresh_user["access_token"] == tokens[0]
+    assert token_manager.get_access_token(user) == tokens[0]
+    assert len(google.requests) == 1
+
+def test_fresh_token_is_not_refreshed(make_user, fake_google, queries):
+    google = fake_google()
+    user, _ = fetch_user_and_schedule(make_user())
+    assert token_manager.get_access_token(user) == "access"
+    assert google.requests == []
+    assert queries.statements("UPDATE") == []
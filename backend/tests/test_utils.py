@@ -0,0 +1,110 @@
+from datetime import timedelta
+from fastapi import HTTPException
+from starlette.requests import Request
+from utils import TokenCache, create_token, decode_token, get_email, get_user_id, token_cache
+import pytest
+import utils
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Counts the signature checks done by jose"""
+    calls = []
+    original = utils.jwt.decode
+
+    def decode(*args, **kwargs):
+        calls.append(args[0])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(utils.jwt, "decode", decode)
+    return calls
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces time.time in utils with a settable clock"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(utils.time, "time", lambda: now[0])
+    return now
+
+def request_with(token):
+    return Request({"type": "http", "headers": [(b"cookie", f"token={token}".encode())]})
+
+def test_valid_token_is_decoded_once(decodes):
+    token = create_token({"user_id": "u1", "email": "user@example.com"})
+    assert decode_token(token)["user_id"] == "u1"
+    assert decode_token(token)["user_id"] == "u1"
+    assert decodes == [token]
+
+def test_entry_expires_at_the_token_exp(clock):
+    cache = TokenCache(maxsize=10, ttl=300)
+    payload = {"user_id": "u1", "exp": clock[0] + 60}
+    cache.put("token", payload)
+    clock[0] += 59
+    assert cache.get("token") == payload
+    clock[0] += 1
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+def test_entry_expires_after_the_ttl_when_exp_is_later(clock):
+    cache = TokenCache(maxsize=10, ttl=300)
+    cache.put("token", {"user_id": "u1", "exp": clock[0] + 3600})
+    clock[0] += 299
+    assert cache.get("token") is not None
+    clock[0] += 1
+    assert cache.get("token") is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TokenCache(maxsize=2, ttl=300)
+    cache.put("a", {"user_id": "a"})
+    cache.put("b", {"user_id": "b"})
+    cache.get("a")
+    cache.put("c", {"user_id": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"user_id": "a"}
+    assert cache.get("c") == {"user_id": "c"}
+
+def test_expired_token_is_rejected_and_not_cached(decodes):
+    token = create_token({"user_id": "u1"}, expires_delta=timedelta(seconds=-1))
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            decode_token(token)
+        assert error.value.detail == "Token has expired"
+    assert len(decodes) == 2
+    assert token_cache.stats()["size"] == 0
+
+def test_invalid_token_is_rejected_and_not_cached(decodes):
+    forged = create_token({"user_id": "u1"})[:-2] + "xx"
+    for token in (forged, "not-a-jwt"):
+        with pytest.raises(HTTPException) as error:
+            decode_token(token)
+        assert error.value.status_code == 401
+    assert token_cache.stats()["size"] == 0
+
+def test_request_decodes_once_through_request_state(monkeypatch):
+    calls = []
+    original = utils.decode_token
+
+    def counting_decode(token):
+        calls.append(token)
+        return original(token)
+
+    monkeypatch.setattr(utils, "decode_token", counting_decode)
+    token = create_token({"user_id": "u1", "email": "user@example.com"})
+    request = request_with(token)
+    assert get_user_id(request) == "u1"
+    assert get_email(request) == "user@example.com"
+    assert get_user_id(request) == "u1"
+    assert calls == [token]
+    # a new request starts without a payload and goes to the cache again
+    assert get_email(request_with(token)) == "user@example.com"
+    assert calls == [token, token]
+
+def test_missing_cookie_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        get_user_id(Request({"type": "http", "headers": []}))
+    assert error.value.status_code == 401
@@ -0,0 +1,88 @@
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from dotenv import load_dotenv
+from utils import refresh_access_token
+from db import get_db
+from store import invalidate
+import httpx
+import os
+import threading
+
+load_dotenv()
+
+# refresh this long before Google's expiry so a token never dies mid-request
+REFRESH_AHEAD = timedelta(seconds=int(os.getenv("TOKEN_REFRESH_AHEAD_SECONDS", "300")))
+
+class TokenManager:
+    """Caches each user's Google access token and refreshes it once, ahead of expiry.
+
+    Concurrent requests for the same user that find the token stale share a
+    single in-flight refresh; the refreshed token is persisted once.
+    """
+
+    def __init__(self, refresh_ahead: timedelta = REFRESH_AHEAD):
+        self.refresh_ahead = refresh_ahead
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._inflight = {}
+        self.refreshes = 0
+
+    def _fresh(self, expiry) -> bool:
+        return expiry is not None and expiry - self.refresh_ahead > datetime.now(timezone.utc)
+
+    # user is the users row (needs id, access_token, token_expiry, refresh_token)
+    def get_access_token(self, user) -> str:
+        user_id = user["id"]
+        with self._lock:
+            cached = self._tokens.get(user_id)
+            if cached and self._fresh(cached[1]):
+                return cached[0]
+            if self._fresh(user["token_expiry"]):
+                self._tokens[user_id] = (user["access_token"], user["token_expiry"])
+                return user["access_token"]
+            future = self._inflight.get(user_id)
+            leader = future is None
+            if leader:
+                future = self._inflight[user_id] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            access_token, expiry = self._refresh(user_id, user["refresh_token"])
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(access_token)
+            return access_token
+        finally:
+            with self._lock:
+                self._inflight.pop(user_id, None)
+
+    def _refresh(self, user_id, refresh_token):
+        try:
+            token = refresh_access_token(refresh_token)
+        except (httpx.HTTPStatusError, httpx.RequestError):
+            token = None
+        if not token or "access_token" not in token:
+            raise HTTPException(status_code=401, detail="Failed to refresh access token. Please log in again.")
+
+        access_token = token["access_token"]
+        expiry = datetime.now(timezone.utc) + timedelta(seconds=token["expires_in"])
+        with get_db() as conn, conn.cursor() as cursor:
+            cursor.execute("UPDATE users SET access_token = %s, token_expiry = %s WHERE id = %s", (access_token, expiry, user_id))
+            conn.commit()
+        invalidate(user_id)
+        with self._lock:
+            self._tokens[user_id] = (access_token, expiry)
+            self.refreshes += 1
+        return access_token, expiry
+
+    # drop the cached token, e.g. after the user logs in again with new grants
+    def forget(self, user_id):
+        with self._lock:
+            self._tokens.pop(user_id, None)
+
+token_manager = TokenManager()
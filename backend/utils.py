@@ -3,12 +3,16 @@ from jose.exceptions import ExpiredSignatureError
 from fastapi import HTTPException
 from dotenv import load_dotenv
 import os
-import psycopg2
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+from collections import OrderedDict
 from fastapi import Request
 from fastapi.responses import RedirectResponse
-import requests
+from clients import get_google_client, GOOGLE_TOKEN_URL
+from metrics import span
+import pytz
 
 load_dotenv()
 
@@ -17,14 +21,73 @@ JWT_EXPIRE_MINUTES = 60 * 24 * 7
 def get_token(request: Request):    
     return request.cookies.get("token") or None
 
-def get_jwt_secret() -> str:
+# JWT settings are read from the environment once (at startup via
+# load_jwt_settings, or lazily on first use) instead of on every request
+_jwt_settings = None
+
+def load_jwt_settings() -> dict:
+    global _jwt_settings
     secret = os.getenv("JWT_SECRET")
     if not secret:
         raise ValueError("JWT_SECRET environment variable must be set")
-    return secret
+    _jwt_settings = {
+        "secret": secret,
+        "algorithm": os.getenv("JWT_ALGORITHM", "HS256"),
+    }
+    return _jwt_settings
+
+def get_jwt_secret() -> str:
+    return (_jwt_settings or load_jwt_settings())["secret"]
 
 def get_jwt_algorithm() -> str:
-    return os.getenv("JWT_ALGORITHM", "HS256")
+    return (_jwt_settings or load_jwt_settings())["algorithm"]
+
+class TokenCache:
+    """Bounded LRU of verified token payloads, each kept no longer than the token's exp"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, payload: dict):
+        expires_at = time.time() + self.ttl
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = min(expires_at, payload["exp"])
+        with self._lock:
+            self._entries[token] = (expires_at, payload)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+token_cache = TokenCache(
+    maxsize=int(os.getenv("JWT_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("JWT_CACHE_TTL", "300"))
+)
 
 # data must be a dictionary with the following keys: user_id, email
 def create_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -37,51 +100,66 @@ def create_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def decode_token(token: str):
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         jwt_secret = get_jwt_secret()
         jwt_algorithm = get_jwt_algorithm()
-        payload = jwt.decode(token, jwt_secret, algorithms=[jwt_algorithm])
-        return payload
+        with span("auth.jwt_decode"):
+            payload = jwt.decode(token, jwt_secret, algorithms=[jwt_algorithm])
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except exceptions.JWTError:
         raise HTTPException(status_code=401, detail="Invalid token. Please log in again.")
+    token_cache.put(token, payload)
+    return payload
+
+# decodes the token cookie at most once per request; the payload is kept on
+# request.state so get_user_id and get_email share it
+def get_token_payload(request: Request) -> dict:
+    payload = getattr(request.state, "token_payload", None)
+    if payload is None:
+        token = get_token(request)
+        if not token:
+            raise HTTPException(status_code=401, detail="No token provided. Please log in again.")
+        payload = decode_token(token)
+        request.state.token_payload = payload
+    return payload
 
 # returns the user_id from the token, from field user_id
 def get_user_id(request: Request):
-    token = get_token(request)
-    if not token:
-        raise HTTPException(status_code=401, detail="No token provided. Please log in again.")
-    payload = decode_token(token)
-    return payload.get("user_id")
+    return get_token_payload(request).get("user_id")
 
 # returns the email from the token, from field email
 def get_email(request: Request):
-    token = get_token(request)
-    if not token:
-        raise HTTPException(status_code=401, detail="No token provided. Please log in again.s")
-    payload = decode_token(token)
-    return payload.get("email")
-
-def get_db_connection():
-    return psycopg2.connect(
-        user=os.getenv("user"),
-        password=os.getenv("password"),
-        host=os.getenv("host"),
-        port=os.getenv("port"),
-        dbname=os.getenv("dbname")
-    )
+    return get_token_payload(request).get("email")
 
 def refresh_access_token(refresh_token):
     client_id = os.getenv("GOOGLE_CLIENT_ID")
     client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
-    token_url = "https://oauth2.googleapis.com/token"   
     data = {
         "client_id": client_id,
         "client_secret": client_secret,
         "refresh_token": refresh_token,
         "grant_type": "refresh_token"
     }
-    response = requests.post(token_url, data=data)
+    with span("google.token_refresh"):
+        response = get_google_client().post(GOOGLE_TOKEN_URL, data=data)
     response.raise_for_status()
-    return response.json()  # Contains 'access_token', 'expires_in', etc.
\ No newline at end of file
+    return response.json()  # Contains 'access_token', 'expires_in', etc.
+
+# a schedule's time zone; rows saved before time zones were validated may
+# hold a name pytz does not know
+def get_time_zone(time_zone: str):
+    try:
+        return pytz.timezone(time_zone)
+    except pytz.UnknownTimeZoneError:
+        raise HTTPException(status_code=400, detail=f"Your schedule's time zone {time_zone} is not valid. Please choose another one and save your schedule.")
+
+# local midnight of the Monday starting the current week in time_zone
+def get_week_start(time_zone: str) -> datetime:
+    tz = get_time_zone(time_zone)
+    today = datetime.now(tz).date()
+    monday = today - timedelta(days=today.weekday())
+    return tz.localize(datetime.combine(monday, datetime.min.time()))